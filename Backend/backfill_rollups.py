@@ -0,0 +1,37 @@
+import argparse
+import sys
+
+from db_config import get_session
+from services import daily_rollups
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Recomputes daily rollups of orders, lost and thrown items from their history and reports the drift."
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="only report the drift, the rollups are not changed"
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    arguments = parse_arguments()
+
+    with get_session() as session:
+        drift = daily_rollups.backfill(session, dry_run=arguments.dry_run)
+
+    for row in drift:
+        print(f"TABLE: {row['table']}; KEY: {row['key']}; STORED: {row['stored']}; EXPECTED: {row['expected']}")
+
+    action = "found" if arguments.dry_run else "fixed"
+    print(f"{len(drift)} drifted rows {action}.")
+
+    # Non zero exit code lets scheduled runs report the drift
+    sys.exit(1 if drift else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Measures latencies of requests processed by call_controller.Dispatcher under mixed load of reads and writes. Requests
+are dispatched as fast as the dispatcher accepts them and responses are read from the other end of a socket pair, so
+latency includes waiting for a free worker. By default the in-memory SQLite database is used, so neither MySQL nor
+migrated database is needed. Environment is set before the Backend is imported, because env_loader reads it on import.
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("TOKEN_SECRET", "benchmark-secret")
+os.environ.setdefault("ADMIN_PASSWORD", "benchmark-password")
+
+import argparse
+import json
+import random
+import socket
+import statistics
+import threading
+import time
+
+from call_controller import Dispatcher
+from controller import controller
+from db_config import get_session
+from models import Company, Product, Rack, Transport, User, Vendor, Warehouse
+from services import batch_runner, password_pool
+from utilities import create_token
+
+# Requests of the mixed load: kind, role of the requester, method, url and filters. Placeholders are filled with ids of
+# the seeded instances, {order_id} with a random order created while seeding.
+READS = (
+    ("manager", "GET", "/orders", {"limit": 20}),
+    ("manager", "GET", "/order/{order_id}", {}),
+    ("manager", "GET", "/stats/order", {}),
+    ("manager", "GET", "/products", {}),
+    ("supervisor", "GET", "/inventories", {"rack_id": "{rack_id}"}),
+    ("vendor", "GET", "/orders", {"limit": 20}),
+)
+WRITES = (
+    ("vendor", "POST", "/orders", {}),
+    ("vendor", "PUT", "/order/{order_id}", {}),
+)
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Measures p50 and p99 latencies of the dispatcher under mixed load of reads and writes."
+    )
+    parser.add_argument("--requests", type=int, default=2000, help="number of measured requests per run")
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[0, 4, 8],
+        help="numbers of workers to measure, 0 processes requests one by one"
+    )
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="share of writes in the load")
+    parser.add_argument("--orders", type=int, default=200, help="number of orders created before measuring")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random load")
+
+    return parser.parse_args()
+
+
+def seed(orders: int) -> dict:
+    """
+    Creates a company with a manager, a vendor and a warehouse with a supervisor, racks, inventories and orders.
+    :param orders: number of orders created by the vendor
+    :return: tokens of the requesters and ids of the created instances
+    """
+    with get_session() as session:
+        company = Company(company_name="Benchmark Company", company_email="company@benchmark.com")
+        session.add(company)
+        session.flush()
+
+        users = {}
+        for number, role in enumerate(("manager", "vendor", "supervisor"), start=1):
+            users[role] = User(
+                company_id=company.company_id, user_name=role.title(), user_surname="Benchmark",
+                user_phone=f"+9989000000{number:02d}", user_email=f"{role}@benchmark.com", user_password="-",
+                is_password_forgotten=False, user_role=role
+            )
+        session.add_all(users.values())
+        session.flush()
+
+        warehouse = Warehouse(
+            company_id=company.company_id, supervisor_id=users["supervisor"].user_id, warehouse_name="Warehouse",
+            warehouse_address="Benchmark street", overall_capacity=10 ** 7, remaining_capacity=10 ** 7,
+            warehouse_type="dry"
+        )
+        session.add(warehouse)
+        session.flush()
+        racks = [
+            Rack(warehouse_id=warehouse.warehouse_id, rack_position=f"A{position}", overall_capacity=10 ** 5,
+                 remaining_capacity=10 ** 5)
+            for position in range(1, 11)
+        ]
+        products = [
+            Product(
+                company_id=company.company_id, product_name=f"Product {number}", description="Benchmark product",
+                weight=1, volume=number, price=10 * number, expiry_duration=30, product_type="dry"
+            )
+            for number in range(1, 11)
+        ]
+        vendor = Vendor(vendor_name="Vendor", vendor_address="Vendor street", vendor_owner_id=users["vendor"].user_id)
+        transport = Transport(transport_capacity=10 ** 6, transport_type="truck", transport_speed=60, price_per_weight=1)
+        session.add_all([*racks, *products, vendor, transport])
+        session.commit()
+
+        data = {
+            "tokens": {
+                role: create_token(user.user_id, role, company.company_id) for role, user in users.items()
+            },
+            "warehouse_id": warehouse.warehouse_id,
+            "rack_ids": [rack.rack_id for rack in racks],
+            "product_ids": [product.product_id for product in products],
+            "vendor_id": vendor.vendor_id,
+        }
+
+    # Inventories and orders are added through the controller, so maintained tables are filled as in real use
+    for rack_id, product_id in zip(data["rack_ids"], data["product_ids"]):
+        send(data["tokens"]["supervisor"], "POST", "/inventories", {
+            "rack_id": rack_id, "product_id": product_id, "quantity": 100
+        })
+    data["order_ids"] = [
+        send(data["tokens"]["vendor"], "POST", "/orders", order_body(data, random.Random(number)))["body"]["order_id"]
+        for number in range(orders)
+    ]
+
+    return data
+
+
+def send(token: str, method: str, url: str, body: dict) -> dict:
+    response = controller({
+        "url": url, "method": method, "body": body, "headers": {"token": token, "filters": {}, "socket_id": None}
+    })
+    if response["status_code"] not in (200, 201):
+        raise RuntimeError(f"Seeding failed on {method} {url}: {response}")
+    return response
+
+
+def order_body(data: dict, generator: random.Random) -> dict:
+    """
+    Returns body of an incoming order with one to three random products.
+    """
+    return {
+        "order_type": "to_warehouse", "vendor_id": data["vendor_id"], "warehouse_id": data["warehouse_id"],
+        "items": [
+            {"product_id": product_id, "quantity": generator.randint(1, 5)}
+            for product_id in generator.sample(data["product_ids"], generator.randint(1, 3))
+        ]
+    }
+
+
+def build_load(data: dict, requests: int, write_ratio: float, generator: random.Random) -> list[tuple[str, dict]]:
+    """
+    Returns kinds (read or write) and messages of the requests in the order they are dispatched.
+    """
+    # Each role is one client of the server, so its requester is cached by the identity cache
+    socket_ids = {role: number for number, role in enumerate(data["tokens"], start=1)}
+
+    load = []
+    for _ in range(requests):
+        kind = "write" if generator.random() < write_ratio else "read"
+        role, method, url, filters = generator.choice(WRITES if kind == "write" else READS)
+        placeholders = {"order_id": generator.choice(data["order_ids"]), "rack_id": generator.choice(data["rack_ids"])}
+
+        body = {}
+        if method == "POST":
+            body = order_body(data, generator)
+        elif method == "PUT":
+            body = {key: value for key, value in order_body(data, generator).items() if key in ("vendor_id", "items")}
+
+        load.append((kind, {
+            "url": url.format(**placeholders), "method": method, "body": body,
+            "headers": {
+                "token": data["tokens"][role], "socket_id": socket_ids[role],
+                "filters": {
+                    name: int(value.format(**placeholders)) if isinstance(value, str) else value
+                    for name, value in filters.items()
+                }
+            }
+        }))
+
+    return load
+
+
+def run(load: list[tuple[str, dict]], workers: int) -> tuple[dict[str, list[float]], float, int]:
+    """
+    Dispatches the load and waits for all responses.
+    :return: latencies in seconds by kinds of requests, duration of the run and number of failed requests
+    """
+    client_socket, server_socket = socket.socketpair()
+    dispatcher = Dispatcher(client_socket, workers)
+    sent_at = {}
+    latencies = {"read": [], "write": []}
+    failed = 0
+
+    def receive() -> None:
+        nonlocal failed
+        buffer = b""
+        received = 0
+        while received < len(load):
+            data = server_socket.recv(1048576)
+            if not data:
+                return
+            buffer += data
+            while b"\n" in buffer:
+                message, buffer = buffer.split(b"\n", 1)
+                response = json.loads(message)
+                number = response["headers"]["request_number"]
+                latencies[load[number][0]].append(time.perf_counter() - sent_at[number])
+                failed += response["status_code"] >= 300
+                received += 1
+
+    receiver = threading.Thread(target=receive)
+    receiver.start()
+
+    started_at = time.perf_counter()
+    for number, (_, message) in enumerate(load):
+        # Headers are sent back with the response, so it is matched with the request by its number
+        message["headers"]["request_number"] = number
+        sent_at[number] = time.perf_counter()
+        dispatcher.dispatch(json.dumps(message))
+
+    dispatcher.shutdown()
+    receiver.join()
+    duration = time.perf_counter() - started_at
+    client_socket.close()
+    server_socket.close()
+
+    return latencies, duration, failed
+
+
+def percentiles(latencies: list[float]) -> str:
+    if len(latencies) < 2:
+        return "not enough requests"
+    quantiles = statistics.quantiles(latencies, n=100)
+    return f"p50 {quantiles[49] * 1000:.2f} ms, p99 {quantiles[98] * 1000:.2f} ms"
+
+
+def main() -> None:
+    arguments = parse_arguments()
+    generator = random.Random(arguments.seed)
+    data = seed(arguments.orders)
+
+    try:
+        for workers in arguments.workers:
+            load = build_load(data, arguments.requests, arguments.write_ratio, generator)
+            # Warming up caches of the requesters and the analytics, so the first requests are not measured cold
+            run(load[:50], workers)
+
+            latencies, duration, failed = run(load, workers)
+            print(f"workers={workers}: {len(load) / duration:.0f} requests/s, {failed} failed")
+            print(f"\tall: {percentiles(latencies['read'] + latencies['write'])}")
+            for kind in ("read", "write"):
+                print(f"\t{kind} ({len(latencies[kind])}): {percentiles(latencies[kind])}")
+    finally:
+        password_pool.shutdown()
+        batch_runner.shutdown()
+
+
+if __name__ == "__main__":
+    main()
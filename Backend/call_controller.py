@@ -1,17 +1,18 @@
+import argparse
+import asyncio
+import re
 import socket
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from json import JSONDecodeError
+from typing import Iterable
 
 import select
-import sys
 from controller import controller
+from services import password_pool, batch_runner
+from utilities.templates import StreamingResponse
 
-client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1048576)
-
-SERVER_IP = sys.argv[1]
-PORT = int(sys.argv[2])
-accumulated_data = b""
 
 def receive_messages(client_socket):
     accumulated_data = b""
@@ -42,8 +43,168 @@ def receive_messages(client_socket):
     accumulated_message = accumulated_message + accumulated_data.decode()
     return accumulated_message.rstrip()
 
-try:
-    client_socket.connect((SERVER_IP, PORT))
+
+def process_message(data: str | bytes, stream: bool = True) -> dict | StreamingResponse | list[dict] | None:
+    """
+    Decodes raw message received from the server and passes it to the controller.
+    :param data: raw message
+    :param stream: whether streaming response may be returned, otherwise its messages are built right away (streaming
+    response can not be returned from another process)
+    :return: response of the controller or None if message can not be decoded
+    """
+    try:
+        request = json.loads(data)
+    except JSONDecodeError:
+        # Without headers there is no socket_id to send the response to
+        print(f"\033[91m|INVALID JSON RECEIVED: {data[:100]!r}|\033[0m")
+        return None
+
+    response = controller(request)
+    if isinstance(response, StreamingResponse) and not stream:
+        return list(response.messages())
+
+    return response
+
+
+def response_messages(response: dict | StreamingResponse | list[dict]) -> Iterable[dict]:
+    """
+    Returns messages which should be sent for the response, streamed lists consist of several messages.
+    """
+    if isinstance(response, StreamingResponse):
+        return response.messages()
+    if isinstance(response, list):
+        return response
+
+    return (response,)
+
+
+class MessageFramer:
+    """
+    Incrementally splits the stream received from the server into separate JSON documents. Data is kept in a single
+    bytearray, scanning resumes where the previous call stopped and message is returned as soon as its last byte
+    arrives, so several messages may be extracted from one recv and there is no need to wait for the socket to
+    become idle.
+    """
+    # Brackets or the whole string literal, so that brackets inside of strings are skipped
+    TOKEN = re.compile(rb'[{}\[\]]|"(?:[^"\\]|\\.)*(?P<closed>")?', re.DOTALL)
+    OPENING = (ord("{"), ord("["))
+    QUOTE = ord('"')
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+        self.depth = 0
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """
+        Adds received data to the buffer and extracts all complete messages from it.
+        :param data: bytes received from the socket
+        :return: list of raw messages
+        """
+        buffer = self.buffer
+        buffer += data
+        boundaries = []
+        message_start = 0
+        resume_position = len(buffer)
+
+        for match in self.TOKEN.finditer(buffer, self.position):
+            token = buffer[match.start()]
+
+            if token == self.QUOTE:
+                if match.group("closed") is None:
+                    # String is not complete yet, it will be scanned again after the next recv
+                    resume_position = match.start()
+                    break
+            elif token in self.OPENING:
+                if self.depth == 0:
+                    message_start = match.start()
+                self.depth += 1
+            elif self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    boundaries.append((message_start, match.end()))
+
+        with memoryview(buffer) as view:
+            messages = [bytes(view[start:end]) for start, end in boundaries]
+
+        # Anything outside of messages (whitespace, server`s notifications) is dropped with processed messages
+        processed = message_start if self.depth > 0 else resume_position
+        del buffer[:processed]
+        self.position = resume_position - processed
+
+        return messages
+
+
+class Dispatcher:
+    """
+    Sends responses back to the server, either right after processing the request or, if workers are specified,
+    as soon as one of the pool`s workers finishes it. Responses are tagged with headers.socket_id by the controller,
+    so they may be sent in a different order than requests were received.
+    """
+    def __init__(self, client_socket: socket.socket, workers: int = 0, max_in_flight: int = None,
+                 executor: str = "thread"):
+        self.client_socket = client_socket
+        self.send_lock = threading.Lock()
+        self.executor = None
+        self.in_flight = None
+        self.stream = executor != "process"
+
+        if workers > 0:
+            executor_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+            self.executor = executor_class(max_workers=workers)
+            self.in_flight = threading.BoundedSemaphore(max_in_flight or workers * 2)
+
+    def dispatch(self, data: str | bytes) -> None:
+        """
+        Processes message inline or submits it to the pool. Blocks while max_in_flight requests are being processed.
+        :param data: raw message
+        """
+        if self.executor is None:
+            self.send(process_message(data))
+            return
+
+        self.in_flight.acquire()
+        try:
+            future = self.executor.submit(process_message, data, self.stream)
+        except Exception:
+            self.in_flight.release()
+            raise
+        future.add_done_callback(self.__on_done)
+
+    def send(self, response: dict | StreamingResponse | list[dict] | None) -> None:
+        """
+        Sends response to the server, responses are separated by new line. Messages of the streamed list are sent one
+        by one, as soon as each chunk is read, so responses of other requests may be sent between them.
+        :param response: response of the controller
+        """
+        if response is None:
+            return
+
+        for message in response_messages(response):
+            message = json.dumps(message).encode() + "\n".encode()
+            with self.send_lock:
+                self.client_socket.sendall(message)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    def __on_done(self, future) -> None:
+        try:
+            self.send(future.result())
+        except Exception as e:
+            print(f"\033[91m|FAILED TO PROCESS REQUEST: {e}|\033[0m")
+        finally:
+            self.in_flight.release()
+
+
+async def run_async_client(ip: str, port: int, workers: int = 0, max_in_flight: int = None,
+                           executor: str = "thread") -> None:
+    """
+    Asyncio based client, reads requests from the server without polling and processes them in the pool, so that
+    the event loop is never blocked by the controller.
+    """
+    reader, writer = await asyncio.open_connection(ip, port)
     print("Connected to the server.")
 
     # Specify the role in a JSON message
@@ -51,29 +212,156 @@ try:
         "role": "backend",
         "content": "Hello from the Python client"
     }
-    client_socket.send(json.dumps(message).encode())
+    writer.write(json.dumps(message).encode())
+    await writer.drain()
 
-    while True:
-        ready, _, _ = select.select([client_socket], [], [], 1)  # Wait for up to 1 second for data
-        if ready:
-            # receive data
-            data = receive_messages(client_socket)
-
-            try:
-                request = json.loads(data)
-                response = controller(request)
-            except JSONDecodeError:
-                response = {
-                    "status_code": 400,
-                    "message": "Invalid JSON.",
-                    "body": {},
-                    "headers": request.get("headers", { "socket_fd: 0 "})
-                }
-
-            client_socket.send(json.dumps(response).encode() + "\n".encode())
+    loop = asyncio.get_running_loop()
+    workers = max(workers, 1)
+    pool = ProcessPoolExecutor(max_workers=workers) if executor == "process" else ThreadPoolExecutor(max_workers=workers)
+    in_flight = asyncio.Semaphore(max_in_flight or workers * 2)
+    write_lock = asyncio.Lock()
+    framer = MessageFramer()
+    tasks = set()
+
+    async def write(response: dict) -> None:
+        async with write_lock:
+            writer.write(json.dumps(response).encode() + "\n".encode())
+            await writer.drain()
+
+    def write_stream(response: StreamingResponse) -> None:
+        # Rows are read in the pool`s thread, which waits until each message is written
+        for stream_message in response.messages():
+            asyncio.run_coroutine_threadsafe(write(stream_message), loop).result()
+
+    async def handle(message: bytes) -> None:
+        try:
+            response = await loop.run_in_executor(pool, process_message, message, executor != "process")
+            if response is None:
+                return
+
+            if isinstance(response, StreamingResponse):
+                await loop.run_in_executor(pool, write_stream, response)
+                return
+
+            for response_message in response_messages(response):
+                await write(response_message)
+        except Exception as e:
+            print(f"\033[91m|FAILED TO PROCESS REQUEST: {e}|\033[0m")
+        finally:
+            in_flight.release()
+
+    try:
+        while True:
+            data = await reader.read(1048576)
 
             if not data:
-                continue  # The server has closed the connection
+                break  # The server has closed the connection
+
+            for message in framer.feed(data):
+                await in_flight.acquire()
+                task = asyncio.create_task(handle(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.wait(tasks)
+    finally:
+        writer.close()
+        pool.shutdown(wait=True)
+        password_pool.shutdown()
+        batch_runner.shutdown()
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backend client of the IPC server.")
+    parser.add_argument("ip", help="ip address of the IPC server")
+    parser.add_argument("port", type=int, help="port of the IPC server")
+    parser.add_argument(
+        "--workers", type=int, default=0,
+        help="number of workers processing requests concurrently, 0 processes requests one by one"
+    )
+    parser.add_argument(
+        "--executor", choices=("thread", "process"), default="thread",
+        help="type of the workers` pool"
+    )
+    parser.add_argument(
+        "--max-in-flight", type=int, default=None,
+        help="maximum number of requests being processed at the same time, defaults to 2 * workers"
+    )
+    parser.add_argument(
+        "--asyncio", action="store_true",
+        help="use asyncio based client instead of the select loop"
+    )
+    parser.add_argument(
+        "--framed", action="store_true",
+        help="split received data by JSON messages` boundaries instead of waiting for the socket to become idle "
+             "(always used by asyncio client)"
+    )
+
+    return parser.parse_args()
+
+
+def run_client(ip: str, port: int, workers: int = 0, max_in_flight: int = None, executor: str = "thread",
+               framed: bool = False) -> None:
+    """
+    Select based client, reads requests from the server and passes them to the dispatcher.
+    """
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1048576)
+    dispatcher = Dispatcher(client_socket, workers, max_in_flight, executor)
+    framer = MessageFramer() if framed else None
+
+    try:
+        client_socket.connect((ip, port))
+        print("Connected to the server.")
+
+        # Specify the role in a JSON message
+        message = {
+            "role": "backend",
+            "content": "Hello from the Python client"
+        }
+        client_socket.send(json.dumps(message).encode())
+
+        while True:
+            ready, _, _ = select.select([client_socket], [], [], 1)  # Wait for up to 1 second for data
+            if ready and framer is not None:
+                data = client_socket.recv(1048576)
+
+                if not data:
+                    break  # The server has closed the connection
+
+                for message in framer.feed(data):
+                    dispatcher.dispatch(message)
+
+            elif ready:
+                # receive data
+                data = receive_messages(client_socket)
+
+                if not data:
+                    continue  # The server has closed the connection
+
+                dispatcher.dispatch(data)
+
+    except ConnectionRefusedError:
+        print("Connection to the server failed. Make sure the server is running.")
+    finally:
+        dispatcher.shutdown()
+        password_pool.shutdown()
+        batch_runner.shutdown()
+
+
+def main() -> None:
+    arguments = parse_arguments()
+    options = dict(workers=arguments.workers, max_in_flight=arguments.max_in_flight, executor=arguments.executor)
+
+    if arguments.asyncio:
+        try:
+            asyncio.run(run_async_client(arguments.ip, arguments.port, **options))
+        except ConnectionRefusedError:
+            print("Connection to the server failed. Make sure the server is running.")
+    else:
+        run_client(arguments.ip, arguments.port, framed=arguments.framed, **options)
+
 
-except ConnectionRefusedError:
-    print("Connection to the server failed. Make sure the server is running.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
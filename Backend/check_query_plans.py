@@ -0,0 +1,184 @@
+import argparse
+import re
+import sys
+
+from sqlalchemy import event
+
+from controller import controller
+from db_config import engine, get_session
+from models import Inventory, Order, Rack, User, Vendor, Warehouse
+from utilities import create_token
+
+# Read requests which are sent on every page of managers, supervisors and vendors. Placeholders in urls and filters are
+# filled with ids of the sample requester`s warehouse, rack, product, vendor and order.
+HOT_REQUESTS = {
+    "manager": (
+        ("/orders", {"limit": 20}),
+        ("/orders", {"created_at_gte": "2025-01-01", "created_at_lte": "2025-01-31"}),
+        ("/orders/details/{warehouse_id}", {"created_at_gte": "2025-01-01", "created_at_lte": "2025-01-31"}),
+        ("/order/{order_id}", {}),
+        ("/stats/order", {}),
+        ("/stats/warehouse", {"created_at_gte": "2025-01-01", "created_at_lte": "2025-01-31"}),
+        ("/stats/lost-items", {"created_at_gte": "2025-01-01", "created_at_lte": "2025-01-31"}),
+        ("/stats/thrown-items", {"created_at_gte": "2025-01-01", "created_at_lte": "2025-01-31"}),
+        ("/warehouses", {}),
+        ("/users", {}),
+        ("/products", {}),
+    ),
+    "supervisor": (
+        ("/orders", {"limit": 20}),
+        ("/order/{order_id}/receive/preview", {}),
+        ("/stats/order", {}),
+        ("/warehouse/{warehouse_id}", {}),
+        ("/racks", {"warehouse_id": "{warehouse_id}"}),
+        ("/rack/{rack_id}", {}),
+        ("/inventories", {"rack_id": "{rack_id}"}),
+        ("/inventories", {"product_id": "{product_id}"}),
+    ),
+    "vendor": (
+        ("/orders", {"limit": 20}),
+        ("/stats/order", {}),
+        ("/vendors", {}),
+        ("/vendor/{vendor_id}", {}),
+    ),
+}
+# Tables which are read whole by design: lookup tables and versions of caches with a handful of rows
+SCANNED_TABLES = {"companies", "transports", "cache_versions"}
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Sends hot read requests of every role, explains their SELECT statements and reports statements "
+                    "which scan whole tables. Should be run against a database with the benchmark dataset."
+    )
+    parser.add_argument(
+        "--verbose", action="store_true",
+        help="print plans of all statements, not only of those with full scans"
+    )
+
+    return parser.parse_args()
+
+
+def sample_requesters(session) -> dict[str, dict]:
+    """
+    Picks a requester of every role with a warehouse, rack, product, vendor and order he can access.
+    """
+    requesters = {}
+    supervisor = session.query(User).join(Warehouse, Warehouse.supervisor_id == User.user_id).filter(
+        User.user_role == "supervisor"
+    ).first()
+    vendor_owner = session.query(User).join(Vendor, Vendor.vendor_owner_id == User.user_id).first()
+    manager = session.query(User).filter(User.user_role == "manager").first()
+
+    for role, user in (("manager", manager), ("supervisor", supervisor), ("vendor", vendor_owner)):
+        if user is None:
+            print(f"\033[93m|NO {role.upper()} IN THE DATABASE, HIS REQUESTS ARE SKIPPED|\033[0m")
+            continue
+
+        if role == "supervisor":
+            warehouse = session.query(Warehouse).filter_by(supervisor_id=user.user_id).first()
+        else:
+            warehouse = session.query(Warehouse).filter_by(company_id=user.company_id).first()
+        vendor = session.query(Vendor).filter_by(vendor_owner_id=user.user_id).first() or session.query(Vendor).first()
+        rack = session.query(Rack).filter_by(warehouse_id=warehouse.warehouse_id).first() if warehouse else None
+        order = session.query(Order).filter(
+            Order.order_type == "to_warehouse", Order.recipient_id == warehouse.warehouse_id
+        ).first() if warehouse else None
+
+        inventory = session.query(Inventory).filter_by(rack_id=rack.rack_id).first() if rack else None
+
+        requesters[role] = {
+            "token": create_token(user.user_id, role, user.company_id, user.token_version),
+            "warehouse_id": warehouse.warehouse_id if warehouse else 0,
+            "rack_id": rack.rack_id if rack else 0,
+            "product_id": inventory.product_id if inventory else 0,
+            "vendor_id": vendor.vendor_id if vendor else 0,
+            "order_id": order.order_id if order else 0,
+        }
+
+    return requesters
+
+
+def explain(connection, statement: str, parameters) -> tuple[list[str], list[str]]:
+    """
+    Explains the statement.
+    :return: lines of the plan and names of tables (or their aliases) which are scanned whole
+    """
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        lines = [row[3] for row in rows]
+        scanned = [
+            match.group(1) for match in (re.match(r"SCAN (\w+)", line) for line in lines)
+            if match and match.group(1) != "CONSTANT"
+        ]
+        return lines, scanned
+
+    rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings().all()
+    lines = [f"{row['table']}: {row['type']} {row['key'] or ''} ({row['rows']} rows)" for row in rows]
+    return lines, [row["table"] for row in rows if row["type"] == "ALL"]
+
+
+def find_full_scans(requesters: dict[str, dict], verbose: bool = False) -> list[tuple[str, str, list[str]]]:
+    """
+    Sends hot read requests of the requesters and explains their SELECT statements.
+    :param requesters: requesters of roles picked by sample_requesters
+    :param verbose: print plans of all statements, not only of those with full scans
+    :return: role, url and scanned tables of every statement which scans whole tables
+    """
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture_statement(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")) and not executemany:
+            statements.append((statement, parameters))
+
+    full_scans = []
+    try:
+        for role, requester in requesters.items():
+            for url, filters in HOT_REQUESTS[role]:
+                url = url.format(**requester)
+                filters = {
+                    name: int(value.format(**requester)) if isinstance(value, str) and value.startswith("{") else value
+                    for name, value in filters.items()
+                }
+                statements.clear()
+                response = controller({
+                    "url": url, "method": "GET", "body": {},
+                    "headers": {"token": requester["token"], "filters": filters, "socket_id": None}
+                })
+                captured = list(statements)
+                status_code = response.get("status_code", response.get("status"))
+                print(f"{role.upper()} GET {url}: {status_code}, {len(captured)} statements")
+
+                with engine.connect() as connection:
+                    for statement, parameters in captured:
+                        lines, scanned = explain(connection, statement, parameters)
+                        scanned = [table for table in scanned if table not in SCANNED_TABLES]
+                        if scanned:
+                            full_scans.append((role, url, scanned))
+                        if scanned or verbose:
+                            print(f"\t{'FULL SCAN OF ' + ', '.join(scanned) if scanned else 'OK'}: "
+                                  f"{' '.join(statement.split())[:300]}")
+                            for line in lines:
+                                print(f"\t\t{line}")
+    finally:
+        event.remove(engine, "before_cursor_execute", capture_statement)
+
+    return full_scans
+
+
+def main() -> None:
+    arguments = parse_arguments()
+
+    with get_session() as session:
+        requesters = sample_requesters(session)
+
+    full_scans = find_full_scans(requesters, arguments.verbose)
+    print(f"{len(full_scans)} statements with full scans found.")
+
+    # Non zero exit code lets CI fail when an index is missing
+    sys.exit(1 if full_scans else 0)
+
+
+if __name__ == "__main__":
+    main()
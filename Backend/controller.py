@@ -1,9 +1,125 @@
 from views import UserView, CompanyView, InventoryView, OrderView, OrderItemView, ProductView, RackView, VendorView, \
     TransactionView, TransactionItemView, WarehouseView, TransportView, LostItemView, ThrownItemView
+from services import Router, identity_cache, batch_runner
 from utilities.exceptions import ValidationError, DatabaseError
 from utilities.templates import ResponseFactory
 from utilities.enums.method import Method
 
+GET, POST, PUT, DELETE = Method.GET.value, Method.POST.value, Method.PUT.value, Method.DELETE.value
+
+# Routes are compiled once, on import
+router = Router()
+
+# User`s endpoints
+router.add(GET, "/users", UserView, "get_list", with_filters=True)
+router.add(POST, "/users", UserView, "create")
+router.add(POST, "/user/register", UserView, "sign_up")
+router.add(POST, "/user/login", UserView, "login")
+router.add(PUT, "/user/change_password", UserView, "change_password")
+router.add(PUT, "/user/forgot-password", UserView, "forgot_password")
+router.add(PUT, "/user/{user_id}/reset-password", UserView, "reset_password")
+router.add(GET, "/user/{user_id}", UserView, "get")
+router.add(PUT, "/user/{user_id}", UserView, "update")
+router.add(DELETE, "/user/{user_id}", UserView, "delete")
+
+# Company`s endpoints
+router.add(GET, "/companies", CompanyView, "get_list", with_filters=True)
+router.add(POST, "/companies", CompanyView, "create")
+router.add(GET, "/company/{company_id}", CompanyView, "get")
+router.add(PUT, "/company/{company_id}", CompanyView, "update")
+router.add(DELETE, "/company/{company_id}", CompanyView, "delete")
+
+# Inventory`s endpoints
+router.add(GET, "/inventories", InventoryView, "get_list", with_filters=True)
+router.add(POST, "/inventories", InventoryView, "create")
+router.add(DELETE, "/inventory", InventoryView, "delete")
+router.add(GET, "/inventory/{inventory_id}", InventoryView, "get")
+router.add(PUT, "/inventory/{inventory_id}", InventoryView, "update")
+router.add(DELETE, "/inventory/{inventory_id}", InventoryView, "delete")
+router.add(GET, "/stats/inventory", InventoryView, "group_inventory_by_product", with_filters=True)
+
+# Order`s endpoints
+router.add(GET, "/orders", OrderView, "get_list", with_filters=True)
+router.add(POST, "/orders", OrderView, "create")
+router.add(GET, "/orders/details", OrderView, "details", with_filters=True)
+router.add(GET, "/orders/details/{warehouse_id}", OrderView, "details", with_filters=True)
+router.add(GET, "/order/{order_id}", OrderView, "get")
+router.add(PUT, "/order/{order_id}", OrderView, "update")
+router.add(DELETE, "/order/{order_id}", OrderView, "delete")
+router.add(GET, "/order/{order_id}/send/preview", OrderView, "send_preview", with_filters=True)
+router.add(PUT, "/order/{order_id}/send", OrderView, "send")
+router.add(GET, "/order/{order_id}/receive/preview", OrderView, "receive_preview")
+router.add(PUT, "/order/{order_id}/receive", OrderView, "finalize_order")
+router.add(PUT, "/order/{order_id}/confirm", OrderView, "confirm")
+router.add(PUT, "/order/{order_id}/cancel", OrderView, "cancel")
+router.add(PUT, "/order/{order_id}/status", OrderView, "change_status")
+router.add(POST, "/order/{order_id}/lost-items", LostItemView, "create")
+router.add(GET, "/stats/order", OrderView, "get_order_stats")
+router.add(GET, "/stats/movements", OrderView, "get_movement_stats", with_filters=True)
+
+# OrderItem`s endpoints
+router.add(GET, "/order_items", OrderItemView, "get_list", with_filters=True)
+router.add(POST, "/order_items", OrderItemView, "create")
+router.add(GET, "/order_item/{order_item_id}", OrderItemView, "get")
+router.add(PUT, "/order_item/{order_item_id}", OrderItemView, "update")
+router.add(DELETE, "/order_item/{order_item_id}", OrderItemView, "delete")
+
+# Product`s endpoints
+router.add(GET, "/products", ProductView, "get_list", with_filters=True)
+router.add(POST, "/products", ProductView, "create")
+router.add(GET, "/product/{product_id}", ProductView, "get")
+router.add(PUT, "/product/{product_id}", ProductView, "update")
+router.add(DELETE, "/product/{product_id}", ProductView, "delete")
+
+# Rack`s endpoints
+router.add(GET, "/racks", RackView, "get_list", with_filters=True)
+router.add(POST, "/racks", RackView, "create")
+router.add(POST, "/rack/multiple", RackView, "multiple")
+router.add(GET, "/rack/{rack_id}", RackView, "get")
+router.add(PUT, "/rack/{rack_id}", RackView, "update")
+router.add(DELETE, "/rack/{rack_id}", RackView, "delete")
+
+# Vendor`s endpoints
+router.add(GET, "/vendors", VendorView, "get_list", with_filters=True)
+router.add(POST, "/vendors", VendorView, "create")
+router.add(GET, "/vendor/{vendor_id}", VendorView, "get")
+router.add(PUT, "/vendor/{vendor_id}", VendorView, "update")
+router.add(DELETE, "/vendor/{vendor_id}", VendorView, "delete")
+
+# Transaction`s endpoints
+router.add(GET, "/transactions", TransactionView, "get_list", with_filters=True)
+router.add(POST, "/transactions", TransactionView, "create")
+router.add(GET, "/transaction/{transaction_id}", TransactionView, "get")
+router.add(PUT, "/transaction/{transaction_id}", TransactionView, "update")
+router.add(DELETE, "/transaction/{transaction_id}", TransactionView, "delete")
+
+# TransactionItem`s endpoints
+router.add(GET, "/transaction_items", TransactionItemView, "get_list", with_filters=True)
+router.add(POST, "/transaction_items", TransactionItemView, "create")
+router.add(GET, "/transaction_item/{transaction_item_id}", TransactionItemView, "get")
+router.add(PUT, "/transaction_item/{transaction_item_id}", TransactionItemView, "update")
+router.add(DELETE, "/transaction_item/{transaction_item_id}", TransactionItemView, "delete")
+
+# Warehouse`s endpoints
+router.add(GET, "/warehouses", WarehouseView, "get_list", with_filters=True)
+router.add(POST, "/warehouses", WarehouseView, "create")
+router.add(GET, "/warehouse/suitable-warehouses-for-orders", WarehouseView, "suitable_for_order")
+router.add(GET, "/warehouse/{warehouse_id}", WarehouseView, "get")
+router.add(PUT, "/warehouse/{warehouse_id}", WarehouseView, "update")
+router.add(DELETE, "/warehouse/{warehouse_id}", WarehouseView, "delete")
+router.add(GET, "/stats/warehouse", WarehouseView, "most_used_warehouses", with_filters=True)
+
+# Transport`s endpoints
+router.add(GET, "/transports", TransportView, "get_list", with_filters=True)
+router.add(POST, "/transports", TransportView, "create")
+router.add(GET, "/transport/{transport_id}", TransportView, "get")
+router.add(PUT, "/transport/{transport_id}", TransportView, "update")
+router.add(DELETE, "/transport/{transport_id}", TransportView, "delete")
+
+# Statistics` endpoints
+router.add(GET, "/stats/lost-items", LostItemView, "get_list")
+router.add(GET, "/stats/thrown-items", ThrownItemView, "get_list")
+
 
 def controller(request: dict) -> dict:
     """
@@ -11,23 +127,6 @@ def controller(request: dict) -> dict:
     :param request:
     :return:
     """
-
-    # Views
-    user_view = UserView()
-    company_view = CompanyView()
-    inventory_view = InventoryView()
-    order_view = OrderView()
-    lost_item_view = LostItemView()
-    thrown_item_view = ThrownItemView()
-    order_item_view = OrderItemView()
-    product_view = ProductView()
-    rack_view = RackView()
-    vendor_view = VendorView()
-    transaction_view = TransactionView()
-    transaction_item_view = TransactionItemView()
-    warehouse_view = WarehouseView()
-    transport_view = TransportView()
-
     url = request.get("url", "")
     method = request.get("method", "")
     headers = request.get("headers", {})
@@ -37,238 +136,19 @@ def controller(request: dict) -> dict:
     port = headers.get("address", "")
     socket_fd = headers.get("socket_id", "")
 
-    # TODO: We need to refactor this code to avoid repetitions and make it more readable
-
     try:
-        # User`s endpoints
-        if "/connect" in url:
+        if url == "/connect":
             print(f"\033[92m|CONNECTED -> IP: {ip}; PORT: {port}; SOCKET_FD: {socket_fd}|\033[0m")
-        elif "/disconnect" in url:
+            return None
+        elif url == "/disconnect":
             print(f"\033[91m|DISCONNECTED <- IP: {ip}; PORT: {port}; SOCKET_FD: {socket_fd}|\033[0m")
-        elif "/user" in url:
-            if method == Method.GET.value:
-                if "/users" in url:
-                    return user_view.get_list(request=request, **filters)
-                return user_view.get(request=request)
-            elif method == Method.POST.value:
-                if "/register" in url:
-                    return user_view.sign_up(request=request)
-                if "/login" in url:
-                    return user_view.login(request=request)
-                if "/users" in url:
-                    return user_view.create(request=request)
-            elif method == Method.DELETE.value:
-                return user_view.delete(request=request)
-            elif method == Method.PUT.value:
-                if "/change_password" in url:
-                    return user_view.change_password(request=request)
-                if "/forgot-password" in url:
-                    return user_view.forgot_password(request=request)
-                if "/reset-password" in url:
-                    return user_view.reset_password(request=request)
-                return user_view.update(request=request)
-
-        # Company`s endpoints
-        elif "/company" in url:
-            if method == Method.GET.value:
-                return company_view.get(request=request)
-            elif method == Method.DELETE.value:
-                return company_view.delete(request=request)
-            elif method == Method.PUT.value:
-                return company_view.update(request=request)
-        elif "/companies" in url:
-            if method == Method.GET.value:
-                return company_view.get_list(request=request, **filters)
-            elif method == Method.POST.value:
-                return company_view.create(request=request)
-
-        # Inventory`s endpoints
-        elif "/inventories" in url:
-            if method == Method.GET.value:
-                return inventory_view.get_list(request=request, **filters)
-            elif method == Method.POST.value:
-                return inventory_view.create(request=request)
-        elif "/inventory" in url:
-            if method == Method.GET.value:
-                if "/stats/inventory/" in url:
-                    return inventory_view.group_inventory_by_product(request=request, **filters)
-                return inventory_view.get(request=request)
-            elif method == Method.DELETE.value:
-                return inventory_view.delete(request=request)
-            elif method == Method.PUT.value:
-                return inventory_view.update(request=request)
-
-        # Order`s endpoints
-        elif "/orders" in url:
-            if method == Method.GET.value:
-                if "/details" in url:
-                    return order_view.details(request=request, **filters)
-                return order_view.get_list(request=request, **filters)
-            elif method == Method.POST.value:
-                return order_view.create(request=request)
-        elif "/order" in url:
-            if method == Method.GET.value:
-                if "/send" in url:
-                    if "/preview" in url:
-                        return order_view.send_preview(request=request)
-                elif "/receive" in url:
-                    if "/preview" in url:
-                        return order_view.receive_preview(request=request)
-                elif "/stats/order" in url:
-                    return order_view.get_order_stats(request=request)
-                return order_view.get(request=request)
-            elif method == Method.POST.value:
-                if "/lost-items" in url:
-                    return lost_item_view.create(request=request)
-
-            elif method == Method.DELETE.value:
-                return order_view.delete(request=request)
-            elif method == Method.PUT.value:
-                if "/confirm" in url:
-                    return order_view.confirm(request=request)
-                if "/cancel" in url:
-                    return order_view.cancel(request=request)
-                if "/send" in url:
-                    return order_view.send(request=request)
-                if "/status" in url:
-                    return order_view.change_status(request=request)
-                if "/receive/preview" in url:
-                    return order_view.rack_receive_preview(request=request)
-                if "/receive" in url:
-                    return order_view.finalize_order(request=request)
-                return order_view.update(request=request)
-
-        # OrderItem`s endpoints
-        elif "/order_item" in url:
-            if method == Method.GET.value:
-                return order_item_view.get(request=request)
-            elif method == Method.DELETE.value:
-                return order_item_view.delete(request=request)
-            elif method == Method.PUT.value:
-                return order_item_view.update(request=request)
-        elif "/order_items" in url:
-            if method == Method.GET.value:
-                return order_item_view.get_list(request=request, **filters)
-            elif method == Method.POST.value:
-                return order_item_view.create(request=request)
-
-        # Product`s endpoints
-        elif "/products" in url:
-            if method == Method.GET.value:
-                return product_view.get_list(request=request, **filters)
-            elif method == Method.POST.value:
-                return product_view.create(request=request)
-        elif "/product" in url:
-            if method == Method.GET.value:
-                return product_view.get(request=request)
-            elif method == Method.DELETE.value:
-                return product_view.delete(request=request)
-            elif method == Method.PUT.value:
-                return product_view.update(request=request)
-
-        # Rack`s endpoints
-        elif "/racks" in url:
-            if method == Method.GET.value:
-                return rack_view.get_list(request=request, **filters)
-            elif method == Method.POST.value:
-                return rack_view.create(request=request)
-        elif "/rack" in url:
-            if method == Method.GET.value:
-                return rack_view.get(request=request)
-            elif method == Method.DELETE.value:
-                return rack_view.delete(request=request)
-            elif method == Method.PUT.value:
-                return rack_view.update(request=request)
-            elif method == Method.POST.value:
-                if "/multiple" in url:
-                    return rack_view.multiple(request=request)
-
-        # Vendor`s endpoints
-        elif "/vendors" in url:
-            if method == Method.GET.value:
-                return vendor_view.get_list(request=request, **filters)
-            elif method == Method.POST.value:
-                return vendor_view.create(request=request)
-        elif "/vendor" in url:
-            if method == Method.GET.value:
-                return vendor_view.get(request=request)
-            elif method == Method.DELETE.value:
-                return vendor_view.delete(request=request)
-            elif method == Method.PUT.value:
-                return vendor_view.update(request=request)
-
-        # Transaction`s endpoints
-        elif "/transaction" in url:
-            if method == Method.GET.value:
-                return transaction_view.get(request=request)
-            elif method == Method.DELETE.value:
-                return transaction_view.delete(request=request)
-            elif method == Method.PUT.value:
-                return transaction_view.update(request=request)
-        elif "/transactions" in url:
-            if method == Method.GET.value:
-                return transaction_view.get_list(request=request, **filters)
-            elif method == Method.POST.value:
-                return transaction_view.create(request=request)
-
-        # TransactionItem`s endpoints
-        elif "/transaction_item" in url:
-            if method == Method.GET.value:
-                return transaction_item_view.get(request=request)
-            elif method == Method.DELETE.value:
-                return transaction_item_view.delete(request=request)
-            elif method == Method.PUT.value:
-                return transaction_item_view.update(request=request)
-        elif "/transaction_items" in url:
-            if method == Method.GET.value:
-                return transaction_item_view.get_list(request=request, **filters)
-            elif method == Method.POST.value:
-                return transaction_item_view.create(request=request)
-
-        # Warehouse`s endpoints
-        elif "/warehouses" in url:
-            if method == Method.GET.value:
-                return warehouse_view.get_list(request=request, **filters)
-            elif method == Method.POST.value:
-                return warehouse_view.create(request=request)
-        elif "/warehouse" in url:
-            if method == Method.GET.value:
-                if "/suitable-warehouses-for-orders" in url:
-                    return warehouse_view.suitable_for_order(request=request)
-                elif "/stats/warehouse" in url:
-                    return warehouse_view.most_used_warehouses(request=request, **filters)
-                return warehouse_view.get(request=request)
-            elif method == Method.DELETE.value:
-                return warehouse_view.delete(request=request)
-            elif method == Method.PUT.value:
-                return warehouse_view.update(request=request)
-
-        # Transport`s endpoints
-        elif "/transports" in url:
-            if method == Method.GET.value:
-                return transport_view.get_list(request=request, **filters)
-            elif method == Method.POST.value:
-                return transport_view.create(request=request)
-        elif "/transport" in url:
-            if method == Method.GET.value:
-                return transport_view.get(request=request)
-            elif method == Method.DELETE.value:
-                return transport_view.delete(request=request)
-            elif method == Method.PUT.value:
-                return transport_view.update(request=request)
-
-        elif "/stats" in url:
-            if method == Method.GET.value:
-                if "/lost-items" in url:
-                    return lost_item_view.get_list(request=request)
-                elif "/thrown-items" in url:
-                    return thrown_item_view.get_list(request=request)
+            identity_cache.invalidate(socket_fd)
+            return None
+        elif url == "/batch":
+            return batch_runner.run(request, controller)
 
-        # In case of no route found
-        else:
-            response.status_code = 404
-            response.message = "Route not found."
-            return response.create_response()
+        route, path_params = router.resolve(method, url)
+        return route(request, path_params, filters)
 
     except (ValidationError, DatabaseError) as e:
         response.status_code = e.status_code
@@ -1,17 +1,177 @@
+import os
+import threading
 from contextlib import contextmanager
-from sqlalchemy import create_engine
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from env_loader import db_url, log_db_stats, backend_directory
+
+
+def create_database_engine(url: str) -> Engine:
+    """
+    Creates engine of the database. Besides MySQL, SQLite database can be used for local runs and benchmarks, either
+    file (sqlite:///path/to/file.db) or in-memory one (sqlite://). In-memory database exists only in one connection, so
+    all sessions share it and wait for each other, it is migrated when the first session is opened.
+    :param url: url of the database
+    :return: engine
+    """
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(url)
+
+    if url.database in (None, "", ":memory:"):
+        sqlite_engine = create_engine(
+            url, poolclass=QueuePool, pool_size=1, max_overflow=0, connect_args={"check_same_thread": False}
+        )
+    else:
+        sqlite_engine = create_engine(url, connect_args={"check_same_thread": False})
+
+    @event.listens_for(sqlite_engine, "connect")
+    def configure_connection(dbapi_connection, connection_record) -> None:
+        # pysqlite begins transactions only before changes of data, so savepoints of batches would not be rolled back
+        # properly. Transactions are begun explicitly instead, foreign keys are checked as in MySQL.
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("PRAGMA foreign_keys = ON")
+
+    @event.listens_for(sqlite_engine, "begin")
+    def begin_transaction(connection) -> None:
+        connection.exec_driver_sql("BEGIN")
+
+    return sqlite_engine
 
-from env_loader import db_url
 
 # Creating engine and base
-engine = create_engine(db_url)
+engine = create_database_engine(db_url)
 Base = declarative_base()
+is_in_memory = engine.dialect.name == "sqlite" and engine.url.database in (None, "", ":memory:")
+
+
+class RequestSession(Session):
+    """
+    Session shared by all layers of the request. Commits made inside the request only flush changes, the transaction
+    is committed once, when the request is finished.
+    """
+    def commit(self) -> None:
+        self.flush()
+
+    def rollback(self) -> None:
+        # Inside of the savepoint (request of the batch) only its changes are rolled back
+        savepoint = self.get_nested_transaction()
+        if savepoint is not None:
+            savepoint.rollback()
+        else:
+            super().rollback()
+
+
+class QueryStats:
+    """
+    Number of connections checked out from the pool and statements issued during the request.
+    """
+    def __init__(self):
+        self.connections = 0
+        self.statements = 0
+
+
+current_session = ContextVar("current_session", default=None)
+current_stats = ContextVar("current_stats", default=None)
+
+
+@event.listens_for(engine, "checkout")
+def count_checkout(*args) -> None:
+    stats = current_stats.get()
+    if stats is not None:
+        stats.connections += 1
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(*args) -> None:
+    stats = current_stats.get()
+    if stats is not None:
+        stats.statements += 1
+
+
+in_memory_migration_lock = threading.Lock()
+is_in_memory_migrated = False
+
+
+def migrate_in_memory_database() -> None:
+    """
+    Applies migrations to the in-memory database once, it can not be migrated by alembic command because it lives only
+    in this process. Migrations use the session of the migration, so they run in its connection.
+    """
+    global is_in_memory_migrated
+    if not is_in_memory or is_in_memory_migrated:
+        return
+
+    with in_memory_migration_lock:
+        if is_in_memory_migrated:
+            return
+        is_in_memory_migrated = True
+
+        from alembic import command
+        from alembic.config import Config
+
+        config = Config()
+        config.set_main_option("script_location", os.path.join(backend_directory, "migrations"))
+
+        with engine.begin() as connection:
+            session = RequestSession(bind=connection)
+            session_token = current_session.set(session)
+            try:
+                config.attributes["connection"] = connection
+                command.upgrade(config, "head")
+                session.flush()
+            finally:
+                session.close()
+                current_session.reset(session_token)
+
+
+@contextmanager
+def request_session(name: str = ""):
+    """
+    Opens session for the whole request, nested calls (and get_session) reuse it. Changes are committed when the
+    outermost block is left and rolled back if it raised an exception.
+    :param name: name of the request, used when statistics of the request are logged
+    """
+    session = current_session.get()
+    if session is not None:
+        yield session
+        return
+
+    migrate_in_memory_database()
+    session = RequestSession(bind=engine)
+    stats = QueryStats()
+    session_token = current_session.set(session)
+    stats_token = current_stats.set(stats)
+    try:
+        yield session
+        Session.commit(session)
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+        current_session.reset(session_token)
+        current_stats.reset(stats_token)
+
+        if log_db_stats:
+            print(f"|DB: {name}; CONNECTIONS: {stats.connections}; STATEMENTS: {stats.statements}|")
 
 
 @contextmanager
 def get_session():
+    # Inside of the request its session is used, it is committed or rolled back by request_session
+    session = current_session.get()
+    if session is not None:
+        yield session
+        return
+
+    migrate_in_memory_database()
     session = Session(bind=engine)
     try:
         yield session
@@ -9,7 +9,8 @@ from db_config import Base
 
 # Importing project`s models
 from models import (User, Company, Vendor, Warehouse, Order, Rack,
-                    Product, OrderItem, Inventory, Transaction, TransactionItem, Transport)
+                    Product, OrderItem, Inventory, Transaction, TransactionItem, Transport, WarehouseReservation,
+                    OrderStatusCounter, DailyWarehouseRollup, DailyProductRollup, AnalyticsVersion, CacheVersion)
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -63,6 +64,12 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # In-memory database is migrated in the connection of the Backend, see db_config.migrate_in_memory_database
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        configure_and_run(connection)
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -70,12 +77,18 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
+        configure_and_run(connection)
+
 
-        with context.begin_transaction():
-            context.run_migrations()
+def configure_and_run(connection) -> None:
+    # SQLite can not alter tables, autogenerated operations are applied by recreating them
+    context.configure(
+        connection=connection, target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite"
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
 
 
 if context.is_offline_mode():
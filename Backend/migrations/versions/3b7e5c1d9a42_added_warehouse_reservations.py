@@ -0,0 +1,80 @@
+"""Added Warehouse Reservations.
+
+Revision ID: 3b7e5c1d9a42
+Revises: 8d98673fa6f3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e5c1d9a42'
+down_revision: Union[str, None] = '8d98673fa6f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tables as they are at this revision, so the backfill does not depend on models and services changed later
+orders = sa.table(
+    'orders',
+    sa.column('order_id', sa.Integer), sa.column('recipient_id', sa.Integer), sa.column('order_type', sa.String),
+    sa.column('order_status', sa.String)
+)
+order_items = sa.table(
+    'order_items', sa.column('order_id', sa.Integer), sa.column('product_id', sa.Integer),
+    sa.column('quantity', sa.Integer)
+)
+products = sa.table('products', sa.column('product_id', sa.Integer), sa.column('volume', sa.Float))
+warehouses = sa.table('warehouses', sa.column('warehouse_id', sa.Integer))
+racks = sa.table('racks', sa.column('rack_id', sa.Integer), sa.column('warehouse_id', sa.Integer))
+inventories = sa.table(
+    'inventories', sa.column('rack_id', sa.Integer), sa.column('product_id', sa.Integer),
+    sa.column('quantity', sa.Integer)
+)
+
+RESERVING_STATUSES = ("submitted", "processing", "delivered")
+
+
+def upgrade() -> None:
+    warehouse_reservations = op.create_table('warehouse_reservations',
+                    sa.Column('warehouse_id', sa.Integer(), nullable=False),
+                    sa.Column('product_id', sa.Integer(), nullable=False),
+                    sa.Column('reserved_quantity', sa.Integer(), nullable=False),
+                    sa.Column('reserved_volume', sa.Numeric(precision=20, scale=4, asdecimal=False), nullable=False),
+                    sa.Column('stock_quantity', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['product_id'], ['products.product_id'], ),
+                    sa.ForeignKeyConstraint(['warehouse_id'], ['warehouses.warehouse_id'], ),
+                    sa.PrimaryKeyConstraint('warehouse_id', 'product_id')
+                    )
+
+    # Filling the ledger with reservations of existing orders and stock of existing inventories
+    reserved = sa.select(
+        orders.c.recipient_id.label('warehouse_id'), order_items.c.product_id,
+        order_items.c.quantity.label('reserved_quantity'),
+        (order_items.c.quantity * products.c.volume).label('reserved_volume'),
+        sa.literal(0).label('stock_quantity')
+    ).select_from(
+        orders.join(order_items, order_items.c.order_id == orders.c.order_id).join(
+            products, products.c.product_id == order_items.c.product_id
+        ).join(warehouses, warehouses.c.warehouse_id == orders.c.recipient_id)
+    ).where(orders.c.order_type == 'to_warehouse', orders.c.order_status.in_(RESERVING_STATUSES))
+    stored = sa.select(
+        racks.c.warehouse_id, inventories.c.product_id, sa.literal(0).label('reserved_quantity'),
+        sa.literal(0).label('reserved_volume'), inventories.c.quantity.label('stock_quantity')
+    ).select_from(inventories.join(racks, racks.c.rack_id == inventories.c.rack_id))
+    rows = sa.union_all(reserved, stored).subquery()
+
+    op.execute(warehouse_reservations.insert().from_select(
+        ['warehouse_id', 'product_id', 'reserved_quantity', 'reserved_volume', 'stock_quantity'],
+        sa.select(
+            rows.c.warehouse_id, rows.c.product_id, sa.func.sum(rows.c.reserved_quantity),
+            sa.func.sum(rows.c.reserved_volume), sa.func.sum(rows.c.stock_quantity)
+        ).group_by(rows.c.warehouse_id, rows.c.product_id)
+    ))
+
+
+def downgrade() -> None:
+    op.drop_table('warehouse_reservations')
@@ -0,0 +1,59 @@
+"""Added Order Totals.
+
+Revision ID: 5c2f8e7a1b63
+Revises: 3b7e5c1d9a42
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2f8e7a1b63'
+down_revision: Union[str, None] = '3b7e5c1d9a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tables as they are at this revision, so the backfill does not depend on models and services changed later
+orders = sa.table(
+    'orders', sa.column('order_id', sa.Integer), sa.column('total_volume', sa.Float),
+    sa.column('total_weight', sa.Float), sa.column('item_count', sa.Integer)
+)
+order_items = sa.table(
+    'order_items', sa.column('order_id', sa.Integer), sa.column('product_id', sa.Integer),
+    sa.column('quantity', sa.Integer)
+)
+products = sa.table(
+    'products', sa.column('product_id', sa.Integer), sa.column('volume', sa.Float), sa.column('weight', sa.Float)
+)
+
+
+def upgrade() -> None:
+    op.add_column('orders', sa.Column('total_volume', sa.Numeric(precision=20, scale=4, asdecimal=False),
+                                      nullable=False, server_default='0'))
+    op.add_column('orders', sa.Column('total_weight', sa.Numeric(precision=20, scale=4, asdecimal=False),
+                                      nullable=False, server_default='0'))
+    op.add_column('orders', sa.Column('item_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Filling totals of existing orders from their items
+    items = sa.select(order_items.c.order_id).join(
+        products, products.c.product_id == order_items.c.product_id
+    ).where(order_items.c.order_id == orders.c.order_id)
+    op.execute(orders.update().values(
+        total_volume=items.with_only_columns(
+            sa.func.coalesce(sa.func.sum(order_items.c.quantity * products.c.volume), 0)
+        ).scalar_subquery(),
+        total_weight=items.with_only_columns(
+            sa.func.coalesce(sa.func.sum(order_items.c.quantity * products.c.weight), 0)
+        ).scalar_subquery(),
+        item_count=items.with_only_columns(sa.func.coalesce(sa.func.sum(order_items.c.quantity), 0)).scalar_subquery()
+    ))
+
+
+def downgrade() -> None:
+    op.drop_column('orders', 'item_count')
+    op.drop_column('orders', 'total_weight')
+    op.drop_column('orders', 'total_volume')
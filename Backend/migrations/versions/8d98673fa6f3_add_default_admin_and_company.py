@@ -12,7 +12,6 @@ from alembic import op
 import sqlalchemy as sa
 
 from db_config import get_session
-from models import User, Company
 from utilities import hash_password
 
 # revision identifiers, used by Alembic.
@@ -30,15 +29,26 @@ def upgrade() -> None:
         load_dotenv()
         admin_password = os.getenv("ADMIN_PASSWORD")
 
-        company = Company(
+        # Tables are described here instead of using models, models have columns added by the later migrations
+        companies = sa.table(
+            "companies", sa.column("company_id"), sa.column("company_name"), sa.column("company_email")
+        )
+        users = sa.table(
+            "users", sa.column("company_id"), sa.column("user_name"), sa.column("user_surname"),
+            sa.column("user_phone"), sa.column("user_email"), sa.column("user_address"), sa.column("user_password"),
+            sa.column("user_role")
+        )
+
+        session.execute(companies.insert().values(
             company_name="Administrating Company",
             company_email="administration_wms@gmail.com"
-        )
-        session.add(company)
-        session.flush()
+        ))
+        company_id = session.execute(
+            sa.select(companies.c.company_id).where(companies.c.company_email == "administration_wms@gmail.com")
+        ).scalar()
 
-        admin = User(
-            company_id=company.company_id,
+        session.execute(users.insert().values(
+            company_id=company_id,
             user_name="System Administrator",
             user_surname="sys_admin",
             user_phone="+998992281448",
@@ -46,8 +56,7 @@ def upgrade() -> None:
             user_address="WMS Administration company street.",
             user_password=hash_password(admin_password).decode("utf8"),
             user_role="admin"
-        )
-        session.add(admin)
+        ))
         session.commit()
     # ### end Alembic commands ###
 
@@ -0,0 +1,27 @@
+"""Added Order Scope Indexes.
+
+Revision ID: 9e4a2d6c8f15
+Revises: 5c2f8e7a1b63
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4a2d6c8f15'
+down_revision: Union[str, None] = '5c2f8e7a1b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_orders_order_type_supplier_id'), 'orders', ['order_type', 'supplier_id'], unique=False)
+    op.create_index(op.f('ix_orders_order_type_recipient_id_created_at'), 'orders',
+                    ['order_type', 'recipient_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_orders_order_type_recipient_id_created_at'), table_name='orders')
+    op.drop_index(op.f('ix_orders_order_type_supplier_id'), table_name='orders')
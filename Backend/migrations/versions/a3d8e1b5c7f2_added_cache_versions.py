@@ -0,0 +1,30 @@
+"""Added Cache Versions.
+
+Revision ID: a3d8e1b5c7f2
+Revises: f2a7c4e9b1d6
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d8e1b5c7f2'
+down_revision: Union[str, None] = 'f2a7c4e9b1d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Missing rows are version 0, so the table starts empty
+    op.create_table('cache_versions',
+                    sa.Column('cache_name', sa.String(length=50), nullable=False),
+                    sa.Column('version', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('cache_name')
+                    )
+
+
+def downgrade() -> None:
+    op.drop_table('cache_versions')
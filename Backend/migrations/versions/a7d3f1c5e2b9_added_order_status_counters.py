@@ -0,0 +1,55 @@
+"""Added Order Status Counters.
+
+Revision ID: a7d3f1c5e2b9
+Revises: 9e4a2d6c8f15
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3f1c5e2b9'
+down_revision: Union[str, None] = '9e4a2d6c8f15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tables as they are at this revision, so the backfill does not depend on models and services changed later
+orders = sa.table(
+    'orders', sa.column('supplier_id', sa.Integer), sa.column('recipient_id', sa.Integer),
+    sa.column('order_type', sa.String), sa.column('order_status', sa.String)
+)
+
+# Type of orders supplied by the party, orders of other types are received by it
+SUPPLIED_ORDER_TYPES = {"warehouse": "from_warehouse", "vendor": "to_warehouse"}
+
+
+def upgrade() -> None:
+    order_status_counters = op.create_table('order_status_counters',
+                    sa.Column('party_type', sa.Enum('warehouse', 'vendor', name='party_type'), nullable=False),
+                    sa.Column('party_id', sa.Integer(), nullable=False),
+                    sa.Column('order_status',
+                              sa.Enum('new', 'processing', 'submitted', 'finished', 'cancelled', 'delivered', 'lost',
+                                      'damaged', name='order_status'), nullable=False),
+                    sa.Column('order_count', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('party_type', 'party_id', 'order_status')
+                    )
+
+    # Counting existing orders
+    for party, supplied_order_type in SUPPLIED_ORDER_TYPES.items():
+        party_id = sa.case(
+            (orders.c.order_type == supplied_order_type, orders.c.supplier_id), else_=orders.c.recipient_id
+        )
+        op.execute(order_status_counters.insert().from_select(
+            ['party_type', 'party_id', 'order_status', 'order_count'],
+            sa.select(sa.literal(party), party_id, orders.c.order_status, sa.func.count()).group_by(
+                party_id, orders.c.order_status
+            )
+        ))
+
+
+def downgrade() -> None:
+    op.drop_table('order_status_counters')
@@ -0,0 +1,89 @@
+"""Added Daily Rollups.
+
+Revision ID: c4b8e2f6a9d1
+Revises: a7d3f1c5e2b9
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4b8e2f6a9d1'
+down_revision: Union[str, None] = 'a7d3f1c5e2b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tables as they are at this revision, so the backfill does not depend on models and services changed later
+orders = sa.table(
+    'orders',
+    sa.column('order_id', sa.Integer), sa.column('supplier_id', sa.Integer), sa.column('recipient_id', sa.Integer),
+    sa.column('order_type', sa.String), sa.column('order_status', sa.String), sa.column('created_at', sa.DateTime),
+    sa.column('total_volume', sa.Float), sa.column('total_price', sa.Float), sa.column('item_count', sa.Integer)
+)
+lost_items = sa.table(
+    'lost_items', sa.column('order_id', sa.Integer), sa.column('product_id', sa.Integer),
+    sa.column('quantity', sa.Integer)
+)
+thrown_items = sa.table(
+    'thrown_items', sa.column('warehouse_id', sa.Integer), sa.column('product_id', sa.Integer),
+    sa.column('quantity', sa.Integer), sa.column('thrown_at', sa.DateTime)
+)
+
+
+def upgrade() -> None:
+    daily_warehouse_rollups = op.create_table('daily_warehouse_rollups',
+                    sa.Column('day', sa.Date(), nullable=False),
+                    sa.Column('warehouse_id', sa.Integer(), nullable=False),
+                    sa.Column('finished_orders', sa.Integer(), nullable=False),
+                    sa.Column('finished_volume', sa.Numeric(precision=20, scale=4, asdecimal=False), nullable=False),
+                    sa.Column('finished_price', sa.Numeric(precision=20, scale=2, asdecimal=False), nullable=False),
+                    sa.PrimaryKeyConstraint('day', 'warehouse_id')
+                    )
+    daily_product_rollups = op.create_table('daily_product_rollups',
+                    sa.Column('day', sa.Date(), nullable=False),
+                    sa.Column('warehouse_id', sa.Integer(), nullable=False),
+                    sa.Column('product_id', sa.Integer(), nullable=False),
+                    sa.Column('lost_quantity', sa.Integer(), nullable=False),
+                    sa.Column('thrown_quantity', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('day', 'warehouse_id', 'product_id')
+                    )
+
+    # Filling rollups from existing orders, lost and thrown items
+    # Orders supplied by the warehouse are counted for the supplier, other orders for the recipient
+    warehouse_id = sa.case(
+        (orders.c.order_type == 'from_warehouse', orders.c.supplier_id), else_=orders.c.recipient_id
+    )
+    order_day = sa.func.date(orders.c.created_at)
+    op.execute(daily_warehouse_rollups.insert().from_select(
+        ['day', 'warehouse_id', 'finished_orders', 'finished_volume', 'finished_price'],
+        sa.select(
+            order_day, warehouse_id, sa.func.count(), sa.func.coalesce(sa.func.sum(orders.c.total_volume), 0),
+            sa.func.coalesce(sa.func.sum(orders.c.total_price), 0)
+        ).where(orders.c.order_status == 'finished', orders.c.item_count > 0).group_by(order_day, warehouse_id)
+    ))
+
+    lost = sa.select(
+        order_day.label('day'), warehouse_id.label('warehouse_id'), lost_items.c.product_id,
+        lost_items.c.quantity.label('lost_quantity'), sa.literal(0).label('thrown_quantity')
+    ).select_from(lost_items.join(orders, orders.c.order_id == lost_items.c.order_id))
+    thrown = sa.select(
+        sa.func.date(thrown_items.c.thrown_at).label('day'), thrown_items.c.warehouse_id, thrown_items.c.product_id,
+        sa.literal(0).label('lost_quantity'), thrown_items.c.quantity.label('thrown_quantity')
+    )
+    rows = sa.union_all(lost, thrown).subquery()
+    op.execute(daily_product_rollups.insert().from_select(
+        ['day', 'warehouse_id', 'product_id', 'lost_quantity', 'thrown_quantity'],
+        sa.select(
+            rows.c.day, rows.c.warehouse_id, rows.c.product_id, sa.func.sum(rows.c.lost_quantity),
+            sa.func.sum(rows.c.thrown_quantity)
+        ).group_by(rows.c.day, rows.c.warehouse_id, rows.c.product_id)
+    ))
+
+
+def downgrade() -> None:
+    op.drop_table('daily_product_rollups')
+    op.drop_table('daily_warehouse_rollups')
@@ -0,0 +1,31 @@
+"""Added Analytics Versions.
+
+Revision ID: d9f3a6b1c7e4
+Revises: c4b8e2f6a9d1
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9f3a6b1c7e4'
+down_revision: Union[str, None] = 'c4b8e2f6a9d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Missing rows are version 0, so the table starts empty
+    op.create_table('analytics_versions',
+                    sa.Column('company_id', sa.Integer(), nullable=False),
+                    sa.Column('dataset', sa.Enum('inventory', 'movements', name='analytics_dataset'), nullable=False),
+                    sa.Column('version', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('company_id', 'dataset')
+                    )
+
+
+def downgrade() -> None:
+    op.drop_table('analytics_versions')
@@ -0,0 +1,44 @@
+"""Added Query Pattern Indexes.
+
+Revision ID: e6b2c9d4f8a3
+Revises: d9f3a6b1c7e4
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b2c9d4f8a3'
+down_revision: Union[str, None] = 'd9f3a6b1c7e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Indexes of columns by which hot requests select rows (see check_query_plans.py)
+INDEXES = (
+    ('ix_warehouses_company_id', 'warehouses', ['company_id']),
+    ('ix_warehouses_supervisor_id', 'warehouses', ['supervisor_id']),
+    ('ix_users_company_id', 'users', ['company_id']),
+    ('ix_products_company_id', 'products', ['company_id']),
+    ('ix_vendors_vendor_owner_id', 'vendors', ['vendor_owner_id']),
+    ('ix_inventories_product_id', 'inventories', ['product_id']),
+    ('ix_racks_warehouse_id_rack_position', 'racks', ['warehouse_id', 'rack_position']),
+    ('ix_thrown_items_warehouse_id_thrown_at', 'thrown_items', ['warehouse_id', 'thrown_at']),
+    ('ix_orders_order_type_supplier_id_created_at', 'orders', ['order_type', 'supplier_id', 'created_at']),
+)
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(op.f(name), table, columns, unique=False)
+
+    # Supplied orders are listed by their creation date like received ones, the new index starts with the same columns
+    op.drop_index(op.f('ix_orders_order_type_supplier_id'), table_name='orders')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_orders_order_type_supplier_id'), 'orders', ['order_type', 'supplier_id'], unique=False)
+
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(op.f(name), table_name=table)
@@ -20,19 +20,28 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     # ### commands auto generated by Alembic - please adjust! ###
-    op.add_column('orders', sa.Column('transport_id', sa.Integer(), nullable=True))
-    op.create_foreign_key(None, 'orders', 'transports', ['transport_id'], ['transport_id'])
-    op.add_column('transactions', sa.Column('transport_id', sa.Integer(), nullable=True))
-    op.create_foreign_key(None, 'transactions', 'transports', ['transport_id'], ['transport_id'])
-    op.create_foreign_key(None, 'warehouses', 'users', ['supervisor_id'], ['user_id'])
+    # Batch operations are plain ALTERs on MySQL, SQLite can not alter constraints, so its tables are recreated
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.add_column(sa.Column('transport_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_orders_transport_id_transports', 'transports', ['transport_id'],
+                                    ['transport_id'])
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.add_column(sa.Column('transport_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_transactions_transport_id_transports', 'transports', ['transport_id'],
+                                    ['transport_id'])
+    with op.batch_alter_table('warehouses') as batch_op:
+        batch_op.create_foreign_key('fk_warehouses_supervisor_id_users', 'users', ['supervisor_id'], ['user_id'])
     # ### end Alembic commands ###
 
 
 def downgrade() -> None:
     # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_constraint(None, 'warehouses', type_='foreignkey')
-    op.drop_constraint(None, 'transactions', type_='foreignkey')
-    op.drop_column('transactions', 'transport_id')
-    op.drop_constraint(None, 'orders', type_='foreignkey')
-    op.drop_column('orders', 'transport_id')
+    with op.batch_alter_table('warehouses') as batch_op:
+        batch_op.drop_constraint('fk_warehouses_supervisor_id_users', type_='foreignkey')
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_constraint('fk_transactions_transport_id_transports', type_='foreignkey')
+        batch_op.drop_column('transport_id')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_constraint('fk_orders_transport_id_transports', type_='foreignkey')
+        batch_op.drop_column('transport_id')
     # ### end Alembic commands ###
@@ -0,0 +1,27 @@
+"""Added User Token Versions.
+
+Revision ID: f2a7c4e9b1d6
+Revises: e6b2c9d4f8a3
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c4e9b1d6'
+down_revision: Union[str, None] = 'e6b2c9d4f8a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Tokens issued before have no version, they are accepted as version 0
+    op.add_column('users', sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('token_version')
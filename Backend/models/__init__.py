@@ -12,3 +12,9 @@ from .user import User
 from .warehouse import Warehouse
 from .transport import Transport
 from .thrown_items import ThrownItem
+from .warehouse_reservation import WarehouseReservation
+from .order_status_counter import OrderStatusCounter
+from .daily_warehouse_rollup import DailyWarehouseRollup
+from .daily_product_rollup import DailyProductRollup
+from .analytics_version import AnalyticsVersion
+from .cache_version import CacheVersion
@@ -0,0 +1,22 @@
+from sqlalchemy import Integer, Column, Enum
+from db_config import Base
+
+
+class AnalyticsVersion(Base):
+    """
+    Version of the company`s data analysed by services.analytics: inventories of its warehouses or items of their
+    orders. Version is increased together with every change of the data, so cached arrays are reloaded only after it
+    changed.
+    """
+    __tablename__ = "analytics_versions"
+
+    company_id = Column(Integer, primary_key=True)
+    dataset = Column(Enum("inventory", "movements", name="analytics_dataset"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    def to_dict(self, cascade_fields: list[str] = ()):
+        return {
+            "company_id": self.company_id,
+            "dataset": self.dataset,
+            "version": self.version
+        }
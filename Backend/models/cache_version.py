@@ -0,0 +1,20 @@
+from sqlalchemy import Integer, Column, String
+from db_config import Base
+
+
+class CacheVersion(Base):
+    """
+    Version of a cache which every process keeps in memory (identities of requesters, scopes of orders). Version is
+    increased together with changes which make cached values stale, so processes which did not make them drop the cache
+    too.
+    """
+    __tablename__ = "cache_versions"
+
+    cache_name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    def to_dict(self, cascade_fields: list[str] = ()):
+        return {
+            "cache_name": self.cache_name,
+            "version": self.version
+        }
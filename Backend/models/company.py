@@ -1,6 +1,6 @@
 from sqlalchemy.orm import relationship
 from sqlalchemy import Column, Integer, String
-from db_config import Base, get_session
+from db_config import Base
 
 
 class Company(Base):
@@ -15,12 +15,16 @@ class Company(Base):
     users = relationship("User", back_populates="company")
     warehouses = relationship("Warehouse", back_populates="company")
 
+    # Relationships accessed by to_dict, see models.loading
+    serialized_relationships = ("warehouses",)
+    cascade_relationships = {"warehouses": (("warehouses", ("company", "supervisor")),)}
+
     def to_dict(self, cascade_fields: list[str] = ()):
-        with get_session() as session:
-            company = session.query(Company).filter(Company.company_id == self.company_id).first()
-            return {
-                "company_id": self.company_id,
-                "company_name": self.company_name,
-                "company_email": self.company_email,
-                "warehouses": [warehouse.to_dict() for warehouse in company.warehouses] if "warehouses" in cascade_fields else [w.warehouse_id for w in company.warehouses],
-            }
+        return {
+            "company_id": self.company_id,
+            "company_name": self.company_name,
+            "company_email": self.company_email,
+            "warehouses": [
+                w.to_dict() if "warehouses" in cascade_fields else w.warehouse_id for w in self.warehouses
+            ],
+        }
@@ -0,0 +1,25 @@
+from sqlalchemy import Integer, Column, Date
+from db_config import Base
+
+
+class DailyProductRollup(Base):
+    """
+    Products lost in orders of the warehouse (by days of the orders` creation) and thrown away from the warehouse (by
+    days they were thrown). Rows are maintained by services.rollups together with changes of lost and thrown items.
+    """
+    __tablename__ = "daily_product_rollups"
+
+    day = Column(Date, primary_key=True)
+    warehouse_id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    lost_quantity = Column(Integer, nullable=False, default=0)
+    thrown_quantity = Column(Integer, nullable=False, default=0)
+
+    def to_dict(self, cascade_fields: list[str] = ()):
+        return {
+            "day": self.day.strftime('%Y-%m-%d') if self.day else None,
+            "warehouse_id": self.warehouse_id,
+            "product_id": self.product_id,
+            "lost_quantity": self.lost_quantity,
+            "thrown_quantity": self.thrown_quantity
+        }
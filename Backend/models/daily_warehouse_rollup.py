@@ -0,0 +1,25 @@
+from sqlalchemy import Integer, Column, Date, Numeric
+from db_config import Base
+
+
+class DailyWarehouseRollup(Base):
+    """
+    Finished orders of the warehouse by days of their creation: number of orders, their volume and price. Rows are
+    maintained by services.rollups together with changes of orders.
+    """
+    __tablename__ = "daily_warehouse_rollups"
+
+    day = Column(Date, primary_key=True)
+    warehouse_id = Column(Integer, primary_key=True)
+    finished_orders = Column(Integer, nullable=False, default=0)
+    finished_volume = Column(Numeric(precision=20, scale=4, asdecimal=False), nullable=False, default=0)
+    finished_price = Column(Numeric(precision=20, scale=2, asdecimal=False), nullable=False, default=0)
+
+    def to_dict(self, cascade_fields: list[str] = ()):
+        return {
+            "day": self.day.strftime('%Y-%m-%d') if self.day else None,
+            "warehouse_id": self.warehouse_id,
+            "finished_orders": self.finished_orders,
+            "finished_volume": self.finished_volume,
+            "finished_price": self.finished_price
+        }
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import relationship
 from sqlalchemy import Integer, Column, ForeignKey, UniqueConstraint, Date, Numeric, event
-from db_config import Base, get_session
+from db_config import Base
 
 
 class Inventory(Base):
@@ -8,7 +8,7 @@ class Inventory(Base):
 
     inventory_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     rack_id = Column(Integer, ForeignKey("racks.rack_id"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.product_id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.product_id"), index=True, nullable=False)
     quantity = Column(Integer, nullable=False)
     total_volume = Column(Numeric(precision=20, scale=2, asdecimal=False), default=0, nullable=False)
     arrival_date = Column(Date, nullable=False)
@@ -23,18 +23,19 @@ class Inventory(Base):
         UniqueConstraint("rack_id", "product_id"),
     )
 
+    # Relationships accessed by to_dict, see models.loading
+    cascade_relationships = {"rack": (("rack", ()),), "product": (("product", ()),)}
+
     def to_dict(self, cascade_fields: list[str] = ("rack", "product")):
-        with get_session() as session:
-            inventory = session.query(Inventory).filter(Inventory.inventory_id == self.inventory_id).first()
-            return {
-                "inventory_id": self.inventory_id,
-                "rack": inventory.rack.to_dict(cascade_fields=[]) if "rack" in cascade_fields else self.rack_id,
-                "product": inventory.product.to_dict(cascade_fields=[]) if "product" in cascade_fields else self.product_id,
-                "quantity": self.quantity,
-                "total_volume": self.total_volume,
-                "arrival_date": self.arrival_date.strftime("%Y-%m-%d"),
-                "expiry_date": self.expiry_date.strftime("%Y-%m-%d")
-            }
+        return {
+            "inventory_id": self.inventory_id,
+            "rack": self.rack.to_dict(cascade_fields=[]) if "rack" in cascade_fields else self.rack_id,
+            "product": self.product.to_dict(cascade_fields=[]) if "product" in cascade_fields else self.product_id,
+            "quantity": self.quantity,
+            "total_volume": self.total_volume,
+            "arrival_date": self.arrival_date.strftime("%Y-%m-%d"),
+            "expiry_date": self.expiry_date.strftime("%Y-%m-%d")
+        }
 
 
 # Event listeners (like triggers in SQL)
@@ -0,0 +1,27 @@
+from sqlalchemy.orm import joinedload, selectinload
+
+
+def eager_load_options(model, cascade_fields=()) -> list:
+    """
+    Builds loader options for everything model`s to_dict accesses with the given cascade fields, so serialization of
+    the list of instances does not issue a query per instance. Models declare relationships used by to_dict:
+    serialized_relationships are always accessed (e.g. list of ids), cascade_relationships maps cascade field to the
+    expanded relationships together with cascade fields of their to_dict.
+    Collections are loaded with selectinload, single objects are joined.
+    :param model: model class which instances will be serialized
+    :param cascade_fields: cascade fields passed to to_dict
+    :return: list of loader options
+    """
+    relationships = [(name, ()) for name in getattr(model, "serialized_relationships", ())]
+    for field in cascade_fields:
+        relationships.extend(getattr(model, "cascade_relationships", {}).get(field, ()))
+
+    options = []
+    for name, nested_cascade_fields in relationships:
+        attribute = getattr(model, name)
+        option = selectinload(attribute) if attribute.property.uselist else joinedload(attribute)
+
+        nested_options = eager_load_options(attribute.property.mapper.class_, nested_cascade_fields)
+        options.append(option.options(*nested_options) if nested_options else option)
+
+    return options
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import relationship
 from sqlalchemy import Integer, Column, ForeignKey, CheckConstraint, UniqueConstraint
-from db_config import Base, get_session
+from db_config import Base
 
 
 class LostItem(Base):
@@ -21,12 +21,13 @@ class LostItem(Base):
         UniqueConstraint("order_id", "product_id")
     )
 
+    # Relationships accessed by to_dict, see models.loading
+    cascade_relationships = {"order": (("order", ()),), "product": (("product", ()),)}
+
     def to_dict(self, cascade_fields: list[str] = ("order", "product")):
-        with get_session() as session:
-            lost_item = session.query(LostItem).filter(LostItem.order_id == self.order_id).first()
-            return {
-                "lost_item_id": self.lost_item_id,
-                "order": lost_item.order.to_dict(cascade_fields=[]) if "order" in cascade_fields else self.order_id,
-                "product": lost_item.product.to_dict(cascade_fields=[]) if "product" in cascade_fields else self.product_id,
-                "quantity": self.quantity
-            }
+        return {
+            "lost_item_id": self.lost_item_id,
+            "order": self.order.to_dict(cascade_fields=[]) if "order" in cascade_fields else self.order_id,
+            "product": self.product.to_dict(cascade_fields=[]) if "product" in cascade_fields else self.product_id,
+            "quantity": self.quantity
+        }
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import relationship
-from sqlalchemy import Integer, Column, Enum, Numeric, CheckConstraint, DateTime, func, ForeignKey
-from db_config import Base, get_session
+from sqlalchemy import Integer, Column, Enum, Numeric, CheckConstraint, DateTime, func, ForeignKey, Index
+from db_config import Base
 
 
 class Order(Base):
@@ -11,6 +11,10 @@ class Order(Base):
     recipient_id = Column(Integer, nullable=False)
     transport_id = Column(ForeignKey("transports.transport_id"), nullable=True)
     total_price = Column(Numeric(precision=20, scale=2, asdecimal=False), nullable=False)
+    # Totals of the order`s items, maintained by services.order_totals when items are changed
+    total_volume = Column(Numeric(precision=20, scale=4, asdecimal=False), nullable=False, default=0)
+    total_weight = Column(Numeric(precision=20, scale=4, asdecimal=False), nullable=False, default=0)
+    item_count = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime, default=func.now(), nullable=False)
     updated_at = Column(DateTime, onupdate=func.now(), nullable=True)
     order_status = Column(
@@ -61,21 +65,38 @@ class Order(Base):
     # Constraints
     __table_args__ = (
         CheckConstraint("total_price >= 0", name="check_total_price"),
+        # Scopes of orders (services.scopes) match order_type together with supplier or recipient
+        Index("ix_orders_order_type_supplier_id_created_at", "order_type", "supplier_id", "created_at"),
+        Index("ix_orders_order_type_recipient_id_created_at", "order_type", "recipient_id", "created_at"),
     )
 
+    # Relationships accessed by to_dict, see models.loading
+    cascade_relationships = {
+        "supplier": (("supplier_warehouse", ()), ("supplier_vendor", ())),
+        "recipient": (("recipient_warehouse", ()), ("recipient_vendor", ())),
+        "transport": (("transport", ()),)
+    }
+
+    @property
+    def supplier(self):
+        return self.supplier_warehouse if self.order_type == "from_warehouse" else self.supplier_vendor
+
+    @property
+    def recipient(self):
+        return self.recipient_warehouse if self.order_type == "to_warehouse" else self.recipient_vendor
+
     def to_dict(self, cascade_fields: list[str] = ("supplier", "recipient", "transport")):
-        with get_session() as session:
-            order = session.query(Order).filter(Order.order_id == self.order_id).first()
-            supplier = order.supplier_warehouse if order.order_type == "from_warehouse" else order.supplier_vendor
-            recipient = order.recipient_warehouse if order.order_type == "to_warehouse" else order.recipient_vendor
-            return {
-                "order_id": self.order_id,
-                "supplier": supplier.to_dict(cascade_fields=[]) if "supplier" in cascade_fields else self.supplier_id,
-                "recipient": recipient.to_dict(cascade_fields=[]) if "recipient" in cascade_fields else self.recipient_id,
-                "total_price": self.total_price,
-                "created_at": self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
-                "updated_at": self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None,
-                "order_status": self.order_status,
-                "order_type": self.order_type,
-                "transport": self.transport.to_dict() if self.transport and "transport" in cascade_fields else self.transport_id or "",
-            }
+        return {
+            "order_id": self.order_id,
+            "supplier": self.supplier.to_dict(cascade_fields=[]) if "supplier" in cascade_fields else self.supplier_id,
+            "recipient": self.recipient.to_dict(cascade_fields=[]) if "recipient" in cascade_fields else self.recipient_id,
+            "total_price": self.total_price,
+            "total_volume": self.total_volume,
+            "total_weight": self.total_weight,
+            "item_count": self.item_count,
+            "created_at": self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            "updated_at": self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None,
+            "order_status": self.order_status,
+            "order_type": self.order_type,
+            "transport": self.transport.to_dict() if "transport" in cascade_fields and self.transport else self.transport_id or "",
+        }
@@ -0,0 +1,27 @@
+from sqlalchemy import Integer, Column, Enum
+from db_config import Base
+
+
+class OrderStatusCounter(Base):
+    """
+    Number of orders of the warehouse or vendor in each status. Every order is counted once for its warehouse and once
+    for its vendor. Rows are maintained by services.status_counters together with changes of orders.
+    """
+    __tablename__ = "order_status_counters"
+
+    party_type = Column(Enum("warehouse", "vendor", name="party_type"), primary_key=True)
+    party_id = Column(Integer, primary_key=True)
+    order_status = Column(
+        Enum("new", "processing", "submitted", "finished", "cancelled", "delivered", "lost", "damaged",
+             name="order_status"),
+        primary_key=True
+    )
+    order_count = Column(Integer, nullable=False, default=0)
+
+    def to_dict(self, cascade_fields: list[str] = ()):
+        return {
+            "party_type": self.party_type,
+            "party_id": self.party_id,
+            "order_status": self.order_status,
+            "order_count": self.order_count
+        }
@@ -1,13 +1,13 @@
 from sqlalchemy.orm import relationship
 from sqlalchemy import Column, Integer, String, Numeric, CheckConstraint, ForeignKey, Boolean, Enum
-from db_config import Base, get_session
+from db_config import Base
 
 
 class Product(Base):
     __tablename__ = "products"
 
     product_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    company_id = Column(Integer, ForeignKey("companies.company_id"), nullable=False)
+    company_id = Column(Integer, ForeignKey("companies.company_id"), index=True, nullable=False)
     product_name = Column(String(100), index=True, nullable=False)
     description = Column(String(255), index=True, nullable=False)
     weight = Column(Numeric(precision=20, scale=4, asdecimal=False), nullable=False)
@@ -32,18 +32,19 @@ class Product(Base):
         CheckConstraint("price >= 0", name="check_price")
     )
 
+    # Relationships accessed by to_dict, see models.loading
+    cascade_relationships = {"company": (("company", ()),)}
+
     def to_dict(self, cascade_fields: list[str] = ("company",)):
-        with get_session() as session:
-            product = session.query(Product).filter(Product.product_id == self.product_id).first()
-            return {
-                "product_id": self.product_id,
-                "company": product.company.to_dict(cascade_fields=[]) if "company" in cascade_fields else self.company_id,
-                "product_name": self.product_name,
-                "description": self.description,
-                "weight": self.weight,
-                "volume": self.volume,
-                "price": self.price,
-                "expiry_duration": self.expiry_duration,
-                "is_stackable": self.is_stackable,
-                "product_type": self.product_type
-            }
+        return {
+            "product_id": self.product_id,
+            "company": self.company.to_dict(cascade_fields=[]) if "company" in cascade_fields else self.company_id,
+            "product_name": self.product_name,
+            "description": self.description,
+            "weight": self.weight,
+            "volume": self.volume,
+            "price": self.price,
+            "expiry_duration": self.expiry_duration,
+            "is_stackable": self.is_stackable,
+            "product_type": self.product_type
+        }
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, CheckConstraint, event
-from db_config import Base, get_session
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, CheckConstraint, Index, event
+from db_config import Base
 
 
 class Rack(Base):
@@ -19,20 +19,24 @@ class Rack(Base):
     # Constraints
     __table_args__ = (
         CheckConstraint("remaining_capacity <= overall_capacity", name="check_remaining_capacity"),
-        CheckConstraint("overall_capacity > 0", name="check_overall_capacity")
+        CheckConstraint("overall_capacity > 0", name="check_overall_capacity"),
+        # Racks of a warehouse are listed and picked in order of their positions
+        Index("ix_racks_warehouse_id_rack_position", "warehouse_id", "rack_position"),
     )
 
+    # Relationships accessed by to_dict, see models.loading
+    serialized_relationships = ("inventories",)
+    cascade_relationships = {"warehouse": (("warehouse", ()),)}
+
     def to_dict(self, cascade_fields: list[str] = ("warehouse",)):
-        with get_session() as session:
-            rack = session.query(Rack).filter(Rack.rack_id == self.rack_id).first()
-            return {
-                "rack_id": self.rack_id,
-                "warehouse": rack.warehouse.to_dict(cascade_fields=[]) if "warehouse" in cascade_fields else self.warehouse_id,
-                "rack_position": self.rack_position,
-                "overall_capacity": self.overall_capacity,
-                "remaining_capacity": self.remaining_capacity,
-                "inventories": [inventory.to_dict(cascade_fields=[]) for inventory in rack.inventories] if rack else []
-            }
+        return {
+            "rack_id": self.rack_id,
+            "warehouse": self.warehouse.to_dict(cascade_fields=[]) if "warehouse" in cascade_fields else self.warehouse_id,
+            "rack_position": self.rack_position,
+            "overall_capacity": self.overall_capacity,
+            "remaining_capacity": self.remaining_capacity,
+            "inventories": [inventory.to_dict(cascade_fields=[]) for inventory in self.inventories]
+        }
 
 
 # Event listeners (like triggers in SQL)
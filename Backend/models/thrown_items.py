@@ -1,6 +1,6 @@
 from sqlalchemy.orm import relationship
-from sqlalchemy import Integer, Column, ForeignKey, CheckConstraint, UniqueConstraint, DateTime, func
-from db_config import Base, get_session
+from sqlalchemy import Integer, Column, ForeignKey, CheckConstraint, UniqueConstraint, DateTime, Index, func
+from db_config import Base
 
 
 class ThrownItem(Base):
@@ -19,16 +19,19 @@ class ThrownItem(Base):
     # Constraints
     __table_args__ = (
         CheckConstraint("quantity > 0", name="check_quantity"),
-        UniqueConstraint("warehouse_id", "product_id", "thrown_at")
+        UniqueConstraint("warehouse_id", "product_id", "thrown_at"),
+        # Thrown items of warehouses are selected by the date they were thrown at
+        Index("ix_thrown_items_warehouse_id_thrown_at", "warehouse_id", "thrown_at"),
     )
 
+    # Relationships accessed by to_dict, see models.loading
+    cascade_relationships = {"warehouse": (("warehouse", ()),), "product": (("product", ()),)}
+
     def to_dict(self, cascade_fields: list[str] = ("warehouse", "product")):
-        with get_session() as session:
-            thrown_item = session.query(ThrownItem).filter(ThrownItem.warehouse_id == self.warehouse_id, ThrownItem.product_id == self.product_id, ThrownItem.thrown_at == self.thrown_at).first()
-            return {
-                "lost_item_id": self.lost_item_id,
-                "warehouse": thrown_item.warehouse.to_dict(cascade_fields=[]) if "warehouse" in cascade_fields else self.warehouse_id,
-                "product": thrown_item.product.to_dict(cascade_fields=[]) if "product" in cascade_fields else self.product_id,
-                "quantity": self.quantity,
-                "thrown_at": self.thrown_at
-            }
\ No newline at end of file
+        return {
+            "thrown_item_id": self.thrown_item_id,
+            "warehouse": self.warehouse.to_dict(cascade_fields=[]) if "warehouse" in cascade_fields else self.warehouse_id,
+            "product": self.product.to_dict(cascade_fields=[]) if "product" in cascade_fields else self.product_id,
+            "quantity": self.quantity,
+            "thrown_at": self.thrown_at
+        }
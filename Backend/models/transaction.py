@@ -1,6 +1,6 @@
 from sqlalchemy.orm import relationship
 from sqlalchemy import Integer, Column, Enum, ForeignKey, CheckConstraint, DateTime, Boolean, Numeric, func
-from db_config import Base, get_session
+from db_config import Base
 
 
 class Transaction(Base):
@@ -30,12 +30,16 @@ class Transaction(Base):
         CheckConstraint("recipient_id <> supplier_id", name="check_recipient_supplier"),
     )
 
-    def to_dict(self, cascade_filters: list[str] = ("supplier", "recipient_warehouse")):
-        with get_session() as session:
-            transaction = session.query(Transaction).filter(Transaction.transaction_id == self.transaction_id).first()
-            return {
-                "transaction_id": self.transaction_id,
-                "supplier": transaction.supplier.to_dict(cascade_filters=[]) if "supplier" in cascade_filters else self.supplier_id,
-                "recipient_warehouse": transaction.recipient_warehouse.to_dict(cascade_filters=[]) if "recipient_warehouse" in cascade_filters else self.recipient_id,
-                "status": self.status
-            }
+    # Relationships accessed by to_dict, see models.loading
+    cascade_relationships = {
+        "supplier": (("supplier", ()),),
+        "recipient_warehouse": (("recipient_warehouse", ()),)
+    }
+
+    def to_dict(self, cascade_fields: list[str] = ("supplier", "recipient_warehouse")):
+        return {
+            "transaction_id": self.transaction_id,
+            "supplier": self.supplier.to_dict(cascade_fields=[]) if "supplier" in cascade_fields else self.supplier_id,
+            "recipient_warehouse": self.recipient_warehouse.to_dict(cascade_fields=[]) if "recipient_warehouse" in cascade_fields else self.recipient_id,
+            "status": self.status
+        }
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import relationship
 from sqlalchemy import Integer, Column, ForeignKey, CheckConstraint, UniqueConstraint
-from db_config import Base, get_session
+from db_config import Base
 
 
 class TransactionItem(Base):
@@ -21,12 +21,13 @@ class TransactionItem(Base):
         UniqueConstraint("product_id", "transaction_id")
     )
 
-    def to_dict(self, cascade_filters: list[str] = ("transaction", "product")):
-        with get_session() as session:
-            transaction_item = session.query(TransactionItem).filter(TransactionItem.transaction_item_id == self.transaction_item_id).first()
-            return {
-                "transaction_item_id": self.transaction_item_id,
-                "transaction": transaction_item.transaction.to_dict(cascade_filters=[]) if "transaction" in cascade_filters else self.transaction_id,
-                "product": transaction_item.product.to_dict(cascade_filters=[]) if "product" in cascade_filters else self.product_id,
-                "quantity": self.quantity
-            }
+    # Relationships accessed by to_dict, see models.loading
+    cascade_relationships = {"transaction": (("transaction", ()),), "product": (("product", ()),)}
+
+    def to_dict(self, cascade_fields: list[str] = ("transaction", "product")):
+        return {
+            "transaction_item_id": self.transaction_item_id,
+            "transaction": self.transaction.to_dict(cascade_fields=[]) if "transaction" in cascade_fields else self.transaction_id,
+            "product": self.product.to_dict(cascade_fields=[]) if "product" in cascade_fields else self.product_id,
+            "quantity": self.quantity
+        }
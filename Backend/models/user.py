@@ -1,13 +1,13 @@
 from sqlalchemy import Column, Integer, String, ForeignKey, Enum, Boolean
 from sqlalchemy.orm import relationship
-from db_config import Base, get_session
+from db_config import Base
 
 
 class User(Base):
     __tablename__ = "users"
 
     user_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    company_id = Column(Integer, ForeignKey("companies.company_id"), nullable=False)
+    company_id = Column(Integer, ForeignKey("companies.company_id"), index=True, nullable=False)
     user_name = Column(String(100), index=True, nullable=False)
     user_surname = Column(String(100), index=True, nullable=False)
     user_phone = Column(String(15), unique=True, index=True, nullable=False)
@@ -16,26 +16,33 @@ class User(Base):
     user_password = Column(String(255), nullable=False)
     is_password_forgotten = Column(Boolean, nullable=False)
     user_role = Column(Enum("manager", "supervisor", "vendor", "admin", name="user_role"), nullable=False)
+    # Tokens are valid only while they carry the current version, it is increased to revoke them
+    token_version = Column(Integer, nullable=False, default=0)
 
     # Relationships with other tables
     company = relationship("Company", back_populates="users")
     vendors = relationship("Vendor", back_populates="vendor_owner")
     warehouses = relationship("Warehouse", back_populates="supervisor")
 
+    # Relationships accessed by to_dict, see models.loading
+    serialized_relationships = ("warehouses",)
+    cascade_relationships = {
+        "company": (("company", ()),),
+        "warehouses": (("warehouses", ("company", "supervisor")),)
+    }
+
     def to_dict(self, cascade_fields: list[str] = ("company", "warehouses")):
-        with get_session() as session:
-            user = session.query(User).filter(User.user_id == self.user_id).first()
-            return {
-                "user_id": self.user_id,
-                "company": user.company.to_dict(cascade_fields=[]) if "company" in cascade_fields else self.company_id,
-                "user_name": self.user_name,
-                "user_surname": self.user_surname,
-                "user_phone": self.user_phone,
-                "user_email": self.user_email,
-                "user_address": self.user_address if self.user_address is not None else "",
-                "user_role": self.user_role,
-                "warehouses": [
-                    w.to_dict() if "warehouses" in cascade_fields else w.warehouse_id for w in user.warehouses
-                ],
-                "is_password_forgotten": self.is_password_forgotten
-            }
+        return {
+            "user_id": self.user_id,
+            "company": self.company.to_dict(cascade_fields=[]) if "company" in cascade_fields else self.company_id,
+            "user_name": self.user_name,
+            "user_surname": self.user_surname,
+            "user_phone": self.user_phone,
+            "user_email": self.user_email,
+            "user_address": self.user_address if self.user_address is not None else "",
+            "user_role": self.user_role,
+            "warehouses": [
+                w.to_dict() if "warehouses" in cascade_fields else w.warehouse_id for w in self.warehouses
+            ],
+            "is_password_forgotten": self.is_password_forgotten
+        }
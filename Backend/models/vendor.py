@@ -1,6 +1,6 @@
 from sqlalchemy.orm import relationship
 from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
-from db_config import Base, get_session
+from db_config import Base
 
 
 class Vendor(Base):
@@ -9,7 +9,7 @@ class Vendor(Base):
     vendor_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     vendor_name = Column(String(255), index=True, nullable=False)
     vendor_address = Column(String(255), index=True, nullable=True)
-    vendor_owner_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    vendor_owner_id = Column(Integer, ForeignKey("users.user_id"), index=True, nullable=False)
     is_government = Column(Boolean, nullable=False, default=False)
 
     # Relationships with other tables
@@ -29,13 +29,14 @@ class Vendor(Base):
         overlaps="recipient_warehouse"
     )
 
+    # Relationships accessed by to_dict, see models.loading
+    cascade_relationships = {"vendor_owner": (("vendor_owner", ()),)}
+
     def to_dict(self, cascade_fields: list[str] = ("vendor_owner",)):
-        with get_session() as session:
-            vendor = session.query(Vendor).filter(Vendor.vendor_id == self.vendor_id).first()
-            return {
-                "vendor_id": self.vendor_id,
-                "vendor_owner": vendor.vendor_owner.to_dict(cascade_fields=[]) if "vendor_owner" in cascade_fields else self.vendor_owner_id,
-                "vendor_name": self.vendor_name,
-                "vendor_address": self.vendor_address,
-                "is_government": self.is_government
-            }
+        return {
+            "vendor_id": self.vendor_id,
+            "vendor_owner": self.vendor_owner.to_dict(cascade_fields=[]) if "vendor_owner" in cascade_fields else self.vendor_owner_id,
+            "vendor_name": self.vendor_name,
+            "vendor_address": self.vendor_address,
+            "is_government": self.is_government
+        }
@@ -1,15 +1,15 @@
 from sqlalchemy.orm import relationship
 from sqlalchemy import Integer, Column, String, ForeignKey, Numeric, CheckConstraint, Enum
 from .transaction import Transaction
-from db_config import Base, get_session
+from db_config import Base
 
 
 class Warehouse(Base):
     __tablename__ = "warehouses"
 
     warehouse_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    company_id = Column(Integer, ForeignKey("companies.company_id"), nullable=False)
-    supervisor_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    company_id = Column(Integer, ForeignKey("companies.company_id"), index=True, nullable=False)
+    supervisor_id = Column(Integer, ForeignKey("users.user_id"), index=True, nullable=False)
     warehouse_name = Column(String(50), index=True, nullable=False)
     warehouse_address = Column(String(255), index=True, nullable=False)
     overall_capacity = Column(Numeric(precision=20, scale=2, asdecimal=False), nullable=False)
@@ -44,16 +44,17 @@ class Warehouse(Base):
         CheckConstraint("overall_capacity > 0", name="check_overall_capacity")
     )
 
+    # Relationships accessed by to_dict, see models.loading
+    cascade_relationships = {"company": (("company", ()),), "supervisor": (("supervisor", ()),)}
+
     def to_dict(self, cascade_fields: list[str] = ("company", "supervisor")):
-        with get_session() as session:
-            warehouse = session.query(Warehouse).filter(Warehouse.warehouse_id == self.warehouse_id).first()
-            return {
-                "warehouse_id": self.warehouse_id,
-                "company": warehouse.company.to_dict(cascade_fields=[]) if "company" in cascade_fields else self.company_id,
-                "supervisor": warehouse.supervisor.to_dict(cascade_fields=[]) if "supervisor" in cascade_fields else self.supervisor_id,
-                "warehouse_name": self.warehouse_name,
-                "warehouse_address": self.warehouse_address,
-                "overall_capacity": self.overall_capacity,
-                "remaining_capacity": self.remaining_capacity,
-                "warehouse_type": self.warehouse_type
-            }
+        return {
+            "warehouse_id": self.warehouse_id,
+            "company": self.company.to_dict(cascade_fields=[]) if "company" in cascade_fields else self.company_id,
+            "supervisor": self.supervisor.to_dict(cascade_fields=[]) if "supervisor" in cascade_fields else self.supervisor_id,
+            "warehouse_name": self.warehouse_name,
+            "warehouse_address": self.warehouse_address,
+            "overall_capacity": self.overall_capacity,
+            "remaining_capacity": self.remaining_capacity,
+            "warehouse_type": self.warehouse_type
+        }
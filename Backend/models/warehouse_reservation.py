@@ -0,0 +1,25 @@
+from sqlalchemy import Integer, Column, ForeignKey, Numeric
+from db_config import Base
+
+
+class WarehouseReservation(Base):
+    """
+    Ledger of the warehouse`s products: volume reserved by incoming orders and quantity stored on the racks. Rows are
+    maintained by services.reservations together with changes of orders and inventories.
+    """
+    __tablename__ = "warehouse_reservations"
+
+    warehouse_id = Column(Integer, ForeignKey("warehouses.warehouse_id"), primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.product_id"), primary_key=True)
+    reserved_quantity = Column(Integer, nullable=False, default=0)
+    reserved_volume = Column(Numeric(precision=20, scale=4, asdecimal=False), nullable=False, default=0)
+    stock_quantity = Column(Integer, nullable=False, default=0)
+
+    def to_dict(self, cascade_fields: list[str] = ()):
+        return {
+            "warehouse_id": self.warehouse_id,
+            "product_id": self.product_id,
+            "reserved_quantity": self.reserved_quantity,
+            "reserved_volume": self.reserved_volume,
+            "stock_quantity": self.stock_quantity
+        }
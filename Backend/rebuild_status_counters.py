@@ -0,0 +1,40 @@
+import argparse
+import sys
+
+from db_config import get_session
+from services import order_status_counters
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Rebuilds order status counters from orders and reports the drift."
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="only report the drift, the counters are not changed"
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    arguments = parse_arguments()
+
+    with get_session() as session:
+        drift = order_status_counters.rebuild(session, dry_run=arguments.dry_run)
+
+    for row in drift:
+        print(
+            f"{row['party_type'].upper()}: {row['party_id']}; STATUS: {row['order_status']}; "
+            f"STORED: {row['stored']}; EXPECTED: {row['expected']}"
+        )
+
+    action = "found" if arguments.dry_run else "fixed"
+    print(f"{len(drift)} drifted counters {action}.")
+
+    # Non zero exit code lets scheduled runs report the drift
+    sys.exit(1 if drift else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import argparse
+import sys
+
+from db_config import get_session
+from services import reservation_ledger
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Rebuilds warehouse reservations ledger from orders and inventories and reports the drift."
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="only report the drift, the ledger is not changed"
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    arguments = parse_arguments()
+
+    with get_session() as session:
+        drift = reservation_ledger.reconcile(session, dry_run=arguments.dry_run)
+
+    for row in drift:
+        print(
+            f"WAREHOUSE: {row['warehouse_id']}; PRODUCT: {row['product_id']}; "
+            f"LEDGER: {row['ledger']}; EXPECTED: {row['expected']}"
+        )
+
+    action = "found" if arguments.dry_run else "fixed"
+    print(f"{len(drift)} drifted rows {action}.")
+
+    # Non zero exit code lets scheduled runs report the drift
+    sys.exit(1 if drift else 0)
+
+
+if __name__ == "__main__":
+    main()
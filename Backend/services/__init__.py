@@ -1 +1,15 @@
+from .analytics import AnalyticsEngine, AnalyticsFrame, analytics_engine
+from .batch import BatchRunner, batch_runner
+from .cache_versions import CacheVersions, cache_versions
+from .identity import Identity, IdentityCache, identity_cache
 from .middlewares import check_allowed_methods_middleware, check_allowed_roles_middleware, view_function_middleware
+from .order_totals import OrderTotals, order_totals
+from .passwords import PasswordPool, password_pool
+from .picking import PickingPlanner, picking_planner
+from .putaway import PutawayEngine, putaway_engine
+from .reservations import ReservationLedger, reservation_ledger
+from .rollups import DailyRollups, daily_rollups
+from .router import Router
+from .scopes import OrderScope, OrderScopeResolver, order_scopes
+from .status_counters import OrderStatusCounters, order_status_counters
+from .stock import StockKeeper, stock_keeper
@@ -0,0 +1,471 @@
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date
+
+import numpy as np
+from sqlalchemy import case, event, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from env_loader import analytics_cache_size
+from models import AnalyticsVersion, Inventory, Order, OrderItem, Product, Rack, Warehouse
+from utilities import ValidationError, day_number, increment_rows
+from .history import attribute_value, track_previous_values
+from .scopes import OrderScope
+
+
+class AnalyticsFrame:
+    """
+    Columns of the dataset loaded into NumPy arrays of the same length, dates are stored as datetime64[D].
+    """
+
+    def __init__(self, version: int, columns: dict[str, np.ndarray]):
+        self.version = version
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), ()))
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def select(self, mask: np.ndarray) -> "AnalyticsFrame":
+        """
+        Returns frame with the rows matching the mask.
+        :param mask: boolean array of the frame`s length
+        :return: new frame
+        """
+        return AnalyticsFrame(self.version, {name: column[mask] for name, column in self.columns.items()})
+
+
+class AnalyticsEngine:
+    """
+    Computes statistics of the company in memory: columns of its dataset are read with one query into NumPy arrays and
+    group-bys, time buckets and percentiles are computed with vectorised operations over them. Datasets:
+    - inventory: one row per inventory of the company`s warehouses
+    - movements: one row per item of orders supplied or received by the company`s warehouses
+    Frames are cached per dataset and company (admin`s frames contain all companies) together with the version of the
+    data they were loaded at. Versions are stored in analytics_versions table and increased in the same transaction as
+    the data changes, so every process reloads the frame only after its data has changed. Changes made through the ORM
+    are collected right before they are flushed, bulk updates of inventories must be reported with touch().
+    """
+    DATASETS = ("inventory", "movements")
+    BUCKETS = ("day", "week", "month")
+    PERCENTILES = (50, 90, 99)
+    ORDER_STATUSES = ("new", "processing", "submitted", "finished", "cancelled", "delivered", "lost", "damaged")
+    # Attributes which change rows of the datasets
+    INVENTORY_ATTRIBUTES = ("rack_id", "product_id", "quantity", "total_volume", "arrival_date", "expiry_date")
+    ORDER_ATTRIBUTES = ("order_type", "order_status", "supplier_id", "recipient_id", "created_at")
+    ITEM_ATTRIBUTES = ("order_id", "product_id", "quantity")
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+
+    def frame(self, session: Session, dataset: str, company_id: int | None = None) -> AnalyticsFrame:
+        """
+        Returns frame of the dataset, from the cache if its data has not changed since it was loaded.
+        :param session: session of the request
+        :param dataset: name of the dataset, inventory or movements
+        :param company_id: id of the company, None for all companies
+        :return: frame of the dataset
+        """
+        # Version is read before the data, so data changed in between is reloaded by the next request
+        version = self.version(session, dataset, company_id)
+        key = (dataset, company_id)
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is not None and frame.version == version:
+                self.frames.move_to_end(key)
+                return frame
+
+        frame = AnalyticsFrame(version, self.__load(session, dataset, company_id))
+
+        # Data changed by this session may still be rolled back, so it is not cached
+        if not session.info.get("analytics_changed"):
+            with self.lock:
+                self.frames[key] = frame
+                self.frames.move_to_end(key)
+                while len(self.frames) > self.cache_size:
+                    self.frames.popitem(last=False)
+
+        return frame
+
+    @staticmethod
+    def version(session: Session, dataset: str, company_id: int | None = None) -> int:
+        """
+        Returns version of the company`s dataset, for all companies sum of their versions (versions only grow).
+        """
+        query = session.query(func.coalesce(func.sum(AnalyticsVersion.version), 0)).filter(
+            AnalyticsVersion.dataset == dataset
+        )
+        if company_id is not None:
+            query = query.filter(AnalyticsVersion.company_id == company_id)
+
+        return int(query.scalar())
+
+    @staticmethod
+    def group(keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Groups rows by keys.
+        :param keys: array of keys of the rows
+        :return: sorted unique keys and index of the group of every row
+        """
+        if len(keys) and keys.dtype.kind in "iuM":
+            # Ids and days are mostly dense, such keys are grouped by their offsets from the lowest key without sorting
+            codes = keys.astype(np.int64)
+            lowest = codes.min()
+            span = int(codes.max()) - int(lowest) + 1
+            if span <= 4 * len(keys):
+                present = np.zeros(span, dtype=bool)
+                present[codes - lowest] = True
+                offsets = np.flatnonzero(present)
+                return (offsets + lowest).astype(keys.dtype), (np.cumsum(present) - 1)[codes - lowest]
+
+        groups, inverse = np.unique(keys, return_inverse=True)
+        return groups, inverse.reshape(-1)
+
+    @staticmethod
+    def group_sum(inverse: np.ndarray, size: int, values: np.ndarray | None = None) -> np.ndarray:
+        """
+        Sums values by groups, without values counts rows of the groups.
+        """
+        return np.bincount(inverse, weights=values, minlength=size)
+
+    @staticmethod
+    def group_mean(inverse: np.ndarray, size: int, values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        """
+        Averages valid values by groups, groups without valid values get NaN.
+        """
+        counts = np.bincount(inverse[valid], minlength=size)
+        sums = np.bincount(inverse[valid], weights=values[valid], minlength=size)
+        return np.divide(sums, counts, out=np.full(size, np.nan), where=counts > 0)
+
+    @staticmethod
+    def group_percentiles(inverse: np.ndarray, size: int, values: np.ndarray, percentiles) -> np.ndarray:
+        """
+        Computes percentiles of values by groups with linear interpolation (as numpy.percentile does) from one sort of
+        all values.
+        :return: array of shape (size, number of percentiles), NaN for empty groups
+        """
+        order = np.lexsort((values, inverse))
+        values = values[order].astype(np.float64)
+        counts = np.bincount(inverse, minlength=size)
+        starts = np.cumsum(counts) - counts
+        result = np.full((size, len(percentiles)), np.nan)
+        filled = counts > 0
+        if not filled.any():
+            return result
+
+        starts, counts = starts[filled], counts[filled]
+        for column, percentile in enumerate(percentiles):
+            position = (counts - 1) * (percentile / 100)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.minimum(lower + 1, counts - 1)
+            low_values = values[starts + lower]
+            result[filled, column] = low_values + (values[starts + upper] - low_values) * (position - lower)
+
+        return result
+
+    @classmethod
+    def time_buckets(cls, days: np.ndarray, bucket: str) -> np.ndarray:
+        """
+        Returns the first day of the bucket of every day: the day itself, monday of its week or the first day of its
+        month.
+        """
+        if bucket == "day":
+            return days
+        if bucket == "week":
+            # 1970-01-01 was thursday, so (number of days + 3) % 7 is the day of the week counted from monday
+            return days - (days.astype(np.int64) + 3) % 7
+        if bucket == "month":
+            return days.astype("datetime64[M]").astype("datetime64[D]")
+        raise ValidationError(f"Invalid bucket: {bucket}, choose one of {', '.join(cls.BUCKETS)}", 400)
+
+    def inventory_by_product(self, session: Session, company_id: int | None, warehouse_ids=None) -> list[dict]:
+        """
+        Groups inventories by products: number of inventories, their total volume and average number of days between
+        arrival and expiry.
+        :param session: session of the request
+        :param company_id: id of the company, None for all companies
+        :param warehouse_ids: ids of warehouses to be included, None for all warehouses of the company
+        :return: list of dictionaries by product ids
+        """
+        frame = self.frame(session, "inventory", company_id)
+        if warehouse_ids is not None:
+            frame = frame.select(np.isin(frame["warehouse_id"], list(warehouse_ids)))
+
+        products, inverse = self.group(frame["product_id"])
+        size = len(products)
+        numbers = self.group_sum(inverse, size)
+        volumes = self.group_sum(inverse, size, frame["total_volume"])
+        has_expiry = ~np.isnat(frame["expiry_date"])
+        shelf_lives = self.group_mean(
+            inverse, size, np.where(has_expiry, (frame["expiry_date"] - frame["arrival_date"]).astype(np.int64), 0),
+            has_expiry
+        )
+
+        names = dict(
+            session.query(Product.product_id, Product.product_name).filter(
+                Product.product_id.in_(products.tolist())
+            ).all()
+        ) if size else {}
+
+        return [
+            {
+                "product_id": product_id,
+                "product_name": names.get(product_id),
+                "products_number": int(number),
+                "total_volume_sum": float(volume),
+                "average_expiry_date": None if np.isnan(shelf_life) else float(shelf_life),
+            }
+            for product_id, number, volume, shelf_life in zip(products.tolist(), numbers, volumes, shelf_lives)
+        ]
+
+    def movements(self, session: Session, company_id: int | None, warehouse_ids=None, first_day: date | None = None,
+                  last_day: date | None = None, bucket: str = "month", product_id: int | None = None,
+                  order_status: str | None = None) -> list[dict]:
+        """
+        Sums movements of products by periods of creation of their orders: number of orders, quantities received and
+        supplied by the warehouses and percentiles of quantities of the orders.
+        :param session: session of the request
+        :param company_id: id of the company, None for all companies
+        :param warehouse_ids: ids of warehouses to be included, None for all warehouses of the company
+        :param first_day: first day of the range, None if it is not limited
+        :param last_day: last day of the range (included), None if it is not limited
+        :param bucket: length of the period: day, week or month
+        :param product_id: only items of the product are counted
+        :param order_status: only orders in the status are counted
+        :return: list of dictionaries by periods
+        """
+        if bucket not in self.BUCKETS:
+            raise ValidationError(f"Invalid bucket: {bucket}, choose one of {', '.join(self.BUCKETS)}", 400)
+        if order_status is not None and order_status not in self.ORDER_STATUSES:
+            raise ValidationError(f"Invalid order status: {order_status}", 400)
+
+        frame = self.frame(session, "movements", company_id)
+        mask = np.ones(len(frame), dtype=bool)
+        if warehouse_ids is not None:
+            mask &= np.isin(frame["warehouse_id"], list(warehouse_ids))
+        if first_day is not None:
+            mask &= frame["day"] >= np.datetime64(first_day, "D")
+        if last_day is not None:
+            mask &= frame["day"] <= np.datetime64(last_day, "D")
+        if product_id is not None:
+            mask &= frame["product_id"] == product_id
+        if order_status is not None:
+            mask &= frame["order_status"] == self.ORDER_STATUSES.index(order_status)
+        if not mask.all():
+            frame = frame.select(mask)
+
+        # Items are summed by orders first, every order is then counted in the bucket of its day
+        orders, item_orders = self.group(frame["order_id"])
+        quantities = self.group_sum(item_orders, len(orders), frame["quantity"])
+        days = np.empty(len(orders), dtype="datetime64[D]")
+        days[item_orders] = frame["day"]
+        incoming = np.zeros(len(orders), dtype=bool)
+        incoming[item_orders] = frame["incoming"]
+
+        periods, inverse = self.group(self.time_buckets(days, bucket))
+        size = len(periods)
+        numbers = self.group_sum(inverse, size)
+        received = self.group_sum(inverse, size, np.where(incoming, quantities, 0))
+        supplied = self.group_sum(inverse, size, np.where(incoming, 0, quantities))
+        percentiles = self.group_percentiles(inverse, size, quantities, self.PERCENTILES)
+
+        return [
+            {
+                "period": str(period),
+                "orders_number": int(number),
+                "incoming_quantity": int(incoming_quantity),
+                "outgoing_quantity": int(outgoing_quantity),
+                "order_quantity_percentiles": {
+                    f"p{percentile}": float(value) for percentile, value in zip(self.PERCENTILES, values)
+                }
+            }
+            for period, number, incoming_quantity, outgoing_quantity, values in zip(
+                periods, numbers, received, supplied, percentiles
+            )
+        ]
+
+    def touch(self, session: Session, dataset: str, warehouse_id: int) -> None:
+        """
+        Records change of the dataset of the warehouse made with the bulk update.
+        :param session: session of the request
+        :param dataset: name of the changed dataset
+        :param warehouse_id: id of the warehouse
+        """
+        self.__bump(session, {dataset: {warehouse_id}}, {})
+
+    def collect_changes(self, session: Session) -> None:
+        """
+        Increases versions of datasets of companies whose inventories, orders or order items are pending in the session.
+        :param session: session which is being flushed
+        """
+        warehouse_ids = defaultdict(set)
+        company_ids = defaultdict(set)
+        rack_ids = set()
+        for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(instance, Inventory) and self.__changed(session, instance, self.INVENTORY_ATTRIBUTES):
+                rack_ids.update(self.__values(instance, "rack_id"))
+            elif isinstance(instance, Order) and self.__changed(session, instance, self.ORDER_ATTRIBUTES):
+                for old in (True, False):
+                    warehouse_ids["movements"].add(self.__order_warehouse_id(session, instance, old))
+            elif isinstance(instance, OrderItem) and self.__changed(session, instance, self.ITEM_ATTRIBUTES):
+                for old in (True, False):
+                    order = self.__item_order(session, instance, old)
+                    if order is not None:
+                        warehouse_ids["movements"].add(self.__order_warehouse_id(session, order, old))
+            elif isinstance(instance, Rack) and instance not in session.new and (
+                    instance in session.deleted or get_history(instance, "warehouse_id").has_changes()
+            ):
+                warehouse_ids["inventory"].update(self.__values(instance, "warehouse_id"))
+            elif isinstance(instance, Warehouse) and instance not in session.new and (
+                    instance in session.deleted or get_history(instance, "company_id").has_changes()
+            ):
+                for dataset in self.DATASETS:
+                    company_ids[dataset].update(self.__values(instance, "company_id"))
+
+        if rack_ids:
+            warehouse_ids["inventory"].update(
+                warehouse_id for warehouse_id, in session.query(Rack.warehouse_id).filter(Rack.rack_id.in_(rack_ids))
+            )
+
+        self.__bump(session, warehouse_ids, company_ids)
+
+    def __bump(self, session: Session, warehouse_ids: dict[str, set], company_ids: dict[str, set]) -> None:
+        """
+        Increases versions of datasets of the warehouses` companies and of the companies.
+        """
+        ids = {warehouse_id for ids in warehouse_ids.values() for warehouse_id in ids if warehouse_id is not None}
+        companies = dict(
+            session.query(Warehouse.warehouse_id, Warehouse.company_id).filter(Warehouse.warehouse_id.in_(ids)).all()
+        ) if ids else {}
+
+        keys = {
+            (companies[warehouse_id], dataset)
+            for dataset, ids in warehouse_ids.items() for warehouse_id in ids if warehouse_id in companies
+        }
+        keys.update((company_id, dataset) for dataset, ids in company_ids.items() for company_id in ids)
+        if not keys:
+            return
+
+        session.info["analytics_changed"] = True
+        increment_rows(session, AnalyticsVersion.__table__, ("company_id", "dataset"), ("version",), [
+            {"company_id": company_id, "dataset": dataset, "version": 1} for company_id, dataset in sorted(keys)
+        ])
+
+    @staticmethod
+    def __load(session: Session, dataset: str, company_id: int | None) -> dict[str, np.ndarray]:
+        """
+        Reads columns of the dataset with one query.
+        """
+        company_warehouses = select(Warehouse.warehouse_id).where(Warehouse.company_id == company_id)
+        if dataset == "inventory":
+            statement = select(
+                Rack.warehouse_id, Inventory.product_id, Inventory.quantity, Inventory.total_volume,
+                day_number(Inventory.arrival_date), day_number(Inventory.expiry_date)
+            ).join(Rack, Rack.rack_id == Inventory.rack_id)
+            if company_id is not None:
+                statement = statement.where(Rack.warehouse_id.in_(company_warehouses))
+            types = {
+                "warehouse_id": np.int64, "product_id": np.int64, "quantity": np.int64, "total_volume": np.float64,
+                "arrival_date": "datetime64[D]", "expiry_date": "datetime64[D]"
+            }
+        else:
+            statement = select(
+                OrderItem.order_id,
+                day_number(Order.created_at),
+                case((Order.order_type == OrderScope.SUPPLIED_ORDER_TYPES["warehouse"], Order.supplier_id),
+                     else_=Order.recipient_id),
+                Order.order_type != OrderScope.SUPPLIED_ORDER_TYPES["warehouse"],
+                case(*((Order.order_status == status, code) for code, status in enumerate(
+                    AnalyticsEngine.ORDER_STATUSES)), else_=-1),
+                OrderItem.product_id,
+                OrderItem.quantity
+            ).join(Order, Order.order_id == OrderItem.order_id)
+            if company_id is not None:
+                statement = statement.where(OrderScope.party_criterion("warehouse", company_warehouses))
+            types = {
+                "order_id": np.int64, "day": "datetime64[D]", "warehouse_id": np.int64, "incoming": bool,
+                "order_status": np.int8, "product_id": np.int64, "quantity": np.int64
+            }
+
+        # Rows are read straight into one structured array, dates as numbers of days (missing ones are NaN)
+        rows = session.connection().execute(statement)
+        records = np.fromiter((tuple(row) for row in rows), dtype=[
+            (name, np.float64 if dtype == "datetime64[D]" else dtype) for name, dtype in types.items()
+        ])
+        return {name: AnalyticsEngine.__column(records[name], dtype) for name, dtype in types.items()}
+
+    @staticmethod
+    def __column(values: np.ndarray, dtype) -> np.ndarray:
+        """
+        Copies the column out of the records, numbers of days are converted to dates and NaN to NaT.
+        """
+        if dtype != "datetime64[D]":
+            return values.copy()
+
+        result = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[D]")
+        known = ~np.isnan(values)
+        result[known] = values[known].astype(np.int64).astype("datetime64[D]")
+        return result
+
+    @staticmethod
+    def __changed(session: Session, instance, attributes: tuple) -> bool:
+        return instance in session.new or instance in session.deleted or any(
+            get_history(instance, attribute).has_changes() for attribute in attributes
+        )
+
+    @staticmethod
+    def __values(instance, attribute: str) -> set:
+        """
+        Returns values of the attribute before and after the flush.
+        """
+        history = get_history(instance, attribute)
+        return {value for value in (*history.deleted, *history.unchanged, *history.added) if value is not None}
+
+    def __order_warehouse_id(self, session: Session, order: Order, old: bool) -> int | None:
+        """
+        Returns id of the order`s warehouse before (old) or after the flush.
+        """
+        if (old and order in session.new) or (not old and order in session.deleted):
+            return None
+
+        order_type, supplier_id, recipient_id = (
+            attribute_value(order, attribute, old) for attribute in ("order_type", "supplier_id", "recipient_id")
+        )
+        return supplier_id if order_type == OrderScope.SUPPLIED_ORDER_TYPES["warehouse"] else recipient_id
+
+    def __item_order(self, session: Session, item: OrderItem, old: bool) -> Order | None:
+        """
+        Returns order of the item before (old) or after the flush.
+        """
+        if (old and item in session.new) or (not old and item in session.deleted):
+            return None
+
+        order_id = attribute_value(item, "order_id", old)
+        if order_id is None:
+            return None if old else item.order
+        return session.get(Order, order_id)
+
+
+analytics_engine = AnalyticsEngine(analytics_cache_size)
+
+
+@event.listens_for(Session, "before_flush")
+def update_analytics_versions(session, flush_context, instances):
+    analytics_engine.collect_changes(session)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def forget_analytics_changes(session):
+    session.info.pop("analytics_changed", None)
+
+
+track_previous_values(
+    Order.order_type, Order.supplier_id, Order.recipient_id, OrderItem.order_id, Inventory.rack_id, Rack.warehouse_id,
+    Warehouse.company_id
+)
@@ -0,0 +1,136 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from db_config import request_session
+from env_loader import batch_workers, batch_max_size
+from services.identity import identity_cache
+from utilities.enums.method import Method
+from utilities.exceptions import ValidationError
+from utilities.templates import ResponseFactory, StreamingResponse
+
+
+class BatchRunner:
+    """
+    Runs sub-requests of the batch request, so that the client gets responses of several requests in one message.
+    Requester is resolved once for the whole batch. Reads preceding the first write are independent, so they are
+    processed in parallel, each in its own session. Starting from the first write sub-requests are processed in order in
+    one session, every one in its own savepoint: failed sub-request rolls back only its own changes and the following
+    reads see changes of the previous writes.
+    """
+    # Urls which are handled by the controller itself and can not be a part of the batch
+    RESERVED_URLS = ("/batch", "/connect", "/disconnect")
+
+    def __init__(self, workers: int, max_size: int):
+        self.workers = workers
+        self.max_size = max_size
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def run(self, request: dict, handle: Callable[[dict], dict]) -> dict:
+        """
+        Processes the batch request.
+        :param request: dictionary containing url, method, headers and body with the list of sub-requests, each of them
+        is a dictionary containing method, url, body and filters
+        :param handle: function processing a single request (controller)
+        :return: dictionary containing status_code and response body with list of sub-requests` responses in the same
+        order as sub-requests
+        """
+        headers = request.get("headers", {})
+        response = ResponseFactory(400, {}, "", headers)
+
+        if request.get("method") != Method.POST.value:
+            raise ValidationError("Method not allowed.", 405)
+
+        sub_requests = self.__sub_requests(request.get("body"), headers)
+        token = headers.get("token")
+        identity = identity_cache.resolve(token, headers.get("socket_id")) if token else None
+        for sub_request in sub_requests:
+            sub_request["identity"] = identity
+
+        first_write = next(
+            (index for index, sub_request in enumerate(sub_requests) if sub_request["method"] != Method.GET.value),
+            len(sub_requests)
+        )
+        responses = self.__run_parallel(sub_requests[:first_write], handle)
+        responses.extend(self.__run_sequential(sub_requests[first_write:], handle, request.get("url", "")))
+
+        response.status_code = 200
+        response.data = responses
+        return response.create_response()
+
+    def shutdown(self) -> None:
+        with self.lock:
+            executor, self.executor = self.executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def __sub_requests(self, body, headers: dict) -> list[dict]:
+        if not isinstance(body, list):
+            raise ValidationError("Body of the batch request must be a list of requests.", 400)
+        if len(body) > self.max_size:
+            raise ValidationError(f"Batch can not contain more than {self.max_size} requests.", 400)
+
+        sub_requests = []
+        for sub_request in body:
+            if not isinstance(sub_request, dict) or not sub_request.get("url") or not sub_request.get("method"):
+                raise ValidationError("Each request of the batch must contain url and method.", 400)
+            if sub_request["url"].split("?", 1)[0] in self.RESERVED_URLS:
+                raise ValidationError(f"{sub_request['url']} can not be a part of the batch.", 400)
+
+            sub_requests.append({
+                "url": sub_request["url"],
+                "method": sub_request["method"],
+                "body": sub_request.get("body", {}),
+                "headers": {**headers, "filters": sub_request.get("filters", {})}
+            })
+
+        return sub_requests
+
+    def __get_executor(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers)
+            return self.executor
+
+    def __run_parallel(self, sub_requests: list[dict], handle: Callable[[dict], dict]) -> list[dict]:
+        if len(sub_requests) <= 1:
+            return [self.__handle(sub_request, handle) for sub_request in sub_requests]
+
+        executor = self.__get_executor()
+        futures = [executor.submit(self.__handle, sub_request, handle) for sub_request in sub_requests]
+        return [future.result() for future in futures]
+
+    def __run_sequential(self, sub_requests: list[dict], handle: Callable[[dict], dict], url: str) -> list[dict]:
+        if not sub_requests:
+            return []
+
+        responses = []
+        with request_session(f"{Method.POST.value} {url}") as session:
+            for sub_request in sub_requests:
+                savepoint = session.begin_nested()
+                response = self.__handle(sub_request, handle)
+
+                if savepoint.is_active:
+                    if response["status_code"] in range(200, 300):
+                        savepoint.commit()
+                    else:
+                        savepoint.rollback()
+                responses.append(response)
+
+        return responses
+
+    @staticmethod
+    def __handle(sub_request: dict, handle: Callable[[dict], dict]) -> dict:
+        response = handle(sub_request)
+
+        # Streamed list is sent in several messages, so it can not be a part of the batch`s response
+        if isinstance(response, StreamingResponse):
+            return ResponseFactory(400, {}, "Streamed list can not be a part of the batch.", sub_request["headers"]) \
+                .create_response()
+
+        return response
+
+
+batch_runner = BatchRunner(batch_workers, batch_max_size)
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from env_loader import cache_versions_interval
+from models import CacheVersion
+from utilities import increment_rows
+
+
+class CacheVersions:
+    """
+    Versions of caches kept in memory of every process. Changes which make cached values stale increase the version in
+    their transaction, each cache remembers the version it was filled at and is dropped when the stored one differs, so
+    the change reaches all workers of the process pool. Versions are read with one query for all caches and the result
+    is reused by the process for CACHE_VERSIONS_INTERVAL seconds, so changes made by other processes are seen after at
+    most this interval, changes committed by the process itself are seen by its next request.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.versions = {}
+        self.read_at = None
+        self.lock = threading.Lock()
+
+    def read(self, session: Session, cache_name: str) -> int:
+        """
+        Returns version of the cache.
+        :param session: session of the request
+        :param cache_name: name of the cache
+        :return: version, 0 if it was never increased
+        """
+        # Versions increased in the session`s transaction are not committed yet, so only its session can see them
+        if session.info.get("cache_versions_bumped"):
+            return self.__query(session).get(cache_name, 0)
+
+        with self.lock:
+            if self.read_at is not None and time.monotonic() - self.read_at < self.interval:
+                return self.versions.get(cache_name, 0)
+
+        versions = self.__query(session)
+        with self.lock:
+            self.versions, self.read_at = versions, time.monotonic()
+
+        return versions.get(cache_name, 0)
+
+    def bump(self, session: Session, cache_name: str) -> None:
+        """
+        Increases version of the cache in the session`s transaction.
+        :param session: session which makes the cache stale
+        :param cache_name: name of the cache
+        """
+        increment_rows(
+            session, CacheVersion.__table__, ("cache_name",), ("version",), [{"cache_name": cache_name, "version": 1}]
+        )
+        session.info["cache_versions_bumped"] = True
+
+    def forget(self) -> None:
+        """
+        Makes the next read query versions, should be called after versions were increased by the process.
+        """
+        with self.lock:
+            self.read_at = None
+
+    @staticmethod
+    def __query(session: Session) -> dict[str, int]:
+        return dict(session.execute(select(CacheVersion.cache_name, CacheVersion.version)).all())
+
+
+cache_versions = CacheVersions(cache_versions_interval)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def forget_cache_versions(session):
+    if session.info.pop("cache_versions_bumped", None):
+        cache_versions.forget()
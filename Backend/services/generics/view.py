@@ -1,10 +1,17 @@
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, func, or_
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Query
 
 from db_config import get_session
+from models.loading import eager_load_options
 from services import check_allowed_methods_middleware, view_function_middleware
 from utilities.exceptions import ValidationError, DatabaseError
 from utilities.enums.method import Method
+from utilities.templates import StreamingResponse
 
 
 class ModelAttributesMeta(type):
@@ -24,6 +31,11 @@ class GenericView(metaclass=ModelAttributesMeta):
     model = None
     model_name = None
 
+    # Maximum number of instances returned by get_list on one page
+    MAX_PAGE_SIZE = 500
+    # Number of instances in one message of the streamed list
+    STREAM_CHUNK_SIZE = 1000
+
     def __init__(self):
         self.instance = None
         self.response = None
@@ -35,6 +47,7 @@ class GenericView(metaclass=ModelAttributesMeta):
         self.method = None
         self.instance_id = None
         self.requester_id = None
+        self.identity = None
         self.requester_role = None
 
     @view_function_middleware
@@ -54,15 +67,31 @@ class GenericView(metaclass=ModelAttributesMeta):
 
     @view_function_middleware
     @check_allowed_methods_middleware([Method.GET.value])
-    def get_list(self, request: dict, pre_selected_query: Query = None, cascade_fields: list[str] = (), **kwargs) -> dict:
+    def get_list(self, request: dict, pre_selected_query: Query = None, cascade_fields: list[str] = (),
+                 default_order_by: str = None, **kwargs) -> dict:
         """
-        Get all instances of model.
+        Get all instances of model. If limit is passed in filters, instances are returned page by page: cursor of the
+        next page is returned in headers.pagination.next_cursor and should be passed as after to get it.
         :param request: dictionary containing url, method and body
         :param pre_selected_query: query which will be used to get instances
         :param cascade_fields: fields which will be expanded in response
-        :param kwargs: arguments to be checked, here you need to pass fields on which instances will be filtered
-        :return: dictionary containing status_code and response body with list of dictionaries of instances` data
+        :param default_order_by: order of pages if order_by is not passed in filters, e.g. "-created_at"
+        :param kwargs: arguments to be checked, here you need to pass fields on which instances will be filtered,
+        besides them limit, after (cursor), order_by (name of the column, prefixed with "-" for descending order) and
+        with_count (whether total number of instances should be returned) control pagination, stream requests the list
+        to be sent in chunks
+        :return: dictionary containing status_code and response body with list of dictionaries of instances` data or
+        streaming response if stream was passed in filters
         """
+        limit = kwargs.pop("limit", None)
+        after = kwargs.pop("after", None)
+        order_by = kwargs.pop("order_by", None) or default_order_by
+        with_count = kwargs.pop("with_count", False)
+        stream = kwargs.pop("stream", False)
+
+        if stream and limit is not None:
+            raise ValidationError("Paged list can not be streamed.", 400)
+
         with get_session() as session:
             if pre_selected_query is not None:
                 query = pre_selected_query
@@ -89,7 +118,26 @@ class GenericView(metaclass=ModelAttributesMeta):
                 elif hasattr(self.model, column):
                     query = query.filter(getattr(self.model, column) == value)
 
+            if limit is not None:
+                query = self.__paginate(query, limit, after, order_by, with_count)
+
+            # Relationships used by to_dict are loaded with the instances, not one by one during serialization
+            query = query.options(*eager_load_options(self.model, cascade_fields))
+
+            if stream:
+                return StreamingResponse(
+                    query.statement, lambda instance: instance.to_dict(cascade_fields=cascade_fields), self.headers,
+                    self.STREAM_CHUNK_SIZE, f"{self.method} {self.url} (stream)"
+                )
+
             instances = query.all()
+
+            if limit is not None:
+                pagination = self.headers["pagination"]
+                if len(instances) > pagination["limit"]:
+                    instances = instances[:pagination["limit"]]
+                    pagination["next_cursor"] = self.__encode_cursor(instances[-1], pagination["order_by"])
+
             body = [instance.to_dict(cascade_fields=cascade_fields) for instance in instances]
             self.response.status_code = 200
             self.response.data = body
@@ -162,3 +210,75 @@ class GenericView(metaclass=ModelAttributesMeta):
 
             except IntegrityError as e:
                 raise DatabaseError(str(e))
+
+    def __order_column(self, order_by: str):
+        """
+        Returns column by which pages are ordered and whether order is descending.
+        """
+        descending = order_by.startswith("-")
+        column = self.model.__table__.columns.get(order_by.lstrip("-"))
+
+        # Rows with NULL can not be compared with the cursor, so only required columns are allowed
+        if column is None or (column.nullable and not column.primary_key):
+            raise ValidationError(f"Can not order {self.model_name}s by {order_by.lstrip('-')}.", 400)
+
+        return getattr(self.model, column.key), descending
+
+    def __paginate(self, query: Query, limit, after: str | None, order_by: str | None, with_count: bool) -> Query:
+        """
+        Applies keyset pagination to the query: rows are ordered by order_by column and primary key, and the next page
+        starts right after the row encoded in the cursor, so the database does not have to skip previous pages.
+        Query fetches one extra row to find out whether there is a next page.
+        """
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValidationError("Limit must be a positive number.", 400)
+        if limit <= 0:
+            raise ValidationError("Limit must be a positive number.", 400)
+
+        primary_key = getattr(self.model, f"{self.model_name}_id")
+        order_by = order_by or primary_key.key
+        column, descending = self.__order_column(order_by)
+        pagination = {"limit": min(limit, self.MAX_PAGE_SIZE), "order_by": order_by, "next_cursor": None}
+
+        # Count is taken before the cursor is applied, so it is the number of instances on all pages
+        if with_count:
+            pagination["total_count"] = query.order_by(None).with_entities(func.count(primary_key)).scalar()
+
+        if after is not None:
+            value, last_id = self.__decode_cursor(after, order_by, column)
+            if descending:
+                query = query.filter(or_(column < value, and_(column == value, primary_key < last_id)))
+            else:
+                query = query.filter(or_(column > value, and_(column == value, primary_key > last_id)))
+
+        ordering = (column.desc(), primary_key.desc()) if descending else (column.asc(), primary_key.asc())
+        self.headers["pagination"] = pagination
+        return query.order_by(None).order_by(*ordering).limit(pagination["limit"] + 1)
+
+    def __encode_cursor(self, instance, order_by: str) -> str:
+        value = getattr(instance, order_by.lstrip("-"))
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+
+        cursor = {"order_by": order_by, "value": value, "id": getattr(instance, f"{self.model_name}_id")}
+        return base64.urlsafe_b64encode(json.dumps(cursor).encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def __decode_cursor(cursor: str, order_by: str, column) -> tuple:
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            value, last_id = cursor["value"], cursor["id"]
+            if cursor.get("order_by") != order_by:
+                raise ValidationError("Cursor was created for a different order.", 400)
+
+            python_type = column.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            raise ValidationError("Cursor is not valid.", 400)
+
+        return value, last_id
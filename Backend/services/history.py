@@ -0,0 +1,36 @@
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import get_history
+
+
+def attribute_value(instance, attribute: str, old: bool):
+    """
+    Returns value of the instance`s attribute before (old) or after the flush. Values before the flush are taken from
+    the attribute`s history, so the attribute must be tracked by track_previous_values if it can be set without being
+    loaded first.
+    :param instance: instance of the model
+    :param attribute: name of the attribute
+    :param old: value before the flush is returned if true
+    :return: value of the attribute
+    """
+    if not old:
+        return getattr(instance, attribute)
+
+    history = get_history(instance, attribute)
+    values = history.deleted or history.unchanged or history.added
+    return values[0] if values else None
+
+
+def load_previous_value(target, value, oldvalue, initiator):
+    # Listener does nothing, it is registered with active_history, so the previous value is loaded before it is set
+    pass
+
+
+def track_previous_values(*attributes) -> None:
+    """
+    Makes previous values of the attributes be loaded when they are set, so maintained tables can subtract the old
+    contribution of the changed instance. Attributes tracked by several services are registered once.
+    :param attributes: instrumented attributes of models (e.g. Order.order_status)
+    """
+    for attribute in attributes:
+        if not event.contains(attribute, "set", load_previous_value):
+            event.listen(attribute, "set", load_previous_value, active_history=True)
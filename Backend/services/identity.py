@@ -0,0 +1,205 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from db_config import get_session
+from models import User, Warehouse
+from utilities import ValidationError, verify_token
+from utilities.functions import ROLE_CODES, ROLE_NAMES
+from .cache_versions import cache_versions
+
+
+class Identity:
+    """
+    Requester of the request: user from the token with everything views need to check permissions. Contains only plain
+    values, so it can be safely shared between requests and threads.
+    """
+    def __init__(self, token: str, user_id: int, user_role: str, company_id: int, expires_at: int | None = None,
+                 warehouse_ids: tuple[int, ...] | None = None, token_version: int | None = None):
+        self.token = token
+        self.user_id = user_id
+        self.user_role = user_role
+        self.company_id = company_id
+        self.expires_at = expires_at
+        self.token_version = token_version
+        self.__warehouse_ids = warehouse_ids
+
+    @property
+    def role_code(self) -> str:
+        return ROLE_CODES[self.user_role]
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at < time.time()
+
+    @property
+    def warehouse_ids(self) -> tuple[int, ...]:
+        """
+        Ids of the warehouses supervised by the requester, queried on the first access.
+        """
+        if self.__warehouse_ids is None:
+            with get_session() as session:
+                self.__warehouse_ids = tuple(
+                    warehouse_id for warehouse_id, in session.query(Warehouse.warehouse_id).filter_by(
+                        supervisor_id=self.user_id
+                    ).order_by(Warehouse.warehouse_id)
+                )
+
+        return self.__warehouse_ids
+
+    @property
+    def warehouse_id(self) -> int | None:
+        """
+        Id of the warehouse supervised by the requester (None if requester is not a supervisor of any warehouse).
+        """
+        return self.warehouse_ids[0] if self.warehouse_ids else None
+
+    @classmethod
+    def from_token(cls, token: str) -> "Identity":
+        """
+        Resolves user from the token. Signed tokens contain role and company of the user, so the database is queried
+        only for legacy ones.
+        :param token: token of the user
+        :return: identity of the user
+        """
+        claims = verify_token(token)
+
+        if claims["company_id"] is not None:
+            return cls(
+                token, claims["user_id"], ROLE_NAMES[claims["role"]], claims["company_id"], claims["exp"],
+                token_version=claims["ver"]
+            )
+
+        with get_session() as session:
+            user_role, company_id = session.query(User.user_role, User.company_id).filter_by(
+                user_id=claims["user_id"]
+            ).one()
+
+        return cls(token, claims["user_id"], user_role, company_id)
+
+
+class IdentityCache:
+    """
+    Identities of the requesters cached per client`s socket, so the user is resolved once per connection instead of
+    several times per request. Entry is used only if the token has not changed or expired and is dropped when the client
+    disconnects or when the user (or warehouses supervised by him) is modified. Such modifications increase version of
+    the cache (see services.cache_versions), so every process of the pool drops its identities on its next request.
+    Token versions of the users are kept in memory too and dropped together with identities, so revoked tokens are
+    rejected without querying the database on every request.
+    """
+    CACHE_NAME = "identities"
+    # Attributes of users and warehouses which are stored in identities or in tokens
+    USER_ATTRIBUTES = {User: ("user_role", "company_id", "token_version"), Warehouse: ("supervisor_id",)}
+
+    def __init__(self):
+        self.identities = {}
+        self.token_versions = {}
+        self.version = None
+        self.lock = threading.Lock()
+
+    def resolve(self, token: str, socket_id=None) -> Identity:
+        """
+        Returns identity of the token`s owner, from the cache if the same token was used on this socket before.
+        :param token: token from the request`s headers
+        :param socket_id: socket of the client, requests without it are not cached
+        :return: identity of the requester
+        """
+        is_cached = socket_id is not None and socket_id != ""
+
+        with get_session() as session:
+            version = cache_versions.read(session, self.CACHE_NAME)
+
+        with self.lock:
+            if version != self.version:
+                self.identities.clear()
+                self.token_versions.clear()
+                self.version = version
+            identity = self.identities.get(socket_id) if is_cached else None
+
+        if identity is not None and identity.token == token and not identity.is_expired:
+            return identity
+
+        identity = Identity.from_token(token)
+        # Legacy tokens do not have versions, their owner is queried by Identity.from_token
+        if identity.token_version is not None and identity.token_version != self.__token_version(identity, version):
+            raise ValidationError("Token has been revoked.", 401)
+
+        if is_cached:
+            with self.lock:
+                # Identity resolved while the version changed may be already stale
+                if version == self.version:
+                    self.identities[socket_id] = identity
+
+        return identity
+
+    def __token_version(self, identity: Identity, version: int) -> int:
+        """
+        Returns current token version of the identity`s user, it is queried once per user until the cache is dropped.
+        """
+        with self.lock:
+            token_version = self.token_versions.get(identity.user_id)
+        if token_version is not None:
+            return token_version
+
+        with get_session() as session:
+            token_version = session.query(User.token_version).filter_by(user_id=identity.user_id).scalar()
+        if token_version is None:
+            raise ValidationError("User with this token does not exist.")
+
+        with self.lock:
+            if version == self.version:
+                self.token_versions[identity.user_id] = token_version
+
+        return token_version
+
+    def invalidate(self, socket_id) -> None:
+        """
+        Drops identity cached for the socket.
+        :param socket_id: socket of the client
+        """
+        with self.lock:
+            self.identities.pop(socket_id, None)
+
+    def invalidate_user(self, *user_ids: int) -> None:
+        """
+        Drops identities of the given users on all sockets, should be called after user or his warehouses are modified.
+        :param user_ids: ids of the users
+        """
+        with self.lock:
+            for socket_id, identity in list(self.identities.items()):
+                if identity.user_id in user_ids:
+                    del self.identities[socket_id]
+            for user_id in user_ids:
+                self.token_versions.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.identities.clear()
+            self.token_versions.clear()
+
+    def collect_changes(self, session: Session) -> None:
+        """
+        Increases version of the cache if users or supervisors of warehouses pending in the session are changed.
+        :param session: session which is being flushed
+        """
+        for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+            attributes = self.USER_ATTRIBUTES.get(type(instance))
+            if attributes is None or (isinstance(instance, User) and instance in session.new):
+                continue
+
+            if instance in session.new or instance in session.deleted or any(
+                    get_history(instance, attribute).has_changes() for attribute in attributes
+            ):
+                cache_versions.bump(session, self.CACHE_NAME)
+                return
+
+
+identity_cache = IdentityCache()
+
+
+@event.listens_for(Session, "before_flush")
+def collect_identity_changes(session, flush_context, instances):
+    identity_cache.collect_changes(session)
@@ -1,5 +1,6 @@
-from db_config import get_session
-from utilities import extract_id_from_url, decode_token
+from db_config import request_session
+from utilities import extract_id_from_url
+from .identity import identity_cache
 from utilities.templates import ResponseFactory
 
 
@@ -38,16 +39,15 @@ def check_allowed_roles_middleware(allowed_roles):
     def decorator(function):
         def wrapper(*args, **kwargs):
             request = kwargs["request"]
-            headers = request.get("headers", {})
-            token = headers.get("token", None)
+            identity = request.get("identity")
 
-            if not token:
+            if identity is None:
                 return {
                     "status_code": 401,
                     "message": "Unauthorized."
                 }
 
-            user_role = token[0]
+            user_role = identity.role_code
 
             if user_role not in allowed_roles:
                 return {
@@ -72,14 +72,22 @@ def view_function_middleware(function):
         instance.request = request
         instance.headers = request.get("headers", {})
         token = instance.headers.get("token", None)
-        instance.requester_id = decode_token(token) if token else None
-        instance.requester_role = instance.headers.get("token", " ")[0]
         instance.body = request.get("body", {})
         instance.url = request.get("url", "")
         instance.method = request.get("method", "")
-        instance.instance_id = extract_id_from_url(instance.url, instance.model_name)
+        path_params = request.get("path_params")
+        instance.instance_id = path_params.get(f"{instance.model_name}_id") if path_params is not None \
+            else extract_id_from_url(instance.url, instance.model_name)
+
+        with request_session(f"{instance.method} {instance.url}") as session:
+            # Identity is resolved once per request (nested view calls reuse it) and cached for the client`s socket, it
+            # is resolved in the session of the request, so no other connection is checked out
+            if token and request.get("identity") is None:
+                request["identity"] = identity_cache.resolve(token, instance.headers.get("socket_id"))
+            instance.identity = request.get("identity") if token else None
+            instance.requester_id = instance.identity.user_id if instance.identity is not None else None
+            instance.requester_role = instance.identity.role_code if instance.identity is not None else " "
 
-        with get_session() as session:
             instance.instance = session.query(instance.model).filter(
                 getattr(instance.model, f"{instance.model_name}_id") == instance.instance_id
             ).first() if instance.instance_id is not None else None
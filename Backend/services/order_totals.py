@@ -0,0 +1,147 @@
+from collections import defaultdict
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
+
+from models import Order, OrderItem, Product
+from .history import attribute_value, track_previous_values
+
+
+class OrderTotals:
+    """
+    Keeps total_volume, total_weight and item_count (number of ordered items) of orders in sync with their items, so
+    reads do not aggregate order_items. Changes of items made through the ORM (creating, updating, losing and deleting
+    items) are collected right before they are flushed and added to the orders in the same flush. New totals are set on
+    the orders, so other listeners of the flush read them, but the database adds only the differences to the stored
+    totals, so concurrent transactions changing items of the same order do not overwrite each other`s changes.
+    """
+    TOTALS = ("total_volume", "total_weight", "item_count")
+    # Attributes of the order item which change totals
+    ITEM_ATTRIBUTES = ("order_id", "product_id", "quantity")
+
+    def collect_changes(self, session: Session) -> None:
+        """
+        Adds differences of contributions of order items pending in the session to totals of their orders.
+        :param session: session which is being flushed
+        """
+        contributions = []
+        for item in list(session.new) + list(session.dirty) + list(session.deleted):
+            if not isinstance(item, OrderItem):
+                continue
+            if item not in session.new and item not in session.deleted and not any(
+                    get_history(item, attribute).has_changes() for attribute in self.ITEM_ATTRIBUTES
+            ):
+                continue
+
+            for old, sign in ((True, -1), (False, 1)):
+                contribution = self.__item_contribution(session, item, old)
+                if contribution is not None:
+                    contributions.append((*contribution, sign))
+
+        if not contributions:
+            return
+
+        products = {
+            product_id: (volume, weight) for product_id, volume, weight in session.query(
+                Product.product_id, Product.volume, Product.weight
+            ).filter(Product.product_id.in_({product_id for _, product_id, _, _ in contributions}))
+        }
+
+        changes = defaultdict(lambda: dict.fromkeys(self.TOTALS, 0))
+        for order_id, product_id, quantity, sign in contributions:
+            volume, weight = products.get(product_id, (0, 0))
+            changes[order_id]["total_volume"] += sign * quantity * volume
+            changes[order_id]["total_weight"] += sign * quantity * weight
+            changes[order_id]["item_count"] += sign * quantity
+
+        # Orders are usually already loaded by the view, the rest are loaded with one query
+        orders = {order.order_id: order for order in session.identity_map.values() if isinstance(order, Order)}
+        missing = [order_id for order_id in changes if order_id not in orders]
+        if missing:
+            orders.update(
+                (order.order_id, order) for order in session.query(Order).filter(Order.order_id.in_(missing))
+            )
+
+        increments = session.info.setdefault("order_total_increments", {})
+        for order_id, totals in changes.items():
+            order = orders.get(order_id)
+            if order is None or order in session.deleted:
+                continue
+
+            for total, value in totals.items():
+                if value:
+                    setattr(order, total, (getattr(order, total) or 0) + value)
+            # New orders are inserted with their totals, nobody else can change them yet
+            if order not in session.new:
+                order_increments = increments.setdefault(order_id, dict.fromkeys(self.TOTALS, 0))
+                for total, value in totals.items():
+                    order_increments[total] += value
+
+    @staticmethod
+    def increment(order: Order) -> None:
+        """
+        Replaces totals set on the order by collect_changes with increments of the stored totals, should be called right
+        before the order is updated. Totals are expired after the flush and loaded again when they are accessed.
+        :param order: order which is being updated
+        """
+        increments = object_session(order).info.get("order_total_increments", {}).pop(order.order_id, None)
+        for total, value in (increments or {}).items():
+            if value:
+                setattr(order, total, Order.__table__.c[total] + value)
+
+    def recompute(self, session: Session) -> None:
+        """
+        Recomputes totals of all orders from their items.
+        :param session: session in which totals are updated
+        """
+        items = select(OrderItem.order_id).join(Product, Product.product_id == OrderItem.product_id).where(
+            OrderItem.order_id == Order.order_id
+        )
+        session.execute(
+            update(Order.__table__).values(
+                total_volume=items.with_only_columns(
+                    func.coalesce(func.sum(OrderItem.quantity * Product.volume), 0)
+                ).scalar_subquery(),
+                total_weight=items.with_only_columns(
+                    func.coalesce(func.sum(OrderItem.quantity * Product.weight), 0)
+                ).scalar_subquery(),
+                item_count=items.with_only_columns(func.coalesce(func.sum(OrderItem.quantity), 0)).scalar_subquery()
+            )
+        )
+
+    def __item_contribution(self, session: Session, item: OrderItem, old: bool) -> tuple | None:
+        """
+        Returns order, product and quantity of the order item before (old) or after the flush.
+        """
+        if (old and item in session.new) or (not old and item in session.deleted):
+            return None
+
+        order_id = attribute_value(item, "order_id", old)
+        if order_id is None and not old and item.order is not None:
+            order_id = item.order.order_id
+        if order_id is None:
+            return None
+
+        return order_id, attribute_value(item, "product_id", old), attribute_value(item, "quantity", old) or 0
+
+
+order_totals = OrderTotals()
+
+
+@event.listens_for(Session, "before_flush")
+def update_order_totals(session, flush_context, instances):
+    order_totals.collect_changes(session)
+
+
+@event.listens_for(Order, "before_update")
+def increment_order_totals(mapper, connection, order):
+    order_totals.increment(order)
+
+
+@event.listens_for(Session, "after_flush")
+def forget_order_total_increments(session, flush_context):
+    session.info.pop("order_total_increments", None)
+
+
+track_previous_values(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity)
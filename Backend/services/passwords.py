@@ -0,0 +1,119 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from env_loader import password_workers, password_queue_size, password_timeout
+from utilities import hash_password, check_password
+from utilities.exceptions import ValidationError
+
+
+class PasswordPool:
+    """
+    Dedicated pool of processes for bcrypt hashing and verification. Each call takes 100-300 ms of CPU, so it is kept
+    away from the dispatcher`s workers: number of passwords being processed or waiting is limited by queue_size and the
+    caller gives up after timeout seconds instead of blocking the rest of the requests.
+    """
+    def __init__(self, workers: int, queue_size: int, timeout: float):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.executor = None
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.lock = threading.Lock()
+        self.counters = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "total_wait_ms": 0.0
+        }
+
+    def hash(self, password: str) -> bytes:
+        """
+        Hashes password in the pool.
+        :param password: password to be hashed
+        :return: hashed password
+        """
+        return self.__run(hash_password, password)
+
+    def check(self, hashed_password: str, input_password: str) -> bool:
+        """
+        Checks password against the hash in the pool.
+        :param hashed_password: hash stored in the database
+        :param input_password: password received from the user
+        :return: whether password is correct
+        """
+        return self.__run(check_password, hashed_password, input_password)
+
+    def metrics(self) -> dict:
+        """
+        Returns snapshot of the pool`s counters.
+        :return: dictionary with number of submitted, completed, rejected and timed out calls, current and maximum
+        queue depth and average time spent waiting for the result
+        """
+        with self.lock:
+            metrics = dict(self.counters)
+
+        finished = metrics["completed"] + metrics["timed_out"]
+        metrics["average_wait_ms"] = metrics.pop("total_wait_ms") / finished if finished else 0.0
+        return metrics
+
+    def shutdown(self) -> None:
+        with self.lock:
+            executor, self.executor = self.executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def __get_executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                # Processes are spawned, forking the multithreaded dispatcher may copy locks held by other threads
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self.executor
+
+    def __count(self, **changes) -> None:
+        with self.lock:
+            for name, change in changes.items():
+                self.counters[name] += change
+            self.counters["max_queue_depth"] = max(self.counters["max_queue_depth"], self.counters["queue_depth"])
+
+    def __release(self, future) -> None:
+        self.__count(queue_depth=-1)
+        self.slots.release()
+
+    def __run(self, function, *args):
+        if not self.slots.acquire(blocking=False):
+            self.__count(rejected=1)
+            print(f"\033[91m|PASSWORD POOL IS FULL: {self.metrics()}|\033[0m")
+            raise ValidationError("Server is busy, please try again later.", 503)
+
+        self.__count(submitted=1, queue_depth=1)
+        started_at = time.perf_counter()
+
+        try:
+            future = self.__get_executor().submit(function, *args)
+        except Exception:
+            self.__release(None)
+            raise
+
+        # Slot is freed only when the process has finished, even if the caller has stopped waiting
+        future.add_done_callback(self.__release)
+
+        try:
+            result = future.result(timeout=self.timeout)
+        except TimeoutError:
+            self.__count(timed_out=1, total_wait_ms=(time.perf_counter() - started_at) * 1000)
+            print(f"\033[91m|PASSWORD POOL TIMED OUT: {self.metrics()}|\033[0m")
+            raise ValidationError("Server is busy, please try again later.", 503)
+
+        self.__count(completed=1, total_wait_ms=(time.perf_counter() - started_at) * 1000)
+        return result
+
+
+password_pool = PasswordPool(password_workers, password_queue_size, password_timeout)
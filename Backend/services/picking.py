@@ -0,0 +1,123 @@
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+from models import Inventory, Rack
+from utilities.exceptions import ValidationError
+
+
+class PickingPlanner:
+    """
+    Plans from which racks of the supplier warehouse products of the order are retrieved. Inventories of all ordered
+    products are loaded with one query and quantities are allocated in memory by the chosen strategy:
+    - rack_position: racks in order of their positions
+    - fefo: first expiring inventories first (inventories without expiry date last)
+    - fewest_racks: racks which are already used by the plan and racks holding more of the ordered products first, so
+      the order is picked from as few racks as possible
+    """
+    STRATEGIES = ("rack_position", "fefo", "fewest_racks")
+    DEFAULT_STRATEGY = "rack_position"
+
+    def plan(self, session: Session, warehouse_id: int, products_to_pick: dict[int, int],
+             strategy: str | None = None) -> list[dict]:
+        """
+        Allocates ordered quantities to inventories of the warehouse.
+        :param session: session of the request
+        :param warehouse_id: id of the supplier warehouse
+        :param products_to_pick: dictionary with ordered quantities by product ids
+        :param strategy: one of STRATEGIES, DEFAULT_STRATEGY if not passed
+        :return: list of dictionaries with product_id, rack_id and real_quantity to be retrieved from the rack
+        """
+        strategy = strategy or self.DEFAULT_STRATEGY
+        if strategy not in self.STRATEGIES:
+            raise ValidationError(f"Picking strategy must be one of: {', '.join(self.STRATEGIES)}.", 400)
+
+        candidates = {product_id: [] for product_id in products_to_pick}
+        for inventory in self.__load_inventories(session, warehouse_id, products_to_pick.keys()):
+            candidates[inventory.product_id].append(inventory)
+
+        if strategy == "fefo":
+            for inventories in candidates.values():
+                inventories.sort(key=lambda inventory: inventory.expiry_date or date.max)
+            return self.__allocate(products_to_pick, candidates)
+
+        if strategy == "fewest_racks":
+            return self.__allocate_fewest_racks(products_to_pick, candidates)
+
+        return self.__allocate(products_to_pick, candidates)
+
+    @staticmethod
+    def __load_inventories(session: Session, warehouse_id: int, product_ids) -> list:
+        """
+        Returns non-empty inventories of the products in the warehouse ordered by rack position.
+        """
+        return session.query(
+            Inventory.product_id, Inventory.rack_id, Inventory.quantity, Inventory.expiry_date, Rack.rack_position
+        ).join(Rack, Rack.rack_id == Inventory.rack_id).filter(
+            Rack.warehouse_id == warehouse_id,
+            Inventory.product_id.in_(product_ids),
+            Inventory.quantity > 0
+        ).order_by(Rack.rack_position, Inventory.rack_id).all()
+
+    @staticmethod
+    def __take(product_id: int, quantity: int, inventories, filled_inventories: list[dict]) -> list[dict]:
+        """
+        Takes quantity of the product from inventories in the given order.
+        """
+        for inventory in inventories:
+            if quantity == 0:
+                break
+
+            real_quantity = min(quantity, inventory.quantity)
+            filled_inventories.append({
+                "product_id": product_id,
+                "rack_id": inventory.rack_id,
+                "real_quantity": real_quantity
+            })
+            quantity -= real_quantity
+
+        if quantity != 0:
+            raise ValidationError("Could not send order", 404)
+
+        return filled_inventories
+
+    def __allocate(self, products_to_pick: dict[int, int], candidates: dict[int, list]) -> list[dict]:
+        filled_inventories = []
+        for product_id, quantity in products_to_pick.items():
+            self.__take(product_id, quantity, candidates[product_id], filled_inventories)
+
+        return filled_inventories
+
+    def __allocate_fewest_racks(self, products_to_pick: dict[int, int], candidates: dict[int, list]) -> list[dict]:
+        # Number of ordered products stored on every rack
+        coverage = {}
+        for inventories in candidates.values():
+            for inventory in inventories:
+                coverage[inventory.rack_id] = coverage.get(inventory.rack_id, 0) + 1
+
+        filled_inventories = []
+        used_racks = set()
+        # Products stored on fewer racks have less choice, so they choose racks first
+        for product_id in sorted(products_to_pick, key=lambda product_id: len(candidates[product_id])):
+            quantity = products_to_pick[product_id]
+            inventories = candidates[product_id]
+
+            # If one rack has enough, the smallest such inventory is taken, the bigger ones are kept for other orders
+            enough = [inventory for inventory in inventories if inventory.quantity >= quantity]
+            if enough:
+                inventories = [min(enough, key=lambda inventory: (
+                    inventory.rack_id not in used_racks, -coverage[inventory.rack_id], inventory.quantity
+                ))]
+            else:
+                inventories = sorted(inventories, key=lambda inventory: (
+                    inventory.rack_id not in used_racks, -inventory.quantity, -coverage[inventory.rack_id]
+                ))
+
+            start = len(filled_inventories)
+            self.__take(product_id, quantity, inventories, filled_inventories)
+            used_racks.update(filled_inventory["rack_id"] for filled_inventory in filled_inventories[start:])
+
+        return filled_inventories
+
+
+picking_planner = PickingPlanner()
@@ -0,0 +1,161 @@
+from array import array
+from bisect import bisect_left, insort
+from math import floor
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from models import Inventory, Product, Rack
+from utilities.exceptions import ValidationError
+
+
+class RackPool:
+    """
+    Racks ordered by remaining capacity, so the rack which fits the volume best is found with binary search. Entries
+    are (remaining capacity, index), index points to the engine`s arrays. Racks are indexed in descending order of
+    their positions, so racks with equal capacity are taken in the same order as before.
+    """
+    def __init__(self, entries: list[tuple]):
+        self.entries = sorted(entries)
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def best_fit(self, volume: float) -> tuple | None:
+        """
+        Returns the rack with the smallest remaining capacity which is at least volume.
+        """
+        position = bisect_left(self.entries, (volume,))
+        return self.entries[position] if position < len(self.entries) else None
+
+    def largest(self) -> tuple:
+        return self.entries[-1]
+
+    def remove(self, entry: tuple) -> None:
+        del self.entries[bisect_left(self.entries, entry)]
+
+    def add(self, entry: tuple) -> None:
+        insort(self.entries, entry)
+
+
+class PutawayEngine:
+    """
+    Plans to which racks of the recipient warehouse products of the order are put. Racks of the warehouse and products
+    of the order are loaded once, placements are computed in memory with best fit decreasing heuristic: the biggest
+    items are placed first, each to the rack with the smallest remaining capacity which fits the whole item. Item which
+    does not fit any rack is split, starting from the rack with the largest remaining capacity.
+    Non stackable products are put only to empty racks and nothing else is put to their racks. Stackable products are
+    put to racks which do not contain non stackable products.
+    """
+    # Tolerance of comparing volumes, capacities are stored with 2 decimal places
+    EPSILON = 1e-9
+
+    def plan(self, session: Session, warehouse_id: int, products_to_place: dict[int, int]) -> list[dict]:
+        """
+        Places ordered quantities to racks of the warehouse.
+        :param session: session of the request
+        :param warehouse_id: id of the recipient warehouse
+        :param products_to_place: dictionary with ordered quantities by product ids
+        :return: list of dictionaries with rack_id, product_id and real_quantity to be put to the rack
+        """
+        racks = self.__load_racks(session, warehouse_id)
+
+        products = {
+            product.product_id: product for product in session.query(
+                Product.product_id, Product.product_name, Product.volume, Product.is_stackable
+            ).filter(Product.product_id.in_(products_to_place.keys()))
+        }
+        for product_id in products_to_place:
+            if product_id not in products:
+                raise ValidationError(f"Product with id {product_id} does not exist", 400)
+
+        # Non stackable items take empty racks first, then the biggest items are placed
+        order = sorted(products_to_place, key=lambda product_id: (
+            bool(products[product_id].is_stackable), -products[product_id].volume * products_to_place[product_id]
+        ))
+
+        placements = {}
+        for product_id in order:
+            product = products[product_id]
+            placements[product_id] = self.__place(product, products_to_place[product_id], *racks[1:])
+
+        return [
+            {"rack_id": racks[0][index], "product_id": product_id, "real_quantity": quantity}
+            for product_id in products_to_place for index, quantity in placements[product_id]
+        ]
+
+    @staticmethod
+    def __load_racks(session: Session, warehouse_id: int) -> tuple:
+        """
+        Loads racks of the warehouse which have free space with numbers of their inventories and non stackable ones.
+        :return: rack ids, remaining capacities, flags of empty racks and pools of racks for stackable and non stackable
+        products
+        """
+        racks = session.query(
+            Rack.rack_id, Rack.overall_capacity, Rack.remaining_capacity,
+            func.count(Inventory.inventory_id),
+            func.coalesce(func.sum(case((Product.is_stackable == 0, 1), else_=0)), 0)
+        ).outerjoin(Inventory, Inventory.rack_id == Rack.rack_id).outerjoin(
+            Product, Product.product_id == Inventory.product_id
+        ).filter(
+            Rack.warehouse_id == warehouse_id, Rack.remaining_capacity > 0
+        ).group_by(Rack.rack_id, Rack.overall_capacity, Rack.remaining_capacity).order_by(
+            Rack.rack_position.desc()
+        ).all()
+
+        rack_ids = array("q")
+        capacities = array("d")
+        empty = bytearray(len(racks))
+        stackable_entries = []
+        empty_entries = []
+        for index, (rack_id, overall_capacity, remaining_capacity, inventories, non_stackable) in enumerate(racks):
+            rack_ids.append(rack_id)
+            capacities.append(remaining_capacity)
+
+            if non_stackable:
+                continue
+            stackable_entries.append((remaining_capacity, index))
+            if not inventories and remaining_capacity == overall_capacity:
+                empty[index] = 1
+                empty_entries.append((remaining_capacity, index))
+
+        return rack_ids, capacities, empty, RackPool(stackable_entries), RackPool(empty_entries)
+
+    def __place(self, product, quantity: int, capacities: array, empty: bytearray, stackable_pool: RackPool,
+                empty_pool: RackPool) -> list[tuple[int, int]]:
+        """
+        Places quantity of the product and updates remaining capacities and pools.
+        :return: list of (rack index, quantity) placements
+        """
+        pool = stackable_pool if product.is_stackable else empty_pool
+        placements = []
+
+        while quantity > 0 and pool:
+            entry = pool.best_fit(product.volume * quantity - self.EPSILON) or pool.largest()
+            capacity, index = entry
+            real_quantity = min(quantity, floor((capacity + self.EPSILON) / product.volume))
+            if real_quantity == 0:
+                # Even the largest rack can not hold one more item
+                break
+
+            placements.append((index, real_quantity))
+            quantity -= real_quantity
+            capacities[index] = capacity - product.volume * real_quantity
+
+            # Rack is not empty anymore, non stackable product occupies the rack alone
+            if empty[index]:
+                empty[index] = 0
+                empty_pool.remove(entry)
+            stackable_pool.remove(entry)
+            if product.is_stackable and capacities[index] > self.EPSILON:
+                stackable_pool.add((capacities[index], index))
+
+        if quantity > 0:
+            raise ValidationError(
+                f"Not enough capacity to place remaining {quantity} of {product.product_name}", 400
+            )
+
+        return placements
+
+
+putaway_engine = PutawayEngine()
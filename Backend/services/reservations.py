@@ -0,0 +1,240 @@
+from collections import defaultdict
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from models import Inventory, Order, OrderItem, Product, Rack, Warehouse, WarehouseReservation
+from utilities import increment_rows
+from .history import attribute_value, track_previous_values
+
+
+class ReservationLedger:
+    """
+    Keeps warehouse_reservations in sync with orders and inventories, so capacity and availability checks read rows of
+    one warehouse instead of aggregating its whole history. Incoming (to_warehouse) orders reserve volume of the
+    recipient while they are in RESERVING_STATUSES, inventories make up stock of the rack`s warehouse.
+    Changes made through the ORM are collected right before they are flushed, so the ledger is updated in the same
+    transaction. Bulk updates of inventories (query.update) bypass the ORM and must be reported with add_stock.
+    """
+    RESERVING_STATUSES = ("submitted", "processing", "delivered")
+    COUNTERS = ("reserved_quantity", "reserved_volume", "stock_quantity")
+    # Attributes of the order which change reservations of its items
+    ORDER_ATTRIBUTES = ("order_status", "order_type", "recipient_id")
+
+    @staticmethod
+    def remaining_volume(session: Session, warehouse_id: int) -> float:
+        """
+        Returns remaining capacity of the warehouse minus volume reserved by incoming orders.
+        :param session: session of the request
+        :param warehouse_id: id of the warehouse
+        :return: remaining volume
+        """
+        reserved_volume = select(func.coalesce(func.sum(WarehouseReservation.reserved_volume), 0)).where(
+            WarehouseReservation.warehouse_id == warehouse_id
+        ).scalar_subquery()
+        remaining_volume = session.query(Warehouse.remaining_capacity - reserved_volume).filter(
+            Warehouse.warehouse_id == warehouse_id
+        ).scalar()
+
+        return remaining_volume if remaining_volume else 0
+
+    @staticmethod
+    def stock(session: Session, warehouse_id: int, product_ids) -> dict[int, int]:
+        """
+        Returns quantities of the products stored in the warehouse.
+        :param session: session of the request
+        :param warehouse_id: id of the warehouse
+        :param product_ids: ids of the products
+        :return: dictionary with quantities by product ids, products which are not stored in the warehouse are missing
+        """
+        return dict(
+            session.query(WarehouseReservation.product_id, WarehouseReservation.stock_quantity).filter(
+                WarehouseReservation.warehouse_id == warehouse_id,
+                WarehouseReservation.product_id.in_(product_ids)
+            ).all()
+        )
+
+    def add_stock(self, session: Session, warehouse_id: int, product_id: int, quantity: int) -> None:
+        """
+        Records change of the stock made with the bulk update.
+        :param session: session of the request
+        :param warehouse_id: id of the warehouse
+        :param product_id: id of the product
+        :param quantity: number of added (positive) or removed (negative) items
+        """
+        self.add_stocks(session, warehouse_id, {product_id: quantity})
+
+    def add_stocks(self, session: Session, warehouse_id: int, quantities: dict[int, int]) -> None:
+        """
+        Records changes of the stock of several products made with the bulk update in one statement.
+        :param session: session of the request
+        :param warehouse_id: id of the warehouse
+        :param quantities: dictionary with numbers of added (positive) or removed (negative) items by product ids
+        """
+        self.__apply(session, {
+            (warehouse_id, product_id): {"stock_quantity": quantity} for product_id, quantity in quantities.items()
+        })
+
+    def collect_changes(self, session: Session) -> None:
+        """
+        Applies changes of orders, order items and inventories pending in the session to the ledger. Contribution of
+        every changed row is computed for its state before and after the flush, the difference goes to the ledger.
+        :param session: session which is being flushed
+        """
+        changes = defaultdict(lambda: dict.fromkeys(self.COUNTERS, 0))
+        changed = list(session.new) + list(session.dirty) + list(session.deleted)
+
+        items = {item for item in changed if isinstance(item, OrderItem)}
+        for order in changed:
+            if isinstance(order, Order) and (
+                    order in session.new or order in session.deleted or
+                    any(get_history(order, attribute).has_changes() for attribute in self.ORDER_ATTRIBUTES)
+            ):
+                items.update(order.ordered_items)
+
+        reservations = []
+        for item in items:
+            for old, sign in ((True, -1), (False, 1)):
+                reservation = self.__item_reservation(session, item, old)
+                if reservation is not None:
+                    reservations.append((*reservation, sign))
+
+        if reservations:
+            volumes = dict(
+                session.query(Product.product_id, Product.volume).filter(
+                    Product.product_id.in_({key[1] for key, _, _ in reservations})
+                ).all()
+            )
+            for key, quantity, sign in reservations:
+                changes[key]["reserved_quantity"] += sign * quantity
+                changes[key]["reserved_volume"] += sign * quantity * volumes.get(key[1], 0)
+
+        stocks = []
+        for inventory in changed:
+            if isinstance(inventory, Inventory):
+                for old, sign in ((True, -1), (False, 1)):
+                    stock = self.__inventory_stock(session, inventory, old)
+                    if stock is not None:
+                        stocks.append((*stock, sign))
+
+        if stocks:
+            warehouse_ids = dict(
+                session.query(Rack.rack_id, Rack.warehouse_id).filter(
+                    Rack.rack_id.in_({rack_id for rack_id, _, _, _ in stocks})
+                ).all()
+            )
+            for rack_id, product_id, quantity, sign in stocks:
+                if warehouse_ids.get(rack_id) is not None:
+                    changes[(warehouse_ids[rack_id], product_id)]["stock_quantity"] += sign * quantity
+
+        self.__apply(session, changes)
+
+    def reconcile(self, session: Session, dry_run: bool = False) -> list[dict]:
+        """
+        Computes the ledger from scratch and compares it with the stored one. Unless it is a dry run, stored ledger is
+        replaced with the computed one. Should be run when orders and inventories are not being changed.
+        :param session: session in which the ledger is rebuilt
+        :param dry_run: only report the drift
+        :return: list of dictionaries with warehouse_id, product_id, stored and expected values of rows which differ
+        """
+        expected = defaultdict(lambda: dict.fromkeys(self.COUNTERS, 0))
+
+        reserved = session.query(
+            Order.recipient_id, OrderItem.product_id, func.sum(OrderItem.quantity),
+            func.sum(OrderItem.quantity * Product.volume)
+        ).join(OrderItem, OrderItem.order_id == Order.order_id).join(
+            Product, Product.product_id == OrderItem.product_id
+        ).join(Warehouse, Warehouse.warehouse_id == Order.recipient_id).filter(
+            Order.order_type == "to_warehouse", Order.order_status.in_(self.RESERVING_STATUSES)
+        ).group_by(Order.recipient_id, OrderItem.product_id)
+
+        for warehouse_id, product_id, quantity, volume in reserved:
+            expected[(warehouse_id, product_id)]["reserved_quantity"] = int(quantity)
+            expected[(warehouse_id, product_id)]["reserved_volume"] = float(volume)
+
+        stored = session.query(Rack.warehouse_id, Inventory.product_id, func.sum(Inventory.quantity)).join(
+            Rack, Rack.rack_id == Inventory.rack_id
+        ).group_by(Rack.warehouse_id, Inventory.product_id)
+
+        for warehouse_id, product_id, quantity in stored:
+            expected[(warehouse_id, product_id)]["stock_quantity"] = int(quantity)
+
+        ledger = {
+            (row.warehouse_id, row.product_id): {counter: getattr(row, counter) for counter in self.COUNTERS}
+            for row in session.execute(select(WarehouseReservation.__table__))
+        }
+
+        drift = []
+        for key in sorted(set(expected) | set(ledger)):
+            stored_row = ledger.get(key, dict.fromkeys(self.COUNTERS, 0))
+            expected_row = expected.get(key, dict.fromkeys(self.COUNTERS, 0))
+            if any(abs(stored_row[counter] - expected_row[counter]) > 1e-6 for counter in self.COUNTERS):
+                drift.append({
+                    "warehouse_id": key[0], "product_id": key[1], "ledger": stored_row, "expected": expected_row
+                })
+
+        if not dry_run:
+            session.execute(WarehouseReservation.__table__.delete())
+            rows = [
+                {"warehouse_id": warehouse_id, "product_id": product_id, **counters}
+                for (warehouse_id, product_id), counters in expected.items()
+            ]
+            if rows:
+                session.execute(WarehouseReservation.__table__.insert(), rows)
+
+        return drift
+
+    def __item_reservation(self, session: Session, item: OrderItem, old: bool) -> tuple | None:
+        """
+        Returns key of the ledger and quantity reserved by the order item before (old) or after the flush.
+        """
+        if (old and item in session.new) or (not old and item in session.deleted):
+            return None
+
+        order = session.get(Order, attribute_value(item, "order_id", old)) if old else item.order
+        if order is None or (old and order in session.new) or (not old and order in session.deleted):
+            return None
+
+        if attribute_value(order, "order_type", old) != "to_warehouse" or \
+                attribute_value(order, "order_status", old) not in self.RESERVING_STATUSES:
+            return None
+
+        key = (attribute_value(order, "recipient_id", old), attribute_value(item, "product_id", old))
+        return key, attribute_value(item, "quantity", old)
+
+    def __inventory_stock(self, session: Session, inventory: Inventory, old: bool) -> tuple | None:
+        """
+        Returns rack, product and quantity of the inventory before (old) or after the flush.
+        """
+        if (old and inventory in session.new) or (not old and inventory in session.deleted):
+            return None
+
+        return (
+            attribute_value(inventory, "rack_id", old),
+            attribute_value(inventory, "product_id", old),
+            attribute_value(inventory, "quantity", old)
+        )
+
+    def __apply(self, session: Session, changes: dict) -> None:
+        """
+        Adds changes to the ledger`s rows, missing rows are created.
+        """
+        rows = [
+            {"warehouse_id": warehouse_id, "product_id": product_id, **dict.fromkeys(self.COUNTERS, 0), **counters}
+            for (warehouse_id, product_id), counters in changes.items() if any(counters.values())
+        ]
+        increment_rows(session, WarehouseReservation.__table__, ("warehouse_id", "product_id"), self.COUNTERS, rows)
+
+reservation_ledger = ReservationLedger()
+
+
+@event.listens_for(Session, "before_flush")
+def update_reservation_ledger(session, flush_context, instances):
+    reservation_ledger.collect_changes(session)
+
+
+track_previous_values(
+    Order.order_status, Order.order_type, Order.recipient_id, OrderItem.order_id, OrderItem.product_id,
+    OrderItem.quantity, Inventory.rack_id, Inventory.product_id, Inventory.quantity
+)
@@ -0,0 +1,314 @@
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import Float, Integer, case, cast, event, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from models import DailyProductRollup, DailyWarehouseRollup, LostItem, Order, Product, ThrownItem, Warehouse
+from utilities import ValidationError, increment_rows
+from .history import attribute_value, track_previous_values
+from .scopes import OrderScope
+
+
+class DailyRollups:
+    """
+    Keeps daily aggregates used by statistics of the company, so statistics for a range of dates read one row per day
+    instead of joining the whole history of orders and items:
+    - daily_warehouse_rollups: number, volume and price of finished orders of the warehouse by days of their creation,
+    orders which lost all their items are not counted
+    - daily_product_rollups: quantities of products lost in orders of the warehouse (by days of the orders` creation)
+    and thrown away from the warehouse (by days they were thrown)
+    Changes made through the ORM are collected right before they are flushed, so rollups are updated in the same
+    transaction. Statistics are computed with the precision of days.
+    """
+    WAREHOUSE_COUNTERS = ("finished_orders", "finished_volume", "finished_price")
+    PRODUCT_COUNTERS = ("lost_quantity", "thrown_quantity")
+    # Attributes of the order which change its rollups or rollups of its lost items
+    ORDER_ATTRIBUTES = ("order_status", "order_type", "supplier_id", "recipient_id", "created_at", "total_volume",
+                        "total_price", "item_count")
+    ORDER_KEY_ATTRIBUTES = ("order_type", "supplier_id", "recipient_id", "created_at")
+    ITEM_ATTRIBUTES = ("order_id", "product_id", "quantity")
+    THROWN_ATTRIBUTES = ("warehouse_id", "product_id", "quantity", "thrown_at")
+
+    @staticmethod
+    def day_range(filters: dict | None) -> tuple[date | None, date | None]:
+        """
+        Converts created_at_gte and created_at_lte filters to the first and the last day of statistics.
+        :param filters: filters of the request
+        :return: first and last day (both included), None if the range is not limited on that side
+        """
+        days = []
+        for name in ("created_at_gte", "created_at_lte"):
+            value = (filters or {}).get(name)
+            try:
+                days.append(date.fromisoformat(str(value)[:10]) if value else None)
+            except ValueError:
+                raise ValidationError(f"Invalid date in {name}: {value}", 400)
+
+        return days[0], days[1]
+
+    @staticmethod
+    def __filter_days(query, column, first_day: date | None, last_day: date | None):
+        if first_day is not None:
+            query = query.filter(column >= first_day)
+        if last_day is not None:
+            query = query.filter(column <= last_day)
+        return query
+
+    def most_used_warehouses(self, session: Session, company_id: int, first_day: date | None = None,
+                             last_day: date | None = None) -> list:
+        """
+        Returns finished orders of the company`s warehouses in the range of days.
+        :param session: session of the request
+        :param company_id: id of the company
+        :param first_day: first day of the range
+        :param last_day: last day of the range
+        :return: list of (warehouse_name, number of orders, volume, price) of warehouses which finished orders
+        """
+        query = session.query(
+            Warehouse.warehouse_name,
+            cast(func.sum(DailyWarehouseRollup.finished_orders), Integer),
+            cast(func.sum(DailyWarehouseRollup.finished_volume), Float),
+            cast(func.sum(DailyWarehouseRollup.finished_price), Float)
+        ).join(Warehouse, Warehouse.warehouse_id == DailyWarehouseRollup.warehouse_id).filter(
+            Warehouse.company_id == company_id
+        )
+        query = self.__filter_days(query, DailyWarehouseRollup.day, first_day, last_day)
+
+        return query.group_by(Warehouse.warehouse_name).having(func.sum(DailyWarehouseRollup.finished_orders) > 0).all()
+
+    def lost_items(self, session: Session, company_id: int, first_day: date | None = None,
+                   last_day: date | None = None) -> list:
+        """
+        Returns products lost in orders of the company`s warehouses in the range of days.
+        :return: list of rows with product_id, warehouse_id, total_quantity, warehouse_name and product_name
+        """
+        query = session.query(
+            DailyProductRollup.product_id.label('product_id'),
+            DailyProductRollup.warehouse_id.label('warehouse_id'),
+            cast(func.sum(DailyProductRollup.lost_quantity), Float).label('total_quantity'),
+            Warehouse.warehouse_name.label('warehouse_name'),
+            Product.product_name.label('product_name')
+        ).join(Warehouse, Warehouse.warehouse_id == DailyProductRollup.warehouse_id).join(
+            Product, Product.product_id == DailyProductRollup.product_id
+        ).filter(Warehouse.company_id == company_id)
+        query = self.__filter_days(query, DailyProductRollup.day, first_day, last_day)
+
+        return query.group_by(
+            DailyProductRollup.warehouse_id, DailyProductRollup.product_id, Warehouse.warehouse_name,
+            Product.product_name
+        ).having(func.sum(DailyProductRollup.lost_quantity) > 0).order_by(
+            Warehouse.warehouse_name, Product.product_name
+        ).all()
+
+    def thrown_items(self, session: Session, company_id: int, first_day: date | None = None,
+                     last_day: date | None = None) -> list:
+        """
+        Returns products thrown away from the company`s warehouses in the range of days.
+        :return: list of rows with product_id, total_quantity and product_name
+        """
+        query = session.query(
+            DailyProductRollup.product_id.label('product_id'),
+            cast(func.sum(DailyProductRollup.thrown_quantity), Float).label('total_quantity'),
+            Product.product_name.label('product_name')
+        ).join(Warehouse, Warehouse.warehouse_id == DailyProductRollup.warehouse_id).join(
+            Product, Product.product_id == DailyProductRollup.product_id
+        ).filter(Warehouse.company_id == company_id)
+        query = self.__filter_days(query, DailyProductRollup.day, first_day, last_day)
+
+        return query.group_by(DailyProductRollup.product_id, Product.product_name).having(
+            func.sum(DailyProductRollup.thrown_quantity) > 0
+        ).order_by(Product.product_name).all()
+
+    def collect_changes(self, session: Session) -> None:
+        """
+        Applies changes of orders, lost items and thrown items pending in the session to the rollups. Contribution of
+        every changed row is computed for its state before and after the flush, the difference goes to the rollups.
+        :param session: session which is being flushed
+        """
+        warehouse_changes = defaultdict(lambda: dict.fromkeys(self.WAREHOUSE_COUNTERS, 0))
+        product_changes = defaultdict(lambda: dict.fromkeys(self.PRODUCT_COUNTERS, 0))
+        changed = list(session.new) + list(session.dirty) + list(session.deleted)
+
+        lost_items = set()
+        for instance in changed:
+            if isinstance(instance, Order) and self.__is_changed(session, instance, self.ORDER_ATTRIBUTES):
+                for old, sign in ((True, -1), (False, 1)):
+                    contribution = self.__order_contribution(session, instance, old)
+                    if contribution is not None:
+                        key, values = contribution
+                        for counter, value in values.items():
+                            warehouse_changes[key][counter] += sign * value
+
+                if instance not in session.new and any(
+                        get_history(instance, attribute).has_changes() for attribute in self.ORDER_KEY_ATTRIBUTES
+                ):
+                    lost_items.update(instance.lost_items)
+
+            elif isinstance(instance, LostItem) and self.__is_changed(session, instance, self.ITEM_ATTRIBUTES):
+                lost_items.add(instance)
+
+            elif isinstance(instance, ThrownItem) and self.__is_changed(session, instance, self.THROWN_ATTRIBUTES):
+                for old, sign in ((True, -1), (False, 1)):
+                    if (old and instance in session.new) or (not old and instance in session.deleted):
+                        continue
+                    key = (
+                        self.__day(attribute_value(instance, "thrown_at", old)),
+                        attribute_value(instance, "warehouse_id", old), attribute_value(instance, "product_id", old)
+                    )
+                    product_changes[key]["thrown_quantity"] += sign * (attribute_value(instance, "quantity", old) or 0)
+
+        for item in lost_items:
+            for old, sign in ((True, -1), (False, 1)):
+                contribution = self.__lost_item_contribution(session, item, old)
+                if contribution is not None:
+                    key, quantity = contribution
+                    product_changes[key]["lost_quantity"] += sign * quantity
+
+        increment_rows(session, DailyWarehouseRollup.__table__, ("day", "warehouse_id"), self.WAREHOUSE_COUNTERS, [
+            {"day": day, "warehouse_id": warehouse_id, **counters}
+            for (day, warehouse_id), counters in warehouse_changes.items() if any(counters.values())
+        ])
+        increment_rows(
+            session, DailyProductRollup.__table__, ("day", "warehouse_id", "product_id"), self.PRODUCT_COUNTERS, [
+                {"day": day, "warehouse_id": warehouse_id, "product_id": product_id, **counters}
+                for (day, warehouse_id, product_id), counters in product_changes.items() if any(counters.values())
+            ]
+        )
+
+    def backfill(self, session: Session, dry_run: bool = False) -> list[dict]:
+        """
+        Computes rollups from orders, lost items and thrown items and compares them with the stored ones. Unless it is
+        a dry run, stored rollups are replaced with the computed ones. Should be run when orders are not being changed.
+        :param session: session in which rollups are computed
+        :param dry_run: only report the drift
+        :return: list of dictionaries with table, key, stored and expected values of rows which differ
+        """
+        warehouse_id = case(
+            (Order.order_type == OrderScope.SUPPLIED_ORDER_TYPES["warehouse"], Order.supplier_id),
+            else_=Order.recipient_id
+        )
+        order_day = func.date(Order.created_at)
+
+        expected_warehouses = defaultdict(lambda: dict.fromkeys(self.WAREHOUSE_COUNTERS, 0))
+        for day, warehouse, orders, volume, price in session.query(
+                order_day, warehouse_id, func.count(), func.sum(Order.total_volume), func.sum(Order.total_price)
+        ).filter(Order.order_status == "finished", Order.item_count > 0).group_by(order_day, warehouse_id):
+            expected_warehouses[(self.__day(day), warehouse)] = {
+                "finished_orders": orders, "finished_volume": float(volume or 0), "finished_price": float(price or 0)
+            }
+
+        expected_products = defaultdict(lambda: dict.fromkeys(self.PRODUCT_COUNTERS, 0))
+        for day, warehouse, product_id, quantity in session.query(
+                order_day, warehouse_id, LostItem.product_id, func.sum(LostItem.quantity)
+        ).join(Order, Order.order_id == LostItem.order_id).group_by(order_day, warehouse_id, LostItem.product_id):
+            expected_products[(self.__day(day), warehouse, product_id)]["lost_quantity"] = int(quantity)
+
+        thrown_day = func.date(ThrownItem.thrown_at)
+        for day, warehouse, product_id, quantity in session.query(
+                thrown_day, ThrownItem.warehouse_id, ThrownItem.product_id, func.sum(ThrownItem.quantity)
+        ).group_by(thrown_day, ThrownItem.warehouse_id, ThrownItem.product_id):
+            expected_products[(self.__day(day), warehouse, product_id)]["thrown_quantity"] = int(quantity)
+
+        drift = []
+        for model, keys, counters, expected in (
+                (DailyWarehouseRollup, ("day", "warehouse_id"), self.WAREHOUSE_COUNTERS, expected_warehouses),
+                (DailyProductRollup, ("day", "warehouse_id", "product_id"), self.PRODUCT_COUNTERS, expected_products)
+        ):
+            table = model.__table__
+            stored = {
+                tuple(self.__day(row[key]) if key == "day" else row[key] for key in keys):
+                    {counter: row[counter] for counter in counters}
+                for row in session.execute(select(table)).mappings()
+            }
+
+            for key in sorted(set(expected) | set(stored)):
+                stored_row = stored.get(key, dict.fromkeys(counters, 0))
+                expected_row = expected.get(key, dict.fromkeys(counters, 0))
+                if any(abs(stored_row[counter] - expected_row[counter]) > 1e-6 for counter in counters):
+                    drift.append({
+                        "table": table.name, "key": dict(zip(keys, key)), "stored": stored_row,
+                        "expected": expected_row
+                    })
+
+            if not dry_run:
+                session.execute(table.delete())
+                rows = [{**dict(zip(keys, key)), **values} for key, values in expected.items()]
+                if rows:
+                    session.execute(table.insert(), rows)
+
+        return drift
+
+    @staticmethod
+    def __day(value) -> date | None:
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, str):
+            return date.fromisoformat(value[:10])
+        return value
+
+    @staticmethod
+    def __is_changed(session: Session, instance, attributes: tuple[str, ...]) -> bool:
+        return instance in session.new or instance in session.deleted or any(
+            get_history(instance, attribute).has_changes() for attribute in attributes
+        )
+
+    def __order_key(self, order: Order, old: bool) -> tuple:
+        """
+        Returns day of creation and id of the warehouse of the order before (old) or after the flush.
+        """
+        order_type = attribute_value(order, "order_type", old)
+        warehouse_id = attribute_value(
+            order, "supplier_id" if order_type == OrderScope.SUPPLIED_ORDER_TYPES["warehouse"] else "recipient_id", old
+        )
+        created_at = attribute_value(order, "created_at", old) or datetime.now()
+        return self.__day(created_at), warehouse_id
+
+    def __order_contribution(self, session: Session, order: Order, old: bool) -> tuple | None:
+        """
+        Returns key of the warehouse rollup and values of the finished order before (old) or after the flush.
+        """
+        if (old and order in session.new) or (not old and order in session.deleted):
+            return None
+        if attribute_value(order, "order_status", old) != "finished" or not attribute_value(order, "item_count", old):
+            return None
+
+        return self.__order_key(order, old), {
+            "finished_orders": 1,
+            "finished_volume": attribute_value(order, "total_volume", old) or 0,
+            "finished_price": attribute_value(order, "total_price", old) or 0
+        }
+
+    def __lost_item_contribution(self, session: Session, item: LostItem, old: bool) -> tuple | None:
+        """
+        Returns key of the product rollup and quantity of the lost item before (old) or after the flush.
+        """
+        if (old and item in session.new) or (not old and item in session.deleted):
+            return None
+
+        order = None if old else item.order
+        if order is None:
+            order = session.get(Order, attribute_value(item, "order_id", old))
+        if order is None or (old and order in session.new) or (not old and order in session.deleted):
+            return None
+
+        day, warehouse_id = self.__order_key(order, old)
+        return (day, warehouse_id, attribute_value(item, "product_id", old)), attribute_value(item, "quantity", old) or 0
+
+
+daily_rollups = DailyRollups()
+
+
+# Listener is registered after the one of order totals (services imports order_totals first), so totals of orders
+# changed in the flush are already updated when rollups read them
+@event.listens_for(Session, "before_flush")
+def update_daily_rollups(session, flush_context, instances):
+    daily_rollups.collect_changes(session)
+
+
+track_previous_values(
+    Order.order_status, Order.order_type, Order.supplier_id, Order.recipient_id, Order.created_at, Order.total_volume,
+    Order.total_price, Order.item_count, LostItem.order_id, LostItem.product_id, LostItem.quantity,
+    ThrownItem.warehouse_id, ThrownItem.product_id, ThrownItem.quantity, ThrownItem.thrown_at
+)
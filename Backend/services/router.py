@@ -0,0 +1,85 @@
+from utilities.exceptions import ValidationError
+
+
+class Route:
+    """
+    Endpoint of the application: view`s action which will be called for the given method and path pattern.
+    """
+    def __init__(self, method: str, pattern: str, view, action: str, with_filters: bool = False):
+        self.method = method
+        self.pattern = pattern
+        self.view = view
+        self.action = action
+        self.with_filters = with_filters
+        self.parameters = {}
+
+        # Segments like {order_id} are path parameters, their positions are remembered to extract values from url
+        signature = []
+        for index, segment in enumerate(Router.split_path(pattern)):
+            if segment.startswith("{") and segment.endswith("}"):
+                self.parameters[index] = segment[1:-1]
+                signature.append(Router.PARAMETER)
+            else:
+                signature.append(segment)
+
+        self.signature = tuple(signature)
+
+    def __call__(self, request: dict, path_params: dict, filters: dict) -> dict:
+        request["path_params"] = path_params
+        action = getattr(self.view(), self.action)
+
+        if self.with_filters:
+            return action(request=request, **filters)
+        return action(request=request)
+
+
+class Router:
+    """
+    Routes compiled once into the dictionary. Numeric segments of the url are treated as path parameters, so the url
+    is resolved with a single lookup regardless of the number of routes.
+    """
+    PARAMETER = "{}"
+
+    def __init__(self):
+        self.routes = {}
+        self.methods = {}
+
+    @staticmethod
+    def split_path(path: str) -> list[str]:
+        return [segment for segment in path.split("?", 1)[0].split("/") if segment]
+
+    def add(self, method: str, pattern: str, view, action: str, with_filters: bool = False) -> None:
+        """
+        Registers new route.
+        :param method: http method of the route
+        :param pattern: path of the route, path parameters are specified in curly braces, e.g. /order/{order_id}
+        :param view: view class which will handle the request
+        :param action: name of the view`s method
+        :param with_filters: whether filters from headers should be passed to the action
+        """
+        route = Route(method, pattern, view, action, with_filters)
+
+        if (method, route.signature) in self.routes:
+            raise ValueError(f"Route {method} {pattern} is already registered.")
+
+        self.routes[(method, route.signature)] = route
+        self.methods.setdefault(route.signature, set()).add(method)
+
+    def resolve(self, method: str, url: str) -> tuple[Route, dict]:
+        """
+        Finds route for the given method and url.
+        :param method: http method of the request
+        :param url: url of the request
+        :return: route and dictionary with path parameters
+        """
+        segments = self.split_path(url)
+        signature = tuple(self.PARAMETER if segment.isdigit() else segment for segment in segments)
+        route = self.routes.get((method, signature))
+
+        if route is None:
+            if signature in self.methods:
+                raise ValidationError("Method not allowed.", 405)
+            raise ValidationError("Route not found.", 404)
+
+        path_params = {name: int(segments[index]) for index, name in route.parameters.items()}
+        return route, path_params
@@ -0,0 +1,166 @@
+import threading
+
+from sqlalchemy import and_, event, or_, select, true
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from db_config import get_session
+from models import Order, Vendor, Warehouse
+from utilities.enums.data_related_enums import UserRole
+from .cache_versions import cache_versions
+
+
+class OrderScope:
+    """
+    Orders the requester may access: orders supplied or received by his parties (warehouses of the manager`s company,
+    warehouses of the supervisor or vendors of the vendor). Warehouses supply from_warehouse orders and receive
+    to_warehouse ones, vendors the other way round. Admin`s scope is unrestricted (parties is None).
+    """
+    # Order type which parties of the kind supply, in the other type they are recipients
+    SUPPLIED_ORDER_TYPES = {"warehouse": "from_warehouse", "vendor": "to_warehouse"}
+    ORDER_TYPES = ("from_warehouse", "to_warehouse")
+
+    def __init__(self, party: str | None = None, parties=None):
+        self.party = party
+        self.parties = parties
+        self.criterion = self.party_criterion(party, parties) if parties is not None else true()
+        self.__ids = None
+
+    @property
+    def is_unrestricted(self) -> bool:
+        return self.parties is None
+
+    @classmethod
+    def party_criterion(cls, party: str, party_ids):
+        """
+        Builds condition matching orders supplied or received by the parties. Each branch compares order_type and one
+        party column, so it is resolved with the composite indexes of orders.
+        :param party: kind of the parties, warehouse or vendor
+        :param party_ids: ids of the parties, list or subquery
+        :return: SQL condition
+        """
+        supplied_type = cls.SUPPLIED_ORDER_TYPES[party]
+        received_type = next(order_type for order_type in cls.ORDER_TYPES if order_type != supplied_type)
+        return or_(
+            and_(Order.order_type == supplied_type, Order.supplier_id.in_(party_ids)),
+            and_(Order.order_type == received_type, Order.recipient_id.in_(party_ids))
+        )
+
+    def ids(self, session: Session) -> frozenset[int]:
+        """
+        Ids of the requester`s parties, queried on the first access.
+        :param session: session of the request
+        :return: set of ids, empty for unrestricted scope
+        """
+        if self.__ids is None:
+            self.__ids = frozenset(
+                party_id for party_id, in session.execute(self.parties)
+            ) if self.parties is not None else frozenset()
+
+        return self.__ids
+
+    def contains(self, session: Session, order: Order) -> bool:
+        """
+        Checks if the order is supplied or received by the requester`s parties.
+        :param session: session of the request
+        :param order: checked order
+        :return: True if the requester may access the order
+        """
+        if self.is_unrestricted:
+            return True
+
+        party_id = order.supplier_id if order.order_type == self.SUPPLIED_ORDER_TYPES[self.party] else order.recipient_id
+        return party_id in self.ids(session)
+
+
+class OrderScopeResolver:
+    """
+    Resolves scope of orders of the requester. Scopes are cached per manager`s company, supervisor and vendor owner, so
+    lists use the same compiled subquery and checks of single orders use the set of ids loaded once. Cached ids are
+    dropped when warehouses or vendors are created, deleted or change their owner: such changes increase version of the
+    cache (see services.cache_versions), so every process of the pool drops its scopes on its next request.
+    """
+    CACHE_NAME = "order_scopes"
+    # Attributes which assign warehouses and vendors to requesters
+    OWNER_ATTRIBUTES = {Warehouse: ("company_id", "supervisor_id"), Vendor: ("vendor_owner_id",)}
+
+    def __init__(self):
+        self.scopes = {}
+        self.version = None
+        self.lock = threading.Lock()
+
+    def resolve(self, identity) -> OrderScope:
+        """
+        Returns scope of orders of the requester.
+        :param identity: identity of the requester
+        :return: scope of the requester`s orders
+        """
+        role_code = identity.role_code
+        if role_code == UserRole.MANAGER.value["code"]:
+            key = ("company", identity.company_id)
+        elif role_code == UserRole.SUPERVISOR.value["code"]:
+            key = ("supervisor", identity.user_id)
+        elif role_code == UserRole.VENDOR.value["code"]:
+            key = ("vendor_owner", identity.user_id)
+        else:
+            return OrderScope()
+
+        with get_session() as session:
+            version = cache_versions.read(session, self.CACHE_NAME)
+
+        with self.lock:
+            if version != self.version:
+                self.scopes.clear()
+                self.version = version
+            scope = self.scopes.get(key)
+            if scope is None:
+                scope = self.scopes[key] = self.__build(*key)
+
+        return scope
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.scopes.clear()
+
+    def collect_changes(self, session: Session) -> None:
+        """
+        Increases version of the cache if the session changes parties of requesters and marks the session, so scopes
+        cached by this process are dropped right after it is committed.
+        :param session: session which is being flushed
+        """
+        for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+            attributes = self.OWNER_ATTRIBUTES.get(type(instance))
+            if attributes is not None and (
+                    instance in session.new or instance in session.deleted or
+                    any(get_history(instance, attribute).has_changes() for attribute in attributes)
+            ):
+                cache_versions.bump(session, self.CACHE_NAME)
+                session.info["order_scopes_changed"] = True
+                return
+
+    @staticmethod
+    def __build(kind: str, owner_id: int) -> OrderScope:
+        if kind == "company":
+            return OrderScope("warehouse", select(Warehouse.warehouse_id).where(Warehouse.company_id == owner_id))
+        if kind == "supervisor":
+            return OrderScope("warehouse", select(Warehouse.warehouse_id).where(Warehouse.supervisor_id == owner_id))
+        return OrderScope("vendor", select(Vendor.vendor_id).where(Vendor.vendor_owner_id == owner_id))
+
+
+order_scopes = OrderScopeResolver()
+
+
+@event.listens_for(Session, "before_flush")
+def collect_order_scope_changes(session, flush_context, instances):
+    order_scopes.collect_changes(session)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_order_scopes(session):
+    if session.info.pop("order_scopes_changed", False):
+        order_scopes.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_order_scope_changes(session):
+    session.info.pop("order_scopes_changed", None)
@@ -0,0 +1,140 @@
+from collections import defaultdict
+
+from sqlalchemy import case, event, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from models import Order, OrderStatusCounter
+from utilities import increment_rows
+from .history import attribute_value, track_previous_values
+from .scopes import OrderScope
+
+
+class OrderStatusCounters:
+    """
+    Keeps order_status_counters in sync with orders, so statistics of orders sum a few counter rows of the requester`s
+    warehouses or vendors instead of grouping their whole order history. Every order is counted in its status once for
+    its warehouse and once for its vendor.
+    Changes made through the ORM (creating, deleting orders, changing their status, type or parties) are collected right
+    before they are flushed, so counters are updated in the same transaction. Bulk updates of orders bypass the ORM and
+    must not change these attributes.
+    """
+    PARTIES = ("warehouse", "vendor")
+    # Attributes of the order which change its counters
+    ORDER_ATTRIBUTES = ("order_status", "order_type", "supplier_id", "recipient_id")
+
+    @staticmethod
+    def party_id(party: str, order_type: str, supplier_id: int, recipient_id: int) -> int:
+        """
+        Returns id of the order`s warehouse or vendor.
+        """
+        return supplier_id if order_type == OrderScope.SUPPLIED_ORDER_TYPES[party] else recipient_id
+
+    @staticmethod
+    def stats(session: Session, scope: OrderScope) -> dict[str, int]:
+        """
+        Returns numbers of orders in the scope by their statuses, statuses without orders are missing.
+        :param session: session of the request
+        :param scope: scope of the requester`s orders
+        :return: dictionary with numbers of orders by statuses
+        """
+        # Every order is counted once for its warehouse, so counters of all warehouses sum up to all orders
+        counters = session.query(OrderStatusCounter.order_status, func.sum(OrderStatusCounter.order_count)).filter(
+            OrderStatusCounter.party_type == (scope.party or "warehouse")
+        )
+        if not scope.is_unrestricted:
+            counters = counters.filter(OrderStatusCounter.party_id.in_(scope.parties))
+
+        return {
+            status: int(count) for status, count in counters.group_by(OrderStatusCounter.order_status).having(
+                func.sum(OrderStatusCounter.order_count) > 0
+            )
+        }
+
+    def collect_changes(self, session: Session) -> None:
+        """
+        Applies changes of orders pending in the session to the counters. Order is subtracted from counters of its
+        state before the flush and added to counters of its state after it.
+        :param session: session which is being flushed
+        """
+        changes = defaultdict(int)
+        for order in list(session.new) + list(session.dirty) + list(session.deleted):
+            if not isinstance(order, Order):
+                continue
+            if order not in session.new and order not in session.deleted and not any(
+                    get_history(order, attribute).has_changes() for attribute in self.ORDER_ATTRIBUTES
+            ):
+                continue
+
+            for old, sign in ((True, -1), (False, 1)):
+                if (old and order in session.new) or (not old and order in session.deleted):
+                    continue
+
+                order_type, supplier_id, recipient_id, order_status = (
+                    attribute_value(order, attribute, old)
+                    for attribute in ("order_type", "supplier_id", "recipient_id", "order_status")
+                )
+                for party in self.PARTIES:
+                    changes[(party, self.party_id(party, order_type, supplier_id, recipient_id), order_status)] += sign
+
+        increment_rows(
+            session, OrderStatusCounter.__table__, ("party_type", "party_id", "order_status"), ("order_count",), [
+                {"party_type": party, "party_id": party_id, "order_status": order_status, "order_count": count}
+                for (party, party_id, order_status), count in changes.items() if count
+            ]
+        )
+
+    def rebuild(self, session: Session, dry_run: bool = False) -> list[dict]:
+        """
+        Counts orders from scratch and compares counts with the stored counters. Unless it is a dry run, stored counters
+        are replaced with the computed ones. Should be run when orders are not being changed.
+        :param session: session in which counters are rebuilt
+        :param dry_run: only report the drift
+        :return: list of dictionaries with party_type, party_id, order_status, stored and expected counts of rows which
+        differ
+        """
+        expected = {}
+        for party in self.PARTIES:
+            party_id = case(
+                (Order.order_type == OrderScope.SUPPLIED_ORDER_TYPES[party], Order.supplier_id),
+                else_=Order.recipient_id
+            )
+            for party_id_value, order_status, count in session.query(
+                    party_id, Order.order_status, func.count()
+            ).group_by(party_id, Order.order_status):
+                expected[(party, party_id_value, order_status)] = count
+
+        stored = {
+            (row.party_type, row.party_id, row.order_status): row.order_count
+            for row in session.execute(select(OrderStatusCounter.__table__))
+        }
+
+        drift = [
+            {
+                "party_type": key[0], "party_id": key[1], "order_status": key[2],
+                "stored": stored.get(key, 0), "expected": expected.get(key, 0)
+            }
+            for key in sorted(set(expected) | set(stored)) if stored.get(key, 0) != expected.get(key, 0)
+        ]
+
+        if not dry_run:
+            session.execute(OrderStatusCounter.__table__.delete())
+            rows = [
+                {"party_type": party, "party_id": party_id, "order_status": order_status, "order_count": count}
+                for (party, party_id, order_status), count in expected.items()
+            ]
+            if rows:
+                session.execute(OrderStatusCounter.__table__.insert(), rows)
+
+        return drift
+
+
+order_status_counters = OrderStatusCounters()
+
+
+@event.listens_for(Session, "before_flush")
+def update_order_status_counters(session, flush_context, instances):
+    order_status_counters.collect_changes(session)
+
+
+track_previous_values(Order.order_status, Order.order_type, Order.supplier_id, Order.recipient_id)
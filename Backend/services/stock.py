@@ -0,0 +1,250 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, delete, insert, update
+from sqlalchemy.orm import Session
+
+from models import Inventory, Product, Rack, Warehouse
+from utilities.exceptions import ValidationError
+from .analytics import analytics_engine
+from .reservations import reservation_ledger
+
+
+class StockKeeper:
+    """
+    Moves products of the order between racks of the warehouse and the order. All lines are applied with grouped
+    statements: inventories are changed with one statement per kind of change (insert, update, delete) and remaining
+    capacities with one statement for racks and one for the warehouse, whatever the number of lines is.
+    Statements bypass the ORM, so changes of the stock are reported to the reservation ledger and the analytics engine.
+    """
+
+    def retrieve(self, session: Session, warehouse_id: int, lines: list[dict]) -> None:
+        """
+        Takes products from racks of the warehouse.
+        :param session: session of the request
+        :param warehouse_id: id of the supplier warehouse
+        :param lines: list of dictionaries with product_id, rack_id and real_quantity
+        """
+        self.__check_lines(lines, "real_quantity")
+
+        quantities = defaultdict(int)
+        for line in lines:
+            quantities[(line["rack_id"], line["product_id"])] += line["real_quantity"]
+
+        inventories = self.__load_inventories(session, warehouse_id, quantities.keys())
+        volumes = self.__load_volumes(session, {product_id for _, product_id in quantities})
+
+        deleted = []
+        updated = []
+        rack_deltas = defaultdict(float)
+        stock_deltas = defaultdict(int)
+        for (rack_id, product_id), quantity in quantities.items():
+            inventory = inventories.get((rack_id, product_id))
+            if inventory is None:
+                raise ValidationError("Inventory Not Found", 404)
+            if quantity > inventory.quantity:
+                raise ValidationError("This rack does not have the specified amount of goods", 400)
+
+            changed_volume = volumes[product_id] * quantity
+            if quantity == inventory.quantity:
+                deleted.append(inventory.inventory_id)
+            else:
+                updated.append({
+                    "b_inventory_id": inventory.inventory_id,
+                    "b_quantity": inventory.quantity - quantity,
+                    "b_total_volume": inventory.total_volume - changed_volume
+                })
+
+            rack_deltas[rack_id] += changed_volume
+            stock_deltas[product_id] -= quantity
+
+        table = Inventory.__table__
+        if updated:
+            session.execute(
+                update(table).where(table.c.inventory_id == bindparam("b_inventory_id")).values(
+                    quantity=bindparam("b_quantity"), total_volume=bindparam("b_total_volume")
+                ),
+                updated
+            )
+        if deleted:
+            session.execute(delete(table).where(table.c.inventory_id.in_(deleted)))
+
+        self.__apply_capacity_deltas(session, warehouse_id, rack_deltas)
+        reservation_ledger.add_stocks(session, warehouse_id, stock_deltas)
+        analytics_engine.touch(session, "inventory", warehouse_id)
+
+    def store(self, session: Session, warehouse: Warehouse, company_id: int, lines: list[dict]) -> None:
+        """
+        Puts products to racks of the warehouse. Lines are checked in the given order as if they were put one by one:
+        rack must have enough capacity left and must not be occupied by a non stackable product.
+        :param session: session of the request
+        :param warehouse: recipient warehouse
+        :param company_id: id of the requester`s company, products must belong to it
+        :param lines: list of dictionaries with rack_id, product_id and quantity
+        """
+        self.__check_lines(lines, "quantity")
+
+        rack_ids = {line.get("rack_id") for line in lines}
+        product_ids = {line.get("product_id") for line in lines}
+
+        racks = dict(
+            session.query(Rack.rack_id, Rack.remaining_capacity).filter(
+                Rack.rack_id.in_(rack_ids), Rack.warehouse_id == warehouse.warehouse_id
+            ).all()
+        )
+        products = {
+            product.product_id: product for product in session.query(
+                Product.product_id, Product.volume, Product.is_stackable, Product.product_type, Product.expiry_duration
+            ).filter(Product.product_id.in_(product_ids), Product.company_id == company_id)
+        }
+
+        # Products on the racks: existing inventories first, lines are added while they are checked
+        rack_products = defaultdict(dict)
+        inventories = {}
+        for inventory in session.query(
+                Inventory.inventory_id, Inventory.rack_id, Inventory.product_id, Product.is_stackable
+        ).join(Product, Product.product_id == Inventory.product_id).filter(Inventory.rack_id.in_(racks.keys())):
+            rack_products[inventory.rack_id][inventory.product_id] = inventory.is_stackable
+            inventories[(inventory.rack_id, inventory.product_id)] = inventory.inventory_id
+
+        quantities = defaultdict(int)
+        rack_deltas = defaultdict(float)
+        for line in lines:
+            rack_id = line.get("rack_id")
+            product_id = line.get("product_id")
+            quantity = line.get("quantity")
+
+            if rack_id not in racks:
+                raise ValidationError("Rack Not Found", 404)
+
+            product = products.get(product_id)
+            if product is None:
+                raise ValidationError("Product Not Found", 404)
+
+            volume = product.volume * quantity
+            if racks[rack_id] - rack_deltas[rack_id] < volume:
+                raise ValidationError("Not enough capacity", 400)
+
+            if not all(rack_products[rack_id].values()):
+                raise ValidationError("Non stackable product is already occupying this rack", 400)
+
+            if warehouse.warehouse_type != product.product_type:
+                raise ValidationError(
+                    f"Product with type {product.product_type} cannot be put to the warehouse for "
+                    f"{warehouse.warehouse_type} products",
+                    400)
+
+            rack_products[rack_id][product_id] = product.is_stackable
+            quantities[(rack_id, product_id)] += quantity
+            rack_deltas[rack_id] += volume
+
+        updated = []
+        inserted = []
+        stock_deltas = defaultdict(int)
+        now = datetime.now()
+        for (rack_id, product_id), quantity in quantities.items():
+            product = products[product_id]
+            stock_deltas[product_id] += quantity
+
+            if (rack_id, product_id) in inventories:
+                updated.append({
+                    "b_inventory_id": inventories[(rack_id, product_id)],
+                    "b_quantity": quantity,
+                    "b_total_volume": product.volume * quantity
+                })
+            else:
+                inserted.append({
+                    "rack_id": rack_id,
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "total_volume": product.volume * quantity,
+                    "arrival_date": now,
+                    "expiry_date": now + timedelta(days=product.expiry_duration)
+                    if product.expiry_duration is not None else None
+                })
+
+        table = Inventory.__table__
+        if updated:
+            # Quantities are added by the database, so concurrent changes of the same inventory are not lost
+            session.execute(
+                update(table).where(table.c.inventory_id == bindparam("b_inventory_id")).values(
+                    quantity=table.c.quantity + bindparam("b_quantity"),
+                    total_volume=table.c.total_volume + bindparam("b_total_volume")
+                ),
+                updated
+            )
+        if inserted:
+            session.execute(insert(table), inserted)
+
+        self.__apply_capacity_deltas(session, warehouse.warehouse_id, {
+            rack_id: -volume for rack_id, volume in rack_deltas.items()
+        })
+        reservation_ledger.add_stocks(session, warehouse.warehouse_id, stock_deltas)
+        analytics_engine.touch(session, "inventory", warehouse.warehouse_id)
+
+    @staticmethod
+    def __check_lines(lines, quantity_key: str) -> None:
+        """
+        Checks that every line has rack_id, product_id and a positive integer quantity, so malformed lines are rejected
+        before anything is written.
+        :param lines: lines sent by the client
+        :param quantity_key: key of the quantity in the lines
+        """
+        if not isinstance(lines, list) or not lines:
+            raise ValidationError("Filled inventories must be a non empty list.", 400)
+
+        for line in lines:
+            if not isinstance(line, dict) or any(key not in line for key in ("rack_id", "product_id", quantity_key)):
+                raise ValidationError(f"Each line must contain rack_id, product_id and {quantity_key}.", 400)
+
+            quantity = line[quantity_key]
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+                raise ValidationError(f"{quantity_key} must be a positive integer.", 400)
+
+    @staticmethod
+    def __load_inventories(session: Session, warehouse_id: int, keys) -> dict[tuple, object]:
+        """
+        Returns inventories of the warehouse by (rack_id, product_id) keys.
+        """
+        rack_ids = {rack_id for rack_id, _ in keys}
+        product_ids = {product_id for _, product_id in keys}
+
+        return {
+            (inventory.rack_id, inventory.product_id): inventory for inventory in session.query(
+                Inventory.inventory_id, Inventory.rack_id, Inventory.product_id, Inventory.quantity,
+                Inventory.total_volume
+            ).join(Rack, Rack.rack_id == Inventory.rack_id).filter(
+                Rack.warehouse_id == warehouse_id, Inventory.rack_id.in_(rack_ids),
+                Inventory.product_id.in_(product_ids)
+            )
+        }
+
+    @staticmethod
+    def __load_volumes(session: Session, product_ids: set) -> dict[int, float]:
+        return dict(session.query(Product.product_id, Product.volume).filter(Product.product_id.in_(product_ids)).all())
+
+    @staticmethod
+    def __apply_capacity_deltas(session: Session, warehouse_id: int, rack_deltas: dict[int, float]) -> None:
+        """
+        Adds freed (positive) or occupied (negative) volumes to remaining capacities of the racks and their warehouse.
+        """
+        if not rack_deltas:
+            return
+
+        racks = Rack.__table__
+        session.execute(
+            update(racks).where(racks.c.rack_id == bindparam("b_rack_id")).values(
+                remaining_capacity=racks.c.remaining_capacity + bindparam("b_delta")
+            ),
+            [{"b_rack_id": rack_id, "b_delta": delta} for rack_id, delta in rack_deltas.items()]
+        )
+
+        warehouses = Warehouse.__table__
+        session.execute(
+            update(warehouses).where(warehouses.c.warehouse_id == warehouse_id).values(
+                remaining_capacity=warehouses.c.remaining_capacity + sum(rack_deltas.values())
+            )
+        )
+
+
+stock_keeper = StockKeeper()
@@ -0,0 +1,124 @@
+"""
+Tests run against the in-memory SQLite database, it is migrated when the first session is opened, so neither MySQL nor
+alembic command is needed. Environment is set before the Backend is imported, because env_loader reads it on import.
+"""
+import os
+
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ.setdefault("TOKEN_SECRET", "test-secret")
+os.environ.setdefault("ADMIN_PASSWORD", "test-password")
+os.environ["BCRYPT_ROUNDS"] = "4"
+# Tests run in one process, which sees its own changes of cache versions at once, so versions are never re-read on
+# timeout and numbers of statements do not depend on the time the tests take
+os.environ["CACHE_VERSIONS_INTERVAL"] = "3600"
+
+import pytest
+
+from controller import controller
+from db_config import current_stats, get_session, request_session
+from models import Company, Product, Rack, Transport, User, Vendor, Warehouse
+from utilities import create_token
+
+
+def send(token: str, method: str, url: str, body=None, filters: dict = None) -> dict:
+    """
+    Sends the request to the controller as the IPC server does.
+    :return: response of the controller
+    """
+    return controller({
+        "url": url, "method": method, "body": body if body is not None else {},
+        "headers": {"token": token, "filters": filters or {}, "socket_id": None}
+    })
+
+
+def count_statements(token: str, method: str, url: str, body=None, filters: dict = None) -> tuple[dict, int]:
+    """
+    Sends the request inside of the request session opened here, so statistics of the whole request are collected.
+    :return: response of the controller and number of statements issued by the request
+    """
+    with request_session() as session:
+        stats = current_stats.get()
+        response = send(token, method, url, body, filters)
+        session.rollback()
+
+    return response, stats.statements
+
+
+def add_user(session, company: Company, role: str, number: int) -> User:
+    user = User(
+        company_id=company.company_id, user_name=f"{role.title()} {number}", user_surname="Test",
+        user_phone=f"+9989000000{number:02d}", user_email=f"{role}{number}@test.com", user_password="-",
+        is_password_forgotten=False, user_role=role
+    )
+    session.add(user)
+    session.flush()
+    return user
+
+
+@pytest.fixture(scope="session")
+def dataset() -> dict:
+    """
+    Company with a manager, a vendor and two warehouses with supervisors, racks and inventories of three products.
+    :return: tokens of the users and ids of the created instances
+    """
+    with get_session() as session:
+        company = Company(company_name="Test Company", company_email="company@test.com")
+        session.add(company)
+        session.flush()
+
+        manager = add_user(session, company, "manager", 1)
+        vendor_owner = add_user(session, company, "vendor", 2)
+        supervisors = [add_user(session, company, "supervisor", number) for number in (3, 4)]
+
+        warehouses = []
+        for supervisor in supervisors:
+            warehouse = Warehouse(
+                company_id=company.company_id, supervisor_id=supervisor.user_id,
+                warehouse_name=f"Warehouse {supervisor.user_id}", warehouse_address="Test street",
+                overall_capacity=10000, remaining_capacity=10000, warehouse_type="dry"
+            )
+            session.add(warehouse)
+            session.flush()
+            warehouses.append(warehouse)
+            session.add_all(
+                Rack(warehouse_id=warehouse.warehouse_id, rack_position=f"A{position}", overall_capacity=1000,
+                     remaining_capacity=1000)
+                for position in range(1, 6)
+            )
+
+        products = [
+            Product(
+                company_id=company.company_id, product_name=f"Product {number}", description="Test product",
+                weight=1, volume=number, price=10 * number, expiry_duration=30 * number, product_type="dry"
+            )
+            for number in (1, 2, 3)
+        ]
+        vendor = Vendor(vendor_name="Test Vendor", vendor_address="Vendor street", vendor_owner_id=vendor_owner.user_id)
+        transport = Transport(transport_capacity=100000, transport_type="truck", transport_speed=60, price_per_weight=1)
+        session.add_all([*products, vendor, transport])
+        session.commit()
+
+        data = {
+            "company_id": company.company_id,
+            "manager": create_token(manager.user_id, "manager", company.company_id),
+            "vendor": create_token(vendor_owner.user_id, "vendor", company.company_id),
+            "supervisors": [create_token(user.user_id, "supervisor", company.company_id) for user in supervisors],
+            "warehouse_ids": [warehouse.warehouse_id for warehouse in warehouses],
+            "product_ids": [product.product_id for product in products],
+            "vendor_id": vendor.vendor_id,
+            "transport_id": transport.transport_id,
+        }
+        data["rack_ids"] = [
+            [rack_id for rack_id, in session.query(Rack.rack_id).filter_by(warehouse_id=warehouse_id)]
+            for warehouse_id in data["warehouse_ids"]
+        ]
+
+    # Inventories are added by supervisors, so capacities of racks and the stock are kept as in real use
+    for supervisor, rack_ids in zip(data["supervisors"], data["rack_ids"]):
+        for rack_id, product_id in zip(rack_ids, data["product_ids"]):
+            response = send(
+                supervisor, "POST", "/inventories", {"rack_id": rack_id, "product_id": product_id, "quantity": 50}
+            )
+            assert response["status_code"] == 201, response
+
+    return data
@@ -0,0 +1,144 @@
+from sqlalchemy.orm import Session
+
+from conftest import send
+from db_config import engine, get_session
+from models import Order, OrderItem
+from services import daily_rollups, order_status_counters, reservation_ledger
+
+
+def assert_no_drift() -> None:
+    with get_session() as session:
+        assert reservation_ledger.reconcile(session, dry_run=True) == []
+        assert order_status_counters.rebuild(session, dry_run=True) == []
+        assert daily_rollups.backfill(session, dry_run=True) == []
+
+
+def request(token: str, method: str, url: str, body=None, status_code: int = 200) -> dict:
+    """
+    Sends the request, checks its status code and that the maintained tables did not drift from orders and inventories.
+    :return: body of the response, None for errors
+    """
+    response = send(token, method, url, body)
+    assert response["status_code"] == status_code, response
+    assert_no_drift()
+    return response.get("body")
+
+
+def create_order(dataset: dict, order_type: str, items: list[dict]) -> int:
+    order = request(dataset["vendor"], "POST", "/orders", {
+        "order_type": order_type, "vendor_id": dataset["vendor_id"], "warehouse_id": dataset["warehouse_ids"][0],
+        "items": items
+    }, 201)
+    return order["order_id"]
+
+
+def receive(supervisor: str, order_id: int) -> dict:
+    """
+    Puts items of the order to the racks planned by the receive preview.
+    :return: received order
+    """
+    preview = request(supervisor, "GET", f"/order/{order_id}/receive/preview")
+    # Planned quantities are sent back as the quantities which were put to the racks
+    return request(supervisor, "PUT", f"/order/{order_id}/receive", {"filled_inventories": [
+        {"rack_id": line["rack_id"], "product_id": line["product_id"], "quantity": line["real_quantity"]}
+        for line in preview["filled_inventories"]
+    ]})
+
+
+def test_incoming_order_is_received(dataset):
+    assert_no_drift()
+    manager, supervisor = dataset["manager"], dataset["supervisors"][0]
+    first_product, second_product, third_product = dataset["product_ids"]
+
+    order_id = create_order(dataset, "to_warehouse", [{"product_id": first_product, "quantity": 3}])
+    request(dataset["vendor"], "PUT", f"/order/{order_id}", {
+        "vendor_id": dataset["vendor_id"],
+        "items": [{"product_id": second_product, "quantity": 4}, {"product_id": third_product, "quantity": 2}]
+    })
+    request(manager, "PUT", f"/order/{order_id}/confirm", {"transport_id": dataset["transport_id"]})
+    request(manager, "PUT", f"/order/{order_id}/status", {"status": "processing"})
+    request(supervisor, "PUT", f"/order/{order_id}/status", {"status": "delivered"})
+
+    order = receive(supervisor, order_id)
+    assert order["order_status"] == "finished"
+
+
+def test_outgoing_order_is_sent_and_damaged(dataset):
+    manager, supervisor = dataset["manager"], dataset["supervisors"][0]
+    first_product, second_product, _ = dataset["product_ids"]
+
+    order_id = create_order(dataset, "from_warehouse", [
+        {"product_id": first_product, "quantity": 5}, {"product_id": second_product, "quantity": 1}
+    ])
+    request(manager, "PUT", f"/order/{order_id}/confirm", {"transport_id": dataset["transport_id"]})
+
+    preview = request(supervisor, "GET", f"/order/{order_id}/send/preview")
+    request(supervisor, "PUT", f"/order/{order_id}/send", preview)
+    request(dataset["vendor"], "PUT", f"/order/{order_id}/status", {"status": "delivered"})
+    order = request(dataset["vendor"], "POST", f"/order/{order_id}/lost-items", {
+        "items": [{"product_id": first_product, "quantity": 2}], "status": "damaged"
+    })
+    assert order["order_status"] == "damaged"
+    order = request(dataset["vendor"], "PUT", f"/order/{order_id}/status", {"status": "finished"})
+    assert order["order_status"] == "finished"
+
+
+def test_incoming_order_is_partly_lost(dataset):
+    manager, supervisor = dataset["manager"], dataset["supervisors"][0]
+    product_id = dataset["product_ids"][2]
+
+    order_id = create_order(dataset, "to_warehouse", [{"product_id": product_id, "quantity": 3}])
+    request(manager, "PUT", f"/order/{order_id}/confirm", {"transport_id": dataset["transport_id"]})
+    request(manager, "PUT", f"/order/{order_id}/status", {"status": "processing"})
+    order = request(supervisor, "POST", f"/order/{order_id}/lost-items", {
+        "items": [{"product_id": product_id, "quantity": 2}], "status": "lost"
+    })
+    assert order["order_status"] == "lost"
+    order = receive(supervisor, order_id)
+    assert order["order_status"] == "finished"
+
+
+def test_new_order_is_cancelled(dataset):
+    order_id = create_order(dataset, "to_warehouse", [{"product_id": dataset["product_ids"][0], "quantity": 1}])
+    order = request(dataset["vendor"], "PUT", f"/order/{order_id}/cancel")
+    assert order["order_status"] == "cancelled"
+
+
+def test_order_totals_are_not_overwritten_by_stale_session(dataset):
+    first_product, second_product, third_product = dataset["product_ids"]
+    order_id = create_order(dataset, "to_warehouse", [{"product_id": first_product, "quantity": 1}])
+
+    # Session which read the order before another transaction changed its items
+    stale_session = Session(bind=engine, expire_on_commit=False)
+    stale_order = stale_session.get(Order, order_id)
+    assert stale_order.item_count == 1
+    stale_session.commit()
+
+    with get_session() as session:
+        session.add(OrderItem(order_id=order_id, product_id=second_product, quantity=2))
+
+    stale_session.add(OrderItem(order_id=order_id, product_id=third_product, quantity=1))
+    stale_session.commit()
+    stale_session.close()
+
+    with get_session() as session:
+        assert session.get(Order, order_id).item_count == 4
+    assert_no_drift()
+
+
+def test_malformed_lines_are_rejected(dataset):
+    manager, supervisor = dataset["manager"], dataset["supervisors"][0]
+    product_id = dataset["product_ids"][0]
+
+    order_id = create_order(dataset, "from_warehouse", [{"product_id": product_id, "quantity": 2}])
+    request(manager, "PUT", f"/order/{order_id}/confirm", {"transport_id": dataset["transport_id"]})
+    line = request(supervisor, "GET", f"/order/{order_id}/send/preview")["filled_inventories"][0]
+
+    for malformed in ({**line, "real_quantity": -2}, {**line, "real_quantity": 1.5}, {
+        key: value for key, value in line.items() if key != "rack_id"
+    }):
+        request(supervisor, "PUT", f"/order/{order_id}/send", {"filled_inventories": [line, malformed]}, 400)
+    request(supervisor, "PUT", f"/order/{order_id}/send", {}, 400)
+
+    order = request(supervisor, "PUT", f"/order/{order_id}/send", {"filled_inventories": [line]})
+    assert order["order_status"] == "processing"
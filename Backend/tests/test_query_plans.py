@@ -0,0 +1,23 @@
+from check_query_plans import HOT_REQUESTS, find_full_scans, sample_requesters
+from conftest import send
+from db_config import get_session
+
+
+def test_hot_requests_do_not_scan_tables(dataset):
+    # Delivered order lets the receive preview plan the placement instead of rejecting the order
+    manager, supervisor = dataset["manager"], dataset["supervisors"][0]
+    order_id = send(dataset["vendor"], "POST", "/orders", {
+        "order_type": "to_warehouse", "vendor_id": dataset["vendor_id"], "warehouse_id": dataset["warehouse_ids"][0],
+        "items": [{"product_id": dataset["product_ids"][0], "quantity": 1}]
+    })["body"]["order_id"]
+    send(manager, "PUT", f"/order/{order_id}/confirm", {"transport_id": dataset["transport_id"]})
+    send(manager, "PUT", f"/order/{order_id}/status", {"status": "processing"})
+    response = send(supervisor, "PUT", f"/order/{order_id}/status", {"status": "delivered"})
+    assert response["status_code"] == 200, response
+
+    with get_session() as session:
+        requesters = sample_requesters(session)
+    assert requesters.keys() == HOT_REQUESTS.keys()
+    requesters["supervisor"].update(token=supervisor, warehouse_id=dataset["warehouse_ids"][0], order_id=order_id)
+
+    assert find_full_scans(requesters) == []
@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import count_statements, send
+from db_config import get_session
+from models import Order, OrderItem
+
+
+def add_orders(dataset: dict, count: int, items_number: int = 3) -> list[int]:
+    """
+    Adds incoming orders of the vendor to both warehouses.
+    :param dataset: instances created by the dataset fixture
+    :param count: number of orders
+    :param items_number: number of items of each order, every item is a different product
+    :return: ids of the orders
+    """
+    with get_session() as session:
+        orders = [
+            Order(
+                supplier_id=dataset["vendor_id"], recipient_id=dataset["warehouse_ids"][number % 2],
+                order_type="to_warehouse", order_status="new", total_price=0, created_at=datetime.now(),
+                ordered_items=[
+                    OrderItem(product_id=product_id, quantity=1) for product_id in dataset["product_ids"][:items_number]
+                ]
+            )
+            for number in range(count)
+        ]
+        session.add_all(orders)
+        session.commit()
+
+        return [order.order_id for order in orders]
+
+
+@pytest.mark.parametrize("role, url, filters", [
+    ("manager", "/orders", {}),
+    ("manager", "/orders", {"limit": 100}),
+    ("vendor", "/orders", {}),
+    ("manager", "/orders/details", {}),
+])
+def test_statements_of_order_lists_do_not_depend_on_number_of_orders(dataset, role, url, filters):
+    # Scope of the requester is resolved by the first request and cached for the next ones, so it is not counted
+    send(dataset[role], "GET", url, filters=filters)
+    add_orders(dataset, 2)
+    response, few_orders_statements = count_statements(dataset[role], "GET", url, filters=filters)
+    assert response["status_code"] == 200, response
+    few_orders = len(response["body"])
+
+    add_orders(dataset, 30)
+    response, many_orders_statements = count_statements(dataset[role], "GET", url, filters=filters)
+    assert response["status_code"] == 200, response
+    assert len(response["body"]) >= few_orders + 30
+    assert many_orders_statements == few_orders_statements
+
+
+def test_statements_of_order_do_not_depend_on_number_of_items(dataset):
+    order_id, = add_orders(dataset, 1)
+    send(dataset["manager"], "GET", f"/order/{order_id}")
+    statements = []
+    for items_number in (1, 3):
+        order_id, = add_orders(dataset, 1, items_number)
+        response, order_statements = count_statements(dataset["manager"], "GET", f"/order/{order_id}")
+        assert response["status_code"] == 200, response
+        assert len(response["body"]["items"]) == items_number
+        statements.append(order_statements)
+
+    assert statements[0] == statements[1]
@@ -0,0 +1,40 @@
+from conftest import send
+from db_config import get_session
+from models import User
+from utilities import create_token
+
+
+def add_employee(dataset: dict, number: int) -> tuple[int, str]:
+    """
+    Adds a supervisor to the dataset`s company.
+    :return: id and token of the supervisor
+    """
+    with get_session() as session:
+        user = User(
+            company_id=dataset["company_id"], user_name=f"Employee {number}", user_surname="Test",
+            user_phone=f"+9989100000{number:02d}", user_email=f"employee{number}@test.com", user_password="-",
+            is_password_forgotten=False, user_role="supervisor"
+        )
+        session.add(user)
+        session.commit()
+        return user.user_id, create_token(user.user_id, "supervisor", dataset["company_id"])
+
+
+def test_unchanged_company_passed_as_string_keeps_tokens(dataset):
+    user_id, token = add_employee(dataset, 1)
+    response = send(dataset["manager"], "PUT", f"/user/{user_id}", {
+        "company_id": str(dataset["company_id"]), "user_role": "supervisor"
+    })
+    assert response["status_code"] == 200, response
+
+    response = send(token, "GET", f"/user/{user_id}")
+    assert response["status_code"] == 200, response
+
+
+def test_changed_role_revokes_tokens(dataset):
+    user_id, token = add_employee(dataset, 2)
+    response = send(dataset["manager"], "PUT", f"/user/{user_id}", {"user_role": "manager"})
+    assert response["status_code"] == 200, response
+
+    response = send(token, "GET", f"/user/{user_id}")
+    assert response["status_code"] == 401, response
@@ -1,3 +1,5 @@
-from .functions import hash_password, check_password, create_token, decode_token, extract_id_from_url
-from .validators import is_email_valid, is_phone_valid, is_instance_already_exists
+from .functions import hash_password, check_password, create_token, verify_token, revoke_tokens, decode_token, \
+    extract_id_from_url
+from .validators import is_email_valid, is_phone_valid, is_instance_already_exists, validate_order_items
 from .exceptions import ValidationError, DatabaseError
+from .portable_sql import day_number, increment_rows
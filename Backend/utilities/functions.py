@@ -1,14 +1,23 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+
 import bcrypt
 import re
 
 from db_config import get_session
+from env_loader import token_secret, token_lifetime, accept_legacy_tokens, bcrypt_rounds
 from models import User
+from utilities.enums.data_related_enums import UserRole
 from utilities.exceptions import ValidationError
 
 
 def hash_password(password: str) -> bytes:
-    # Hashing password
-    slat = bcrypt.gensalt()
+    # Hashing password, cost factor is configured by BCRYPT_ROUNDS
+    slat = bcrypt.gensalt(rounds=bcrypt_rounds)
     hashed_password = bcrypt.hashpw(password.encode("utf-8"), slat)
 
     return hashed_password
@@ -19,41 +28,112 @@ def check_password(hashed_password: str, input_password: str) -> bool:
     return bcrypt.checkpw(input_password.encode("utf-8"), hashed_password.encode("utf-8"))
 
 
-def create_token(user_id: int, user_role: str) -> str:
+ROLE_CODES = {role.value["name"]: role.value["code"] for role in UserRole}
+ROLE_NAMES = {code: name for name, code in ROLE_CODES.items()}
+
+# Without configured secret tokens are valid only until the backend is restarted
+TOKEN_SECRET = (token_secret or secrets.token_hex(32)).encode("utf-8")
+
+def _encode_segment(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _decode_segment(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _encode_segment(hmac.new(TOKEN_SECRET, payload.encode("utf-8"), hashlib.sha256).digest())
+
+
+def create_token(user_id: int, user_role: str, company_id: int, token_version: int = 0) -> str:
     """
-    Creates token with which user can be recognized by the server.
+    Creates token with which user can be recognized by the server. Token consists of payload with user`s id, role,
+    company, token version and expiry time and HMAC signature of the payload.
     :param user_id: id of the user
     :param user_role: role of the user
+    :param company_id: id of the user`s company
+    :param token_version: current token_version of the user, token is revoked when it is increased
     :return: token
     """
-    role_identifier = {
-        "manager": "0",
-        "supervisor": "1",
-        "vendor": "2",
-        "admin": "3"
+    claims = {
+        "user_id": user_id,
+        "role": ROLE_CODES[user_role],
+        "company_id": company_id,
+        "ver": token_version,
+        "exp": int(time.time()) + token_lifetime
     }
+    payload = _encode_segment(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
 
-    return role_identifier.get(user_role) + str(user_id*69 + 420)
+    return f"{payload}.{_sign(payload)}"
 
 
-def decode_token(token: str) -> int:
+def verify_token(token: str) -> dict:
     """
-    Decodes token and returns user id.
-    :param token: encoded token.
-    :return: id of the user from database
+    Verifies signature and expiry of the token in memory and returns data stored in it. Revoked tokens (their version
+    differs from the user`s token_version) are rejected by services.identity, which keeps token versions of the users
+    in memory. Legacy tokens (role code followed by encoded user id) are accepted while ACCEPT_LEGACY_TOKENS is enabled.
+    :param token: encoded token
+    :return: dictionary with user_id, role (code of the role), company_id (None for legacy tokens), ver (None for legacy
+    tokens) and exp
     """
-    with get_session() as session:
-        if token is None:
-            raise ValidationError("Token is not provided.")
-        if not token.isalnum():
-            raise ValidationError("Token is not valid.")
+    if token is None:
+        raise ValidationError("Token is not provided.")
+    if not isinstance(token, str):
+        raise ValidationError("Token is not valid.", 401)
+
+    if token.isdigit() and len(token) > 1:
+        if not accept_legacy_tokens:
+            raise ValidationError("Token is not valid.", 401)
 
         user_id = (int(token[1:]) - 420) // 69
+        with get_session() as session:
+            if session.query(User.user_id).filter_by(user_id=user_id).first() is None:
+                raise ValidationError("User with this token does not exist.")
+
+        return {"user_id": user_id, "role": token[0], "company_id": None, "ver": None, "exp": None}
 
-        if session.query(User).filter_by(user_id=user_id).first() is None:
-            raise ValidationError("User with this token does not exist.")
+    # Bytes are compared, because compare_digest does not accept strings with non-ASCII characters
+    payload, _, signature = token.partition(".")
+    if not payload or not hmac.compare_digest(signature.encode("utf-8"), _sign(payload).encode("utf-8")):
+        raise ValidationError("Token is not valid.", 401)
 
-        return user_id
+    # Signed payload may still be malformed (e.g. signed with the same secret by another version of the Backend)
+    try:
+        claims = json.loads(_decode_segment(payload))
+        is_expired = claims["exp"] < time.time()
+        if not isinstance(claims["user_id"], int) or claims["role"] not in ROLE_NAMES or "company_id" not in claims:
+            raise ValueError("Claims of the token are not valid.")
+    except (TypeError, ValueError, KeyError):
+        raise ValidationError("Token is not valid.", 401)
+
+    if is_expired:
+        raise ValidationError("Token has expired.", 401)
+
+    # Tokens issued before token versions were added do not have them
+    claims.setdefault("ver", 0)
+    return claims
+
+
+def revoke_tokens(user_id: int) -> None:
+    """
+    Rejects all tokens of the user issued so far, e.g. after his role or company was changed.
+    :param user_id: id of the user
+    """
+    with get_session() as session:
+        user = session.query(User).filter_by(user_id=user_id).first()
+        if user is not None:
+            user.token_version += 1
+            session.commit()
+
+
+def decode_token(token: str) -> int:
+    """
+    Decodes token and returns user id.
+    :param token: encoded token.
+    :return: id of the user from database
+    """
+    return verify_token(token)["user_id"]
 
 
 def extract_id_from_url(url: str, model_name: str) -> int | None:
@@ -0,0 +1,72 @@
+from sqlalchemy import Integer, update
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+# SQL which differs between databases is built here, so the Backend runs on MySQL as well as on SQLite
+class day_number(FunctionElement):
+    """
+    Number of days since 1970-01-01 of the date or datetime, computed by the database, so dates are read as plain
+    integers instead of being parsed to Python objects.
+    """
+    type = Integer()
+    name = "day_number"
+    inherit_cache = True
+
+
+@compiles(day_number)
+def compile_day_number(element, compiler, **kwargs):
+    return "CAST(CAST(%s AS DATE) - DATE '1970-01-01' AS INTEGER)" % compiler.process(element.clauses, **kwargs)
+
+
+@compiles(day_number, "mysql")
+def compile_mysql_day_number(element, compiler, **kwargs):
+    # TO_DAYS('1970-01-01') is 719528
+    return "(TO_DAYS(%s) - 719528)" % compiler.process(element.clauses, **kwargs)
+
+
+@compiles(day_number, "sqlite")
+def compile_sqlite_day_number(element, compiler, **kwargs):
+    # Julian day of 1970-01-01 is 2440587.5
+    return "CAST(julianday(date(%s)) - 2440587.5 AS INTEGER)" % compiler.process(element.clauses, **kwargs)
+
+
+def increment_rows(session, table, key_columns: tuple[str, ...], counters: tuple[str, ...], rows: list[dict]) -> None:
+    """
+    Adds values of counters to rows of the table, missing rows are inserted. Values are incremented by the database, so
+    concurrent transactions do not overwrite each other`s changes.
+    :param session: session in which rows are changed
+    :param table: table of counters
+    :param key_columns: names of the columns which identify the row (primary key)
+    :param counters: names of the incremented columns
+    :param rows: list of dictionaries with keys and increments of the counters
+    """
+    if not rows:
+        return
+
+    dialect = session.get_bind().dialect.name
+
+    if dialect == "mysql":
+        statement = mysql.insert(table)
+        statement = statement.on_duplicate_key_update(
+            {counter: table.c[counter] + statement.inserted[counter] for counter in counters}
+        )
+    elif dialect == "sqlite":
+        statement = sqlite.insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c[column] for column in key_columns],
+            set_={counter: table.c[counter] + statement.excluded[counter] for counter in counters}
+        )
+    else:
+        for row in rows:
+            result = session.execute(
+                update(table).where(*(table.c[column] == row[column] for column in key_columns)).values(
+                    {counter: table.c[counter] + row[counter] for counter in counters}
+                )
+            )
+            if result.rowcount == 0:
+                session.execute(table.insert(), row)
+        return
+
+    session.execute(statement, rows)
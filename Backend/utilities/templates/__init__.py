@@ -1 +1,2 @@
-from .response import ResponseFactory
\ No newline at end of file
+from .response import ResponseFactory
+from .streaming import StreamingResponse
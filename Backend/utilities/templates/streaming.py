@@ -0,0 +1,58 @@
+from typing import Callable, Iterator
+
+from db_config import request_session
+from utilities.exceptions import ValidationError, DatabaseError
+
+
+class StreamingResponse:
+    """
+    Response of the list endpoint sent as a sequence of messages instead of one: header, chunks of rows and trailer.
+    Every message contains headers of the request, so the server forwards all of them to the same socket_id.
+    Rows are read from the database chunk_size at a time when messages are iterated, so memory used by the response
+    does not depend on the number of rows. Rows are serialized one by one with serialize, or together with
+    serialize_chunk(session, rows) which can load related data of the whole chunk at once.
+    """
+    def __init__(self, statement, serialize: Callable | None, headers: dict, chunk_size: int, name: str = "",
+                 serialize_chunk: Callable | None = None):
+        self.statement = statement
+        self.serialize = serialize
+        self.serialize_chunk = serialize_chunk
+        self.headers = headers
+        self.chunk_size = chunk_size
+        self.name = name
+
+    def messages(self) -> Iterator[dict]:
+        """
+        Reads rows in their own session (the request`s one is already closed when the response is sent) and yields
+        messages of the stream. If reading fails after the header was sent, trailer contains the error.
+        :return: iterator over header, chunks of rows and trailer
+        """
+        yield {"status_code": 200, "headers": self.headers, "stream": "header", "chunk_size": self.chunk_size}
+
+        sequence = 0
+        count = 0
+        try:
+            with request_session(self.name) as session:
+                result = session.execute(self.statement.execution_options(yield_per=self.chunk_size))
+
+                for rows in result.scalars().partitions():
+                    yield {
+                        "status_code": 200,
+                        "headers": self.headers,
+                        "stream": "rows",
+                        "sequence": sequence,
+                        "body": self.serialize_chunk(session, rows) if self.serialize_chunk else
+                        [self.serialize(row) for row in rows]
+                    }
+                    sequence += 1
+                    count += len(rows)
+
+        except (ValidationError, DatabaseError) as e:
+            yield {"status_code": e.status_code, "headers": self.headers, "stream": "trailer", "message": e.message}
+            return
+
+        except Exception as e:
+            yield {"status_code": 500, "headers": self.headers, "stream": "trailer", "message": str(e)}
+            return
+
+        yield {"status_code": 200, "headers": self.headers, "stream": "trailer", "chunks": sequence, "count": count}
@@ -1,5 +1,7 @@
 import re
 from db_config import get_session
+from models import Product
+from utilities.exceptions import ValidationError
 
 
 def is_email_valid(email: str) -> bool:
@@ -33,3 +35,35 @@ def is_instance_already_exists(model, **kwargs) -> bool:
     """
     with get_session() as session:
         return session.query(model).filter_by(**kwargs).first() is not None
+
+
+def validate_order_items(order_items: list[dict]) -> tuple[dict, dict, float, float]:
+    """
+    Check that all products of the order exist and are of the same type. Products are loaded with one query and
+    totals are computed from the loaded rows.
+    :param order_items: list of dictionaries with product_id and quantity
+    :return: products by their ids, quantities by product ids, total volume and total price of the items
+    """
+    product_ids = {item.get("product_id") for item in order_items}
+
+    with get_session() as session:
+        products = {
+            product.product_id: product
+            for product in session.query(Product).filter(Product.product_id.in_(product_ids))
+        }
+
+    # Errors are reported for the first invalid item, as if items were checked one by one
+    main_product = products.get(order_items[0].get("product_id"))
+    for item in order_items:
+        product = products.get(item.get("product_id"))
+
+        if product is None:
+            raise ValidationError(f"Product with id {item.get('product_id')} does not exist", 404)
+        if product.product_type != main_product.product_type:
+            raise ValidationError("All products must be of the same type", 400)
+
+    products_to_order = {item.get("product_id"): item.get("quantity") for item in order_items}
+    total_volume = sum(products[item.get("product_id")].volume * item.get("quantity") for item in order_items)
+    total_price = sum(products[item.get("product_id")].price * item.get("quantity") for item in order_items)
+
+    return products, products_to_order, total_volume, total_price
@@ -1,6 +1,6 @@
 from db_config import get_session
 from models import Company, User
-from utilities import is_email_valid, is_instance_already_exists, decode_token
+from utilities import is_email_valid, is_instance_already_exists
 from services import check_allowed_methods_middleware,  view_function_middleware, check_allowed_roles_middleware
 from utilities.exceptions import ValidationError, DatabaseError
 from utilities.enums.method import Method
@@ -51,7 +51,7 @@ class CompanyView(GenericView):
         """
         with get_session() as session:
             company_email = self.body.get("company_email")
-            owner_id = decode_token(self.headers["token"])
+            owner_id = self.requester_id
             company = session.query(User).filter_by(user_id=owner_id).first().company
 
             if company.company_id != self.instance.company_id:
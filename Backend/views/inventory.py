@@ -1,11 +1,11 @@
 from datetime import datetime, timedelta
-from sqlalchemy import func, or_, and_, desc, text, cast, Float
 
 from db_config import get_session
-from models import Inventory, User, Warehouse, Rack, Product, ThrownItem
-from services import view_function_middleware, check_allowed_methods_middleware, check_allowed_roles_middleware
+from models import Inventory, Warehouse, Rack, Product, ThrownItem
+from services import view_function_middleware, check_allowed_methods_middleware, check_allowed_roles_middleware, \
+    reservation_ledger, analytics_engine, order_scopes
 from services.generics import GenericView
-from utilities import decode_token, ValidationError
+from utilities import ValidationError
 from utilities.enums.data_related_enums import UserRole
 from utilities.enums.method import Method
 
@@ -28,9 +28,9 @@ class InventoryView(GenericView):
             product_id = self.body.get("product_id")
             quantity = self.body.get("quantity")
 
-            creator_id = decode_token(self.headers.get("token"))
+            creator_id = self.requester_id
             warehouse = session.query(Warehouse).filter_by(supervisor_id=creator_id).first()
-            company_id = session.query(User.company_id).filter_by(user_id=creator_id).scalar()
+            company_id = self.identity.company_id
 
             rack = session.query(Rack).filter_by(rack_id=rack_id, warehouse_id=warehouse.warehouse_id).first()
             if not rack:
@@ -65,11 +65,13 @@ class InventoryView(GenericView):
 
             inventory = session.query(Inventory).filter_by(rack_id=rack_id, product_id=product_id).first()
             if inventory:
+                reservation_ledger.add_stock(session, warehouse.warehouse_id, product_id, quantity)
                 quantity = quantity + inventory.quantity
                 total_volume = total_volume_init + inventory.total_volume
 
                 update_data = {"quantity": quantity, "total_volume": total_volume}
                 session.query(Inventory).filter_by(rack_id=rack_id, product_id=product_id).update(update_data)
+                analytics_engine.touch(session, "inventory", warehouse.warehouse_id)
 
             else:
                 new_inventory = Inventory(
@@ -113,9 +115,9 @@ class InventoryView(GenericView):
             product_id = self.body.get("product_id")
             quantity = self.body.get("quantity")
 
-            creator_id = decode_token(self.headers.get("token"))
+            creator_id = self.requester_id
             warehouse = session.query(Warehouse).filter_by(supervisor_id=creator_id).first()
-            company_id = session.query(User.company_id).filter_by(user_id=creator_id).scalar()
+            company_id = self.identity.company_id
 
             rack = session.query(Rack).filter_by(rack_id=rack_id, warehouse_id=warehouse.warehouse_id).first()
             if not rack:
@@ -139,6 +141,8 @@ class InventoryView(GenericView):
             else:
                 session.query(Inventory).filter_by(rack_id=rack_id, product_id=product_id).update({"quantity": diff,
                                                                                                    "total_volume": inventory.total_volume - changed_volume})
+                reservation_ledger.add_stock(session, warehouse.warehouse_id, product_id, -quantity)
+                analytics_engine.touch(session, "inventory", warehouse.warehouse_id)
 
             new_thrown_item = ThrownItem(
                 product_id=product_id,
@@ -171,52 +175,28 @@ class InventoryView(GenericView):
     @check_allowed_methods_middleware([Method.GET.value])
     def group_inventory_by_product(self, request: dict, **kwargs) -> dict:
         """
-        Group inventory by product.
+        Group inventory by product: number of inventories, their total volume and average number of days between arrival
+        and expiry. Computed by the analytics engine from the cached inventories of the requester`s company.
         :param request: dictionary containing url, method, body and headers
+        :param kwargs: warehouse_id limits inventories to the warehouse
         :return: dictionary containing status_code and response body
         """
-        with (get_session() as session):
+        with get_session() as session:
+            # admin sees inventories of all companies, supervisor only of his warehouses
+            company_id = None if self.requester_role == UserRole.ADMIN.value["code"] else self.identity.company_id
+            warehouse_ids = None
+            if self.requester_role == UserRole.SUPERVISOR.value["code"]:
+                warehouse_ids = order_scopes.resolve(self.identity).ids(session)
+
             # if there is filter by warehouse_id
             warehouse_id = kwargs.get("warehouse_id")
-
-            result = session.query(Inventory.product_id, Product.product_name,
-                                   func.count(Inventory.product_id).label("products_number"),
-                                   cast(func.sum(Inventory.total_volume).label("total_volume_sum"), Float),
-                                   cast(
-                                       func.avg(func.datediff(Inventory.expiry_date, Inventory.arrival_date)),
-                                       Float
-                                   ).label("average_expiry_date"),
-                                   ).join(Product).group_by(Inventory.product_id)
-
-            # if admin - return everything
-            if self.requester_role == UserRole.ADMIN.value["code"]:
-                result = result.all()
-
-            # if manager - return all warehouses
-            if self.requester_role == UserRole.MANAGER.value["code"]:
-                manager = session.query(User).filter_by(user_id=self.requester_id).first()
-                wh_ids = session.query(Warehouse.warehouse_id).filter_by(company_id=manager.company_id).all()
-                if warehouse_id:
-                    wh_ids = session.query(Warehouse.warehouse_id).filter_by(warehouse_id=warehouse_id).all()
-                rack_ids = session.query(Rack.rack_id).filter(Rack.warehouse_id.in_([i[0] for i in wh_ids])).all()
-                result = result.filter(Inventory.rack_id.in_([j[0] for j in rack_ids])).all()
-
-            # if supervisor - return only his warehouse
-            if self.requester_role == UserRole.SUPERVISOR.value["code"]:
-                warehouse = session.query(Warehouse).filter_by(supervisor_id=self.requester_id).first()
-                rack_ids = session.query(Rack.rack_id).filter_by(warehouse_id=warehouse.warehouse_id).all()
-                result = result.filter(Inventory.rack_id.in_([j[0] for j in rack_ids])).all()
-
-            data = list()
-            for res in result:
-                data.append({
-                    "product_id": res[0],
-                    "product_name": res[1],
-                    "products_number": res[2],
-                    "total_volume_sum": res[3],
-                    "average_expiry_date": res[4],
-                })
+            if warehouse_id:
+                try:
+                    warehouse_id = int(warehouse_id)
+                except (TypeError, ValueError):
+                    raise ValidationError(f"Invalid warehouse_id: {warehouse_id}", 400)
+                warehouse_ids = {warehouse_id} & warehouse_ids if warehouse_ids is not None else {warehouse_id}
 
             self.response.status_code = 200
-            self.response.data = data
+            self.response.data = analytics_engine.inventory_by_product(session, company_id, warehouse_ids)
             return self.response.create_response()
@@ -1,13 +1,9 @@
 from datetime import datetime
 from sqlite3 import IntegrityError
 
-from sqlalchemy import func
-from sqlalchemy import func, or_, and_, desc, Float, cast
-from sqlalchemy.orm import joinedload
-
 from db_config import get_session
-from models import LostItem, User, Warehouse, Order, Product, OrderItem, Vendor
-from services import view_function_middleware, check_allowed_methods_middleware
+from models import LostItem, Order, OrderItem
+from services import view_function_middleware, check_allowed_methods_middleware, order_scopes, daily_rollups
 from services.generics import GenericView
 from utilities import extract_id_from_url, ValidationError
 from utilities.enums.data_related_enums import UserRole
@@ -27,10 +23,7 @@ class LostItemView(GenericView):
         :return: dictionary containing status_code and response body
         """
         requester_role = self.requester_role
-        requester_id = self.requester_id
         order_id = extract_id_from_url(request["url"], "order")
-        requester_warehouses = []
-        requester_vendors = []
 
         with get_session() as session:
 
@@ -38,37 +31,7 @@ class LostItemView(GenericView):
             if order is None:
                 raise ValidationError("Order with given id does not exist.", 404)
 
-            requester = session.query(User).filter_by(user_id=requester_id).first()
-
-            if requester_role == UserRole.VENDOR.value["code"]:
-                requester_vendors = session.query(Vendor.vendor_id).filter_by(
-                    vendor_owner_id=requester_id).all()
-                requester_vendors = [vendor[0] for vendor in requester_vendors]
-            elif self.requester_role == UserRole.SUPERVISOR.value["code"]:
-                requester_warehouses = session.query(Warehouse.warehouse_id).filter_by(
-                    supervisor_id=requester_id).all()
-                requester_warehouses = [warehouse[0] for warehouse in requester_warehouses]
-            else:
-                requester_warehouses = session.query(Warehouse.warehouse_id).filter_by(
-                    company_id=requester.company.company_id).all()
-                requester_warehouses = [warehouse[0] for warehouse in requester_warehouses]
-
-            if requester_role != UserRole.ADMIN.value["code"] and (
-                    (
-                            requester_role == UserRole.VENDOR.value["code"] and (
-                            (order.order_type == "from_warehouse" and order.recipient_id not in requester_vendors) or
-                            (order.order_type == "to_warehouse" and order.supplier_id not in requester_vendors)
-                    )
-                    ) or (
-                            (requester_role in (
-                                    UserRole.MANAGER.value["code"], UserRole.SUPERVISOR.value["code"])) and (
-                                    (
-                                            order.order_type == "to_warehouse" and order.recipient_id not in requester_warehouses) or
-                                    (
-                                            order.order_type == "from_warehouse" and order.supplier_id not in requester_warehouses)
-                            )
-                    )
-            ):
+            if not order_scopes.resolve(self.identity).contains(session, order):
                 raise ValidationError("Order Not Found", 404)
 
             if (order.order_type == "from_warehouse" and order.order_status != "delivered"
@@ -125,13 +88,8 @@ class LostItemView(GenericView):
                 order.order_status = "finished"
                 session.commit()
 
-            total_volume = session.query(func.sum(OrderItem.quantity * Product.volume)). \
-                join(Product, OrderItem.product_id == Product.product_id). \
-                filter(OrderItem.order_id == order.order_id).scalar()
-
             self.response.status_code = 200
             self.response.data = order.to_dict(cascade_fields=("supplier", "recipient"))
-            self.response.data["total_volume"] = total_volume
             self.response.data["items"] = [
                 order_item.to_dict(cascade_fields=()) for order_item in order.ordered_items
             ]
@@ -149,45 +107,16 @@ class LostItemView(GenericView):
         """
 
         requester_role = self.requester_role
-        requester_id = self.requester_id
 
         if requester_role != UserRole.MANAGER.value["code"]:
             raise ValidationError("Only managers can access this functionality")
 
         with get_session() as session:
-            requester = session.query(User).filter_by(user_id=requester_id).first()
-
-            filters_to_apply = []
-            if self.headers.get('filters'):
-                cmp = self.headers.get('filters')
-                if 'created_at_gte' in cmp:
-                    filters_to_apply.append(Order.created_at >= cmp['created_at_gte'])
-                if 'created_at_lte' in cmp:
-                    filters_to_apply.append(Order.created_at <= cmp['created_at_lte'])
-
-            lost_products = (
-                session.query(
-                    Product.product_id.label('product_id'),
-                    Warehouse.warehouse_id.label('warehouse_id'),
-                    cast(func.sum(LostItem.quantity), Float).label('total_quantity'),
-                    Warehouse.warehouse_name.label('warehouse_name'),
-                    Product.product_name.label('product_name')
-                )
-                .join(LostItem, LostItem.product_id == Product.product_id)
-                .join(Order, Order.order_id == LostItem.order_id)
-                .join(Warehouse, or_(
-                    and_(Order.order_type == 'to_warehouse', Order.recipient_id == Warehouse.warehouse_id),
-                    and_(Order.order_type == 'from_warehouse', Order.supplier_id == Warehouse.warehouse_id)
-                ))
-                .filter(Warehouse.company_id == requester.company_id)
-                .group_by(Warehouse.warehouse_id, Product.product_id)
-                .order_by(Warehouse.warehouse_name, Product.product_name)
+            # Lost quantities are summed from daily rollups of the company`s warehouses
+            lost_products = daily_rollups.lost_items(
+                session, self.identity.company_id, *daily_rollups.day_range(self.headers.get('filters'))
             )
 
-            # Apply the filters to the query
-            if filters_to_apply:
-                lost_products = lost_products.filter(*filters_to_apply).all()
-
             lost = []
 
             for lost_product in lost_products:
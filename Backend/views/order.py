@@ -1,15 +1,18 @@
-from datetime import datetime, timedelta
-from math import floor
+from datetime import datetime
 
-from sqlalchemy import func, or_, and_, desc, cast, Float
+from sqlalchemy import desc
 
 from db_config import get_session
-from models import Order, Transport, OrderItem, Product, Vendor, Warehouse, User, Inventory, Rack
-from services import view_function_middleware, check_allowed_methods_middleware
+from models import Order, Transport, OrderItem, LostItem, Product, Vendor, Warehouse
+from models.loading import eager_load_options
+from services import view_function_middleware, check_allowed_methods_middleware, check_allowed_roles_middleware, \
+    reservation_ledger, picking_planner, putaway_engine, stock_keeper, OrderScope, order_scopes, \
+    order_status_counters, analytics_engine, daily_rollups
 from services.generics import GenericView
-from utilities import ValidationError, is_instance_already_exists, extract_id_from_url, decode_token
+from utilities import ValidationError, is_instance_already_exists, extract_id_from_url, validate_order_items
 from utilities.enums.data_related_enums import UserRole
 from utilities.enums.method import Method
+from utilities.templates import StreamingResponse
 
 
 class OrderView(GenericView):
@@ -17,67 +20,22 @@ class OrderView(GenericView):
     model_name = "order"
 
     @staticmethod
-    def __get_remaining_volume(warehouse_id: int) -> float:
+    def __is_warehouse_capacity_enough(warehouse_id: int, total_volume: float) -> bool:
         """
-        Get remaining volume of a warehouse.
+        Check if warehouse capacity minus volume reserved by incoming orders is enough.
         """
         with get_session() as session:
-            remaining_volume = (
-                session.query(
-                    Warehouse.remaining_capacity - func.coalesce(
-                        cast(func.sum(OrderItem.quantity * Product.volume), Float),
-                        0
-                    )
-                )
-                .outerjoin(Order, and_(
-                    Order.recipient_id == Warehouse.warehouse_id,
-                    Order.order_status.in_(["processing", "delivered", "submitted"]))
-                      )
-                .outerjoin(OrderItem, OrderItem.order_id == Order.order_id)
-                .outerjoin(Product, Product.product_id == OrderItem.product_id)
-                .filter(Warehouse.warehouse_id == warehouse_id)
-            ).scalar()
-
-            return remaining_volume if remaining_volume else 0
+            return reservation_ledger.remaining_volume(session, warehouse_id) >= total_volume
 
     @staticmethod
-    def __get_remaining_products(warehouse_id: int) -> list[tuple]:
-        """
-        Get remaining products of a warehouse.
-        """
-        with get_session() as session:
-            remaining_products = (
-                session.query(
-                    Inventory.product_id,
-                    func.sum(Inventory.quantity).label('remaining_quantity')
-                )
-                .join(Rack, Inventory.rack_id == Rack.rack_id)
-                .filter(Rack.warehouse_id == warehouse_id)
-                .group_by(Inventory.product_id)
-            ).all()
-
-            return remaining_products
-
-    def __is_warehouse_capacity_enough(self, warehouse_id: int, total_volume: float) -> bool:
-        """
-        Check if warehouse capacity is enough.
-        """
-        remaining_volume = self.__get_remaining_volume(warehouse_id)
-        return remaining_volume >= total_volume
-
-    def __are_warehouse_products_enough(self, warehouse_id: int, products_to_order: dict) -> bool:
+    def __are_warehouse_products_enough(warehouse_id: int, products_to_order: dict) -> bool:
         """
         Check if warehouse products are enough.
         """
-        remaining_products = self.__get_remaining_products(warehouse_id)
-
-        for product_id, quantity in products_to_order.items():
-            for remaining_product in remaining_products:
-                if product_id == remaining_product[0]:
-                    if quantity > remaining_product[1]:
-                        return False
+        with get_session() as session:
+            stock = reservation_ledger.stock(session, warehouse_id, products_to_order.keys())
 
-        return True
+        return all(quantity <= stock.get(product_id, 0) for product_id, quantity in products_to_order.items())
 
     @view_function_middleware
     @check_allowed_methods_middleware([Method.GET.value])
@@ -87,56 +45,17 @@ class OrderView(GenericView):
         :param request: dictionary containing url, method, body and headers
         :return: dictionary containing status_code and response body
         """
-        requester_role = self.requester_role
-        requester_id = self.requester_id
         order = self.instance
-        requester_warehouses = []
-        requester_vendors = []
 
         if order is None:
             raise ValidationError(f"{self.model_name.capitalize()} with given id does not exist.", 404)
 
         with get_session() as session:
-            requester = session.query(User).filter_by(user_id=requester_id).first()
-
-            if requester_role == UserRole.VENDOR.value["code"]:
-                requester_vendors = session.query(Vendor.vendor_id).filter_by(
-                    vendor_owner_id=requester_id).all()
-                requester_vendors = [vendor[0] for vendor in requester_vendors]
-            elif self.requester_role == UserRole.SUPERVISOR.value["code"]:
-                requester_warehouses = session.query(Warehouse.warehouse_id).filter_by(
-                    supervisor_id=requester_id).all()
-                requester_warehouses = [warehouse[0] for warehouse in requester_warehouses]
-            elif self.requester_role == UserRole.MANAGER.value["code"]:
-                requester_warehouses = session.query(Warehouse.warehouse_id).filter_by(
-                    company_id=requester.company.company_id).all()
-                requester_warehouses = [warehouse[0] for warehouse in requester_warehouses]
-
-            if requester_role != UserRole.ADMIN.value["code"] and (
-                    (
-                            requester_role == UserRole.VENDOR.value["code"] and (
-                            (order.order_type == "from_warehouse" and order.recipient_id not in requester_vendors) or
-                            (order.order_type == "to_warehouse" and order.supplier_id not in requester_vendors)
-                    )
-                    ) or (
-                            (requester_role in (
-                            UserRole.MANAGER.value["code"], UserRole.SUPERVISOR.value["code"])) and (
-                                    (
-                                            order.order_type == "to_warehouse" and order.recipient_id not in requester_warehouses) or
-                                    (
-                                            order.order_type == "from_warehouse" and order.supplier_id not in requester_warehouses)
-                            )
-                    )
-            ):
+            if not order_scopes.resolve(self.identity).contains(session, order):
                 raise ValidationError("You are not allowed to see this order.", 403)
 
-            total_volume = session.query(func.sum(OrderItem.quantity * Product.volume)). \
-                join(Product, OrderItem.product_id == Product.product_id). \
-                filter(OrderItem.order_id == order.order_id).scalar()
-
             self.response.status_code = 200
             self.response.data = order.to_dict(cascade_fields=("supplier", "recipient"))
-            self.response.data["total_volume"] = total_volume
             self.response.data["items"] = [
                 order_item.to_dict(cascade_fields=()) for order_item in order.ordered_items
             ]
@@ -160,39 +79,10 @@ class OrderView(GenericView):
             return super().get_list(request=request, cascade_fields=("supplier", "recipient"), **kwargs)
 
         with get_session() as session:
-            requester = session.query(User).filter_by(user_id=self.requester_id).first()
-            orders = None
-
-            if self.requester_role in (UserRole.SUPERVISOR.value["code"], UserRole.MANAGER.value["code"]):
-                if self.requester_role == UserRole.SUPERVISOR.value["code"]:
-                    warehouse_ids = session.query(Warehouse.warehouse_id).filter_by(
-                        supervisor_id=self.requester_id).all()
-                    warehouse_ids = [warehouse[0] for warehouse in warehouse_ids]
-                else:
-                    warehouse_ids = session.query(Warehouse.warehouse_id).filter_by(
-                        company_id=requester.company.company_id).all()
-                    warehouse_ids = [warehouse[0] for warehouse in warehouse_ids]
-
-                orders = session.query(Order).filter(
-                    or_(
-                        and_(Order.order_type == "from_warehouse", Order.supplier_id.in_(warehouse_ids)),
-                        and_(Order.order_type == "to_warehouse", Order.recipient_id.in_(warehouse_ids))
-                    )
-                )
-
-            elif self.requester_role == UserRole.VENDOR.value["code"]:
-                vendor_ids = session.query(Vendor.vendor_id).filter_by(vendor_owner_id=requester.user_id).all()
-                vendor_ids = [vendor[0] for vendor in vendor_ids]
-
-                orders = session.query(Order).filter(
-                    or_(
-                        and_(Order.order_type == "to_warehouse", Order.supplier_id.in_(vendor_ids)),
-                        and_(Order.order_type == "from_warehouse", Order.recipient_id.in_(vendor_ids))
-                    )
-                )
+            orders = session.query(Order).filter(order_scopes.resolve(self.identity).criterion)
             return super().get_list(
                 request=request, cascade_fields=("supplier", "recipient"),
-                pre_selected_query=orders.order_by(desc(Order.created_at)), **kwargs
+                pre_selected_query=orders.order_by(desc(Order.created_at)), default_order_by="-created_at", **kwargs
             )
 
     @view_function_middleware
@@ -208,10 +98,6 @@ class OrderView(GenericView):
         order_type = self.body.get("order_type")
         vendor_id = self.body.get("vendor_id")
         warehouse_id = self.body.get("warehouse_id")
-        total_volume = 0
-        total_price = 0
-        products_to_order = {}
-        product_ids = []
 
         if requester_role not in (UserRole.ADMIN.value["code"], UserRole.VENDOR.value["code"]):
             raise ValidationError("Only vendor can create an order.", 403)
@@ -230,25 +116,10 @@ class OrderView(GenericView):
 
         with get_session() as session:
             vendor = session.query(Vendor).filter_by(vendor_id=vendor_id).first()
-            main_product_type = session.query(Product.product_type). \
-                filter_by(product_id=order_items[0]["product_id"]).scalar()
+            _, products_to_order, total_volume, total_price = validate_order_items(order_items)
 
-            for item in order_items:
-                product_id, quantity = item.get("product_id"), item.get("quantity")
-
-                if not is_instance_already_exists(Product, product_id=product_id):
-                    raise ValidationError(f"Product with id {product_id} does not exist", 404)
-
-                product = session.query(Product).filter_by(product_id=product_id).first()
-                total_volume += product.volume * quantity
-                products_to_order[product_id] = quantity
-                product_ids.append(product_id)
-
-                if not vendor.is_government:
-                    total_price += product.price * quantity
-
-                if product.product_type != main_product_type:
-                    raise ValidationError("All products must be of the same type", 400)
+            if vendor.is_government:
+                total_price = 0
 
             if order_type == "to_warehouse":
                 if not self.__is_warehouse_capacity_enough(warehouse_id, total_volume):
@@ -282,7 +153,6 @@ class OrderView(GenericView):
             self.response.data["items"] = [
                 order_item.to_dict(cascade_fields=()) for order_item in order.ordered_items
             ]
-            self.response.data["total_volume"] = total_volume
 
             return self.response.create_response()
 
@@ -301,10 +171,6 @@ class OrderView(GenericView):
         order = self.instance
         warehouse_id = order.supplier_id if order.order_type == "from_warehouse" else order.recipient_id
         old_items = order.ordered_items
-        total_volume = 0
-        total_price = 0
-        products_to_order = {}
-        product_ids = []
 
         if order is None:
             raise ValidationError(f"{self.model_name.capitalize()} with given id does not exist.", 404)
@@ -324,25 +190,10 @@ class OrderView(GenericView):
 
         with get_session() as session:
             vendor = session.query(Vendor).filter_by(vendor_id=vendor_id).first()
-            main_product_type = session.query(Product.product_type). \
-                filter_by(product_id=order_items[0]["product_id"]).scalar()
-
-            for item in order_items:
-                product_id, quantity = item.get("product_id"), item.get("quantity")
-
-                if not is_instance_already_exists(Product, product_id=product_id):
-                    raise ValidationError(f"Product with id {product_id} does not exist", 404)
-
-                product = session.query(Product).filter_by(product_id=product_id).first()
-                total_volume += product.volume * quantity
-                products_to_order[product_id] = quantity
-                product_ids.append(product_id)
-
-                if not vendor.is_government:
-                    total_price += product.price * quantity
+            _, products_to_order, total_volume, total_price = validate_order_items(order_items)
 
-                if product.product_type != main_product_type:
-                    raise ValidationError("All products must be of the same type", 400)
+            if vendor.is_government:
+                total_price = 0
 
             if order.order_type == "to_warehouse":
                 if not self.__is_warehouse_capacity_enough(warehouse_id, total_volume):
@@ -353,7 +204,7 @@ class OrderView(GenericView):
 
             for old_item in old_items:
                 old_product_id = old_item.product_id
-                if old_product_id not in product_ids:
+                if old_product_id not in products_to_order:
                     session.delete(old_item)
                 else:
                     old_item.quantity = products_to_order[old_product_id]
@@ -378,7 +229,6 @@ class OrderView(GenericView):
                 order_item.to_dict(cascade_fields=()) for order_item in order.ordered_items
             ]
             self.response.data["transport"] = order.transport.to_dict(cascade_fields=()) if order.transport else ""
-            self.response.data["total_volume"] = total_volume
 
             return self.response.create_response()
 
@@ -402,11 +252,7 @@ class OrderView(GenericView):
         with get_session() as session:
             transport_capacity = \
                 session.query(Transport.transport_capacity).filter_by(transport_id=transport_id).first()[0]
-            order_capacity = session.query(func.sum(OrderItem.quantity * Product.volume)). \
-                join(Product, OrderItem.product_id == Product.product_id). \
-                filter(OrderItem.order_id == order.order_id).scalar()
-
-            if transport_capacity < order_capacity:
+            if transport_capacity < order.total_volume:
                 raise ValidationError("Transport capacity is not enough.", 400)
 
             order.order_status = "submitted"
@@ -429,51 +275,22 @@ class OrderView(GenericView):
         """
 
         order = self.instance
-        requester_role = self.requester_role
-        requester_id = self.requester_id
 
         with get_session() as session:
-            requester = session.query(User).filter_by(user_id=requester_id).first()
-
-            if requester_role == UserRole.VENDOR.value["code"]:
-                requester_vendors = session.query(Vendor.vendor_id).filter_by(
-                    vendor_owner_id=requester_id).all()
-                requester_vendors = [vendor[0] for vendor in requester_vendors]
-            elif requester_role == UserRole.MANAGER.value["code"]:
-                requester_warehouses = session.query(Warehouse.warehouse_id).filter_by(
-                    company_id=requester.company.company_id).all()
-                requester_warehouses = [warehouse[0] for warehouse in requester_warehouses]
-
-            if requester_role == UserRole.SUPERVISOR.value["code"] or (
-                    (
-                            requester_role == UserRole.VENDOR.value["code"] and (
-                            (
-                                    order.order_type == "from_warehouse" and order.recipient_id not in requester_vendors) or
-                            (
-                                    order.order_type == "to_warehouse" and order.supplier_id not in requester_vendors)
-                    )
-                    ) or (
-                            (requester_role in (
-                             UserRole.MANAGER.value["code"], UserRole.SUPERVISOR.value["code"])) and (
-                                    (
-                                            order.order_type == "to_warehouse" and order.recipient_id not in requester_warehouses) or
-                                    (
-                                            order.order_type == "from_warehouse" and order.supplier_id not in requester_warehouses)
-                            )
-                    )
-            ):
+            if order is None or self.requester_role == UserRole.SUPERVISOR.value["code"] or \
+                    not order_scopes.resolve(self.identity).contains(session, order):
                 raise ValidationError("Order not found.", 404)
 
-        if order.order_status != "new":
-            raise ValidationError(f"You can not delete order in status '{order.order_status}'", 403)
+            if order.order_status != "new":
+                raise ValidationError(f"You can not delete order in status '{order.order_status}'", 403)
 
-        order.order_status = "cancelled"
-        order.updated_at = datetime.now()
-        session.commit()
+            order.order_status = "cancelled"
+            order.updated_at = datetime.now()
+            session.commit()
 
-        self.response.status_code = 200
-        self.response.data = order.to_dict(cascade_fields=())
-        return self.response.create_response()
+            self.response.status_code = 200
+            self.response.data = order.to_dict(cascade_fields=())
+            return self.response.create_response()
 
     @view_function_middleware
     @check_allowed_methods_middleware([Method.GET.value])
@@ -485,52 +302,19 @@ class OrderView(GenericView):
         :return: dictionary containing status_code and response body with list of dictionaries
         """
         order_id = extract_id_from_url(request["url"], "order")
-        creator_id = decode_token(self.headers.get("token"))
         with get_session() as session:
 
-            warehouse_id = session.query(Warehouse.warehouse_id).filter_by(supervisor_id=creator_id).scalar()
+            warehouse_id = self.identity.warehouse_id
             order = session.query(Order).filter_by(order_id=order_id, supplier_id=warehouse_id).first()
             if not order:
                 raise ValidationError("Order Not Found", 404)
             if order.order_status != 'submitted':
                 raise ValidationError("You cannot send orders that are not submitted", 404)
 
-            filled_inventories = []
-
-            order_items = session.query(OrderItem).filter_by(order_id=order_id).all()
-
-            for order_item in order_items:
-                product = session.query(Product).filter_by(product_id=order_item.product_id).first()
-                overall_volume = product.volume * order_item.quantity
-                total_quantity = order_item.quantity
-
-                inventories = session.query(Inventory
-                                            ).join(Rack, Rack.rack_id == Inventory.rack_id
-                                                   ).filter(Inventory.product_id == product.product_id
-                                                            ).order_by(Rack.rack_position).all()
-
-                for inventory in inventories:
-                    if overall_volume < inventory.total_volume:
-                        max_volume = overall_volume
-                    else:
-                        max_volume = inventory.total_volume
-
-                    real_quantity = floor(max_volume / product.volume)
-
-                    filled_inventories.append({
-                        'product_id': order_item.product_id,
-                        'rack_id': inventory.rack_id,
-                        'real_quantity': real_quantity
-                    })
-
-                    total_quantity -= real_quantity
-                    overall_volume = total_quantity * product.volume
-
-                    if total_quantity == 0:
-                        break
-
-                if total_quantity != 0:
-                    raise ValidationError('Could not send order', 404)
+            products_to_pick = dict(
+                session.query(OrderItem.product_id, OrderItem.quantity).filter_by(order_id=order_id).all()
+            )
+            filled_inventories = picking_planner.plan(session, warehouse_id, products_to_pick, kwargs.get("strategy"))
 
             self.response.status_code = 200
             self.response.data["filled_inventories"] = filled_inventories
@@ -546,10 +330,9 @@ class OrderView(GenericView):
         :return: dictionary containing status_code and response body
         """
         order_id = extract_id_from_url(request["url"], "order")
-        creator_id = decode_token(self.headers.get("token"))
         with get_session() as session:
 
-            warehouse_id = session.query(Warehouse.warehouse_id).filter_by(supervisor_id=creator_id).scalar()
+            warehouse_id = self.identity.warehouse_id
             order = session.query(Order).filter_by(order_id=order_id, supplier_id=warehouse_id).first()
             if not order:
                 raise ValidationError("Order Not Found", 404)
@@ -557,36 +340,11 @@ class OrderView(GenericView):
                 raise ValidationError("You cannot send orders that are not submitted", 404)
 
             filled_inventories = self.body.get("filled_inventories")
+            stock_keeper.retrieve(session, warehouse_id, filled_inventories)
 
-            for filled_inventory in filled_inventories:
-                product_id = filled_inventory['product_id']
-                rack_id = filled_inventory['rack_id']
-                quantity = filled_inventory['real_quantity']
-
-                product = session.query(Product).filter_by(product_id=product_id).first()
-                inventory = session.query(Inventory).filter_by(product_id=product_id, rack_id=rack_id).first()
-
-                diff = inventory.quantity - quantity
-                changed_volume = product.volume * quantity
-                if diff == 0:
-                    session.delete(inventory)
-                else:
-                    session.query(Inventory).filter_by(rack_id=rack_id, product_id=product_id
-                                                       ).update({"quantity": diff,
-                                                                 "total_volume": inventory.total_volume - changed_volume})
-
-                session.flush()
-
-                rack = session.query(Rack).filter_by(rack_id=rack_id).first()
-                session.query(Rack).filter_by(rack_id=rack_id).update(
-                    {"remaining_capacity": rack.remaining_capacity + changed_volume})
-
-                warehouse = session.query(Warehouse).filter_by(warehouse_id=warehouse_id).first()
-                session.query(Warehouse).filter_by(warehouse_id=warehouse.warehouse_id).update(
-                    {"remaining_capacity": warehouse.remaining_capacity + changed_volume})
-
-            session.query(Order).filter_by(order_id=order_id).update(
-                {"order_status": "processing", "updated_at": datetime.now()})
+            # Status is changed through the ORM, so status counters are updated with it
+            order.order_status = "processing"
+            order.updated_at = datetime.now()
 
             session.commit()
 
@@ -603,7 +361,6 @@ class OrderView(GenericView):
         :return: dictionary containing status_code and response body with list of dictionaries
         """
         order = self.instance
-        requester_id = self.requester_id
         requester_role = self.requester_role
 
         if requester_role not in (
@@ -621,104 +378,20 @@ class OrderView(GenericView):
             raise ValidationError("Order must contain at least one item.", 400)
 
         with get_session() as session:
-            requester = session.query(User).filter_by(user_id=requester_id).first()
-
-            if requester_role == UserRole.SUPERVISOR.value["code"]:
-                requester_warehouses = session.query(Warehouse.warehouse_id).filter_by(
-                    supervisor_id=requester_id).all()
-                requester_warehouses = [warehouse[0] for warehouse in requester_warehouses]
-            elif requester_role == UserRole.MANAGER.value["code"]:
-                requester_warehouses = session.query(Warehouse.warehouse_id).filter_by(
-                    company_id=requester.company.company_id).all()
-                requester_warehouses = [warehouse[0] for warehouse in requester_warehouses]
-
-            if order.recipient_id not in requester_warehouses:
+            scope = order_scopes.resolve(self.identity)
+            if not scope.is_unrestricted and order.recipient_id not in scope.ids(session):
                 raise ValidationError("You are not allowed to see this order.", 403)
 
-            total_volume = session.query(func.sum(OrderItem.quantity * Product.volume)). \
-                join(Product, OrderItem.product_id == Product.product_id). \
-                filter(OrderItem.order_id == order.order_id).scalar()
-
-            if order.order_status == "to_warehouse" and not self.__is_warehouse_capacity_enough(
-                    order.recipient_id, total_volume):
-                raise ValidationError("Warehouse capacity is not enough.", 400)
-
-            filled_inventories = []
-
-            order_items = order.ordered_items
-
-            for order_item in order_items:
-                product = order_item.product
-                total_volume = product.volume * order_item.quantity
-                total_quantity = order_item.quantity
-
-                if product.is_stackable:
-                    racks = session.query(Rack).outerjoin(Inventory, Rack.rack_id == Inventory.rack_id).outerjoin(
-                        Product, Inventory.product_id == Product.product_id).filter(
-                        Rack.remaining_capacity > 0, Rack.warehouse_id == order.recipient_id,
-                        or_(
-                            and_(
-                                Inventory.inventory_id != None,
-                                Product.is_stackable == 1
-                            ),
-                            Inventory.inventory_id == None
-                        )
-                    ).order_by(desc(Rack.rack_position)).all()
-                else:
-                    racks = session.query(Rack).outerjoin(Inventory, Rack.rack_id == Inventory.rack_id).outerjoin(
-                        Product, Inventory.product_id == Product.product_id).filter(
-                        Rack.remaining_capacity > 0, Rack.warehouse_id == order.recipient_id,
-                        Rack.remaining_capacity == Rack.overall_capacity
-                    ).order_by(desc(Rack.rack_position)).all()
-
-                for rack in racks:
-                    if rack.remaining_capacity == 0:
-                        continue
-
-                    if rack.rack_id in [filled_inventory['rack_id'] for filled_inventory in filled_inventories]:
-                        if not product.is_stackable:
-                            continue
-
-                        quantity = next(
-                            (filled_inventory['real_quantity'] for filled_inventory in filled_inventories if
-                             filled_inventory['rack_id'] == rack.rack_id),
-                            0)
-
-                        product_id = next(
-                            (filled_inventory['product_id'] for filled_inventory in filled_inventories if
-                             filled_inventory['rack_id'] == rack.rack_id),
-                            0)
-
-                        product_in_rack = session.query(Product).filter_by(product_id=product_id).first()
-
-                        if quantity == 0:
-                            continue
-
-                        updated_remaining_capacity = rack.remaining_capacity - product_in_rack.volume * quantity
-                        max_volume = updated_remaining_capacity if total_volume > updated_remaining_capacity else total_volume
-
-                    else:
-                        max_volume = rack.remaining_capacity if total_volume > rack.remaining_capacity else total_volume
-
-                    real_quantity = floor(max_volume / product.volume)
-
-                    filled_inventories.append({
-                        'rack_id': rack.rack_id,
-                        'product_id': order_item.product_id,
-                        'real_quantity': real_quantity
-                    })
-
-                    total_quantity -= real_quantity
-                    total_volume = total_quantity * product.volume
-
-                    if total_quantity == 0:
-                        break
+            if order.order_type == "to_warehouse":
+                # Delivered order still reserves its own volume, so it is not counted twice
+                reserved_volume = order.total_volume \
+                    if order.order_status in reservation_ledger.RESERVING_STATUSES else 0
+                if reservation_ledger.remaining_volume(session, order.recipient_id) + reserved_volume < \
+                        order.total_volume:
+                    raise ValidationError("Warehouse capacity is not enough.", 400)
 
-                if total_quantity > 0:
-                    raise ValidationError(
-                        f"Not enough capacity to place remaining {total_quantity} of {product.product_name}",
-                        400
-                    )
+            products_to_place = {order_item.product_id: order_item.quantity for order_item in order.ordered_items}
+            filled_inventories = putaway_engine.plan(session, order.recipient_id, products_to_place)
 
             self.response.status_code = 200
             self.response.data["filled_inventories"] = filled_inventories
@@ -809,90 +482,24 @@ class OrderView(GenericView):
         Complete delivery to warehouse.
         """
         order_id = extract_id_from_url(request["url"], "order")
-        creator_id = decode_token(self.headers.get("token"))
         with get_session() as session:
 
-            warehouse_id = session.query(Warehouse.warehouse_id).filter_by(supervisor_id=creator_id).scalar()
-            order = session.query(Order).filter_by(order_id=order_id, recipient_id=warehouse_id)
-            if not order.first():
+            warehouse_id = self.identity.warehouse_id
+            order = session.query(Order).filter_by(order_id=order_id, recipient_id=warehouse_id).first()
+            if not order:
                 raise ValidationError("Order Not Found.", 404)
 
-            if order.first().order_status not in ("lost", "damaged", "delivered"):
+            if order.order_status not in ("lost", "damaged", "delivered"):
                 raise ValidationError("You cannot receive orders that are not delivered.", 400)
 
             # if order_items is empty
-            if len(order.first().ordered_items) == 0:
+            if len(order.ordered_items) == 0:
                 raise ValidationError("No items left in the order.", 400)
 
             # main logic
             filled_inventories = self.body.get("filled_inventories")
-            for f_inv in filled_inventories:
-                rack_id = f_inv.get("rack_id")
-                product_id = f_inv.get("product_id")
-                quantity = f_inv.get("quantity")
-
-                creator_id = decode_token(self.headers.get("token"))
-                warehouse = session.query(Warehouse).filter_by(supervisor_id=creator_id).first()
-                company_id = session.query(User.company_id).filter_by(user_id=creator_id).scalar()
-
-                rack = session.query(Rack).filter_by(rack_id=rack_id, warehouse_id=warehouse.warehouse_id).first()
-                if not rack:
-                    raise ValidationError("Rack Not Found", 404)
-
-                product = session.query(Product).filter_by(product_id=product_id, company_id=company_id).first()
-                if not product:
-                    raise ValidationError("Product Not Found", 404)
-
-                total_volume_init = product.volume * quantity
-                if rack.remaining_capacity < total_volume_init:
-                    raise ValidationError("Not enough capacity", 400)
-
-                products_from_rack = session.query(Inventory.product_id).filter_by(rack_id=rack_id).all()
-                if products_from_rack:
-                    for product_from_rack in products_from_rack:
-                        is_stackable = session.query(Product.is_stackable).filter_by(
-                            product_id=product_from_rack[0]).scalar()
-                        if not is_stackable:
-                            raise ValidationError("Non stackable product is already occupying this rack", 400)
-
-                if warehouse.warehouse_type != product.product_type:
-                    raise ValidationError(
-                        f"Product with type {product.product_type} cannot be put to the warehouse for {warehouse.warehouse_type} products",
-                        400)
-
-                inventory = session.query(Inventory).filter_by(rack_id=rack_id, product_id=product_id).first()
-                if inventory:
-                    quantity = quantity + inventory.quantity
-                    total_volume = total_volume_init + inventory.total_volume
-
-                    update_data = {"quantity": quantity, "total_volume": total_volume}
-                    session.query(Inventory).filter_by(rack_id=rack_id, product_id=product_id).update(update_data)
-
-                else:
-                    new_inventory = Inventory(
-                        rack_id=rack_id,
-                        product_id=product_id,
-                        quantity=quantity,
-                        total_volume=total_volume_init,
-                        arrival_date=datetime.now(),
-                        expiry_date=datetime.now() + timedelta(days=product.expiry_duration),
-                    )
-
-                    session.add(new_inventory)
-
-                session.flush()
-
-                rack = session.query(Rack).filter_by(rack_id=rack_id).first()
-                session.query(Rack).filter_by(rack_id=rack_id).update(
-                    {"remaining_capacity": rack.remaining_capacity - total_volume_init})
-
-                warehouse = session.query(Warehouse).filter_by(warehouse_id=warehouse.warehouse_id).first()
-                session.query(Warehouse).filter_by(warehouse_id=warehouse.warehouse_id).update(
-                    {"remaining_capacity": warehouse.remaining_capacity - total_volume_init})
-
-                session.commit()
-
-            order = order.first()
+            warehouse = session.query(Warehouse).filter_by(warehouse_id=warehouse_id).first()
+            stock_keeper.store(session, warehouse, self.identity.company_id, filled_inventories)
 
             # change updated_at and order_status
             order.updated_at = datetime.now()
@@ -907,130 +514,126 @@ class OrderView(GenericView):
     @check_allowed_methods_middleware([Method.GET.value])
     def get_order_stats(self, request: dict) -> dict:
         """
-        Get order statistics.
+        Get order statistics: numbers of the requester`s orders by statuses, read from status counters.
+        :param request: dictionary containing url, method, body and headers
+        :return: dictionary containing status_code and response body with numbers of orders by statuses
         """
-        requester_id = self.requester_id
-        requester_role = self.requester_role
-
         with get_session() as session:
-            requester = session.query(User).filter_by(user_id=requester_id).first()
-            orders = session.query(Order.order_id)
-
-            if self.requester_role in (UserRole.SUPERVISOR.value["code"], UserRole.MANAGER.value["code"]):
-                if self.requester_role == UserRole.SUPERVISOR.value["code"]:
-                    warehouse_ids = session.query(Warehouse.warehouse_id).filter_by(
-                        supervisor_id=self.requester_id).all()
-                    warehouse_ids = [warehouse[0] for warehouse in warehouse_ids]
-                else:
-                    warehouse_ids = session.query(Warehouse.warehouse_id).filter_by(
-                        company_id=requester.company.company_id).all()
-                    warehouse_ids = [warehouse[0] for warehouse in warehouse_ids]
-
-                orders = orders.filter(
-                    or_(
-                        and_(Order.order_type == "from_warehouse", Order.supplier_id.in_(warehouse_ids)),
-                        and_(Order.order_type == "to_warehouse", Order.recipient_id.in_(warehouse_ids))
-                    )
-                )
-
-            elif self.requester_role == UserRole.VENDOR.value["code"]:
-                vendor_ids = session.query(Vendor.vendor_id).filter_by(vendor_owner_id=requester.user_id).all()
-                vendor_ids = [vendor[0] for vendor in vendor_ids]
-
-                orders = orders.filter(
-                    or_(
-                        and_(Order.order_type == "to_warehouse", Order.supplier_id.in_(vendor_ids)),
-                        and_(Order.order_type == "from_warehouse", Order.recipient_id.in_(vendor_ids))
-                    )
-                )
+            self.response.status_code = 200
+            self.response.data = order_status_counters.stats(session, order_scopes.resolve(self.identity))
+            return self.response.create_response()
 
-            result = (
-                    session.query(Order.order_status, func.count().label('order_count'))
-                    .filter(Order.order_id.in_(orders))
-                    .group_by(Order.order_status)
-                    .all()
-                )
+    @view_function_middleware
+    @check_allowed_roles_middleware([UserRole.MANAGER.value["code"],
+                                     UserRole.ADMIN.value["code"],
+                                     UserRole.SUPERVISOR.value["code"]])
+    @check_allowed_methods_middleware([Method.GET.value])
+    def get_movement_stats(self, request: dict, **kwargs) -> dict:
+        """
+        Get movements of products through the requester`s warehouses by periods: number of orders, received and supplied
+        quantities and percentiles of quantities of the orders. Computed by the analytics engine from the cached items
+        of the company`s orders.
+        :param request: dictionary containing url, method, body and headers
+        :param kwargs: bucket (day, week or month, default month), created_at_gte and created_at_lte limit days of
+        creation of the orders (both days included), warehouse_id, product_id and order_status limit counted items
+        :return: dictionary containing status_code and response body with list of periods
+        """
+        ids = {}
+        for name in ("warehouse_id", "product_id"):
+            try:
+                ids[name] = int(kwargs[name]) if kwargs.get(name) else None
+            except (TypeError, ValueError):
+                raise ValidationError(f"Invalid {name}: {kwargs[name]}", 400)
 
-            data = dict()
-            for status, count in result:
-                data[status] = count
+        with get_session() as session:
+            # admin sees orders of all companies, supervisor only of his warehouses
+            company_id = None if self.requester_role == UserRole.ADMIN.value["code"] else self.identity.company_id
+            warehouse_ids = None
+            if self.requester_role == UserRole.SUPERVISOR.value["code"]:
+                warehouse_ids = order_scopes.resolve(self.identity).ids(session)
+            if ids["warehouse_id"] is not None:
+                warehouse_ids = {ids["warehouse_id"]} & warehouse_ids if warehouse_ids is not None \
+                    else {ids["warehouse_id"]}
 
             self.response.status_code = 200
-            self.response.data = data
+            self.response.data = analytics_engine.movements(
+                session, company_id, warehouse_ids, *daily_rollups.day_range(kwargs),
+                bucket=kwargs.get("bucket", "month"), product_id=ids["product_id"],
+                order_status=kwargs.get("order_status")
+            )
             return self.response.create_response()
 
-
     @view_function_middleware
     @check_allowed_methods_middleware([Method.GET.value])
     def details(self, request: dict, **kwargs) -> dict:
         """
-        Get all orders from the database depending on requester`s role.
+        Get all orders from the database depending on requester`s role. Items and lost items of the orders are loaded
+        with one query each and assembled in memory, so the number of queries does not depend on the number of orders.
         :param request: dictionary containing url, method, body and headers
         :param kwargs: arguments to be checked, here you need to pass fields on which instances will be filtered
-        :return: dictionary containing status_code and response body with list of dictionaries of order`s data
+        (created_at_gte, created_at_lte), stream requests the list to be sent in chunks
+        :return: dictionary containing status_code and response body with list of dictionaries of order`s data or
+        streaming response if stream was passed in filters
         """
+        if self.requester_role != UserRole.MANAGER.value["code"]:
+            raise ValidationError("Not allowed to access this functionality", 403)
+
         with get_session() as session:
-            requester = session.query(User).filter_by(user_id=self.requester_id).first()
             warehouse_id = extract_id_from_url(request["url"], "details")
 
-            filters_to_apply = []
-            if self.headers.get('filters'):
-                cmp = self.headers.get('filters')
-                if 'created_at_gte' in cmp:
-                    filters_to_apply.append(Order.created_at >= cmp['created_at_gte'])
-                if 'created_at_lte' in cmp:
-                    filters_to_apply.append(Order.created_at <= cmp['created_at_lte'])
-
-            if self.requester_role == UserRole.MANAGER.value["code"]:
-                warehouse_ids = session.query(Warehouse.warehouse_id).filter_by(
-                    company_id=requester.company.company_id).all()
-                warehouse_ids = [warehouse[0] for warehouse in warehouse_ids]
-
-                if warehouse_id:
-                    warehouse_ids = [warehouse_id]
-
-                orders = session.query(Order).filter(
-                    or_(
-                        and_(Order.order_type == "from_warehouse", Order.supplier_id.in_(warehouse_ids)),
-                        and_(Order.order_type == "to_warehouse", Order.recipient_id.in_(warehouse_ids))
-                    )
-                )
-                # Apply the filters to the query
-                if filters_to_apply:
-                    orders = orders.filter(*filters_to_apply).all()
-            else:
-                raise ValidationError("Not allowed to access this functionality", 403)
-
-            all_results = []
-            for order in orders:
-
-                total_volume = session.query(func.sum(OrderItem.quantity * Product.volume)). \
-                    join(Product, OrderItem.product_id == Product.product_id). \
-                    filter(OrderItem.order_id == order.order_id).scalar()
+            orders = session.query(Order).filter(order_scopes.resolve(self.identity).criterion)
+            if warehouse_id:
+                orders = orders.filter(OrderScope.party_criterion("warehouse", [warehouse_id]))
+            if "created_at_gte" in kwargs:
+                orders = orders.filter(Order.created_at >= kwargs["created_at_gte"])
+            if "created_at_lte" in kwargs:
+                orders = orders.filter(Order.created_at <= kwargs["created_at_lte"])
 
-                result = order.to_dict(cascade_fields=("supplier", "recipient"))
-                result["total_volume"] = total_volume
-                result["ordered_items"] = [
-                    order_item.to_dict(cascade_fields=()) for order_item in order.ordered_items
-                ]
-
-                if len(result["ordered_items"]) != 0:
-                    for var in result["ordered_items"]:
-                        product_name = session.query(Product.product_name).filter(Product.product_id == var["product"]).scalar()
-                        var["product_name"] = product_name
+            orders = orders.order_by(Order.order_id).options(
+                *eager_load_options(Order, ("supplier", "recipient"))
+            )
 
-                result["lost_items"] = [
-                    lost_item.to_dict(cascade_fields=()) for lost_item in order.lost_items
-                ]
+            if kwargs.get("stream"):
+                return StreamingResponse(
+                    orders.statement, None, self.headers, self.STREAM_CHUNK_SIZE,
+                    f"{self.method} {self.url} (stream)", serialize_chunk=self.__serialize_details
+                )
 
-                if len(result["lost_items"]) != 0:
-                    for var in result["lost_items"]:
-                        product_name = session.query(Product.product_name).filter(Product.product_id == var["product"]).scalar()
-                        var["product_name"] = product_name
+            self.response.status_code = 200
+            self.response.data = self.__serialize_details(session, orders.all())
 
-                all_results.append(result)
+            return self.response.create_response()
 
-            self.response.status_code = 200
-            self.response.data = all_results
+    @staticmethod
+    def __serialize_details(session, orders: list[Order]) -> list[dict]:
+        """
+        Serializes orders together with their ordered and lost items, items of all orders are loaded with one query
+        per kind of item.
+        :param session: session in which orders were loaded
+        :param orders: list of orders
+        :return: list of dictionaries of orders` data with ordered_items and lost_items
+        """
+        results = {order.order_id: {
+            **order.to_dict(cascade_fields=("supplier", "recipient")), "ordered_items": [], "lost_items": []
+        } for order in orders}
 
-            return self.response.create_response()
\ No newline at end of file
+        for model, id_field, field in (
+                (OrderItem, "order_item_id", "ordered_items"), (LostItem, "lost_item_id", "lost_items")
+        ):
+            id_column = getattr(model, id_field)
+            items = session.query(
+                id_column, model.order_id, model.product_id, model.quantity, Product.product_name
+            ).outerjoin(Product, Product.product_id == model.product_id).filter(
+                model.order_id.in_(results.keys())
+            ).order_by(id_column)
+
+            for item_id, order_id, product_id, quantity, product_name in items:
+                results[order_id][field].append({
+                    id_field: item_id,
+                    "order": order_id,
+                    "product": product_id,
+                    "quantity": quantity,
+                    "product_name": product_name
+                })
+
+        return list(results.values())
\ No newline at end of file
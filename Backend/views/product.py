@@ -5,7 +5,6 @@ from services.generics import GenericView
 from utilities.enums.data_related_enums import UserRole
 from utilities.enums.method import Method
 from utilities.exceptions import ValidationError
-from utilities import decode_token
 
 
 class ProductView(GenericView):
@@ -22,7 +21,7 @@ class ProductView(GenericView):
         """
         # check if the product and user have the same company_id
         with get_session() as session:
-            user_id = decode_token(self.headers.get("token"))
+            user_id = self.requester_id
             user = session.query(User).filter(User.user_id == user_id).first()
             if user.company_id != self.instance.company_id:
                 raise ValidationError("Product Not Found", 404)
@@ -40,7 +39,7 @@ class ProductView(GenericView):
         """
         # check if the user is from the same company as product
         with get_session() as session:
-            requester_id = decode_token(self.headers.get("token"))
+            requester_id = self.requester_id
             requester = session.query(User).filter(User.user_id == requester_id).first()
             company = requester.company
 
@@ -60,7 +59,7 @@ class ProductView(GenericView):
         """
         with get_session() as session:
             # get user who wants to delete
-            deleter_id = decode_token(self.headers.get("token"))
+            deleter_id = self.requester_id
             deleter = session.query(User).filter(User.user_id == deleter_id).first()
 
             # if product does not exist or deleter is not from the same company as product, raise ValidationError
@@ -84,7 +83,7 @@ class ProductView(GenericView):
                 raise ValidationError("Product with this name already exists in the system", 400)
 
             # get user who wants to create
-            creator_id = decode_token(self.headers.get("token"))
+            creator_id = self.requester_id
             creator = session.query(User).filter(User.user_id == creator_id).first()
 
             # set creator`s company_id to body
@@ -107,7 +106,7 @@ class ProductView(GenericView):
             if product_name is not None and prod_with_same_name is not None:
                 raise ValidationError("Product with this name already exists in the system", 400)
 
-            updater_id = decode_token(self.headers.get("token"))
+            updater_id = self.requester_id
             updater = session.query(User).filter(User.user_id == updater_id).first()
 
             # if product does not exist or updater is not from the same company as product
@@ -5,7 +5,7 @@ from db_config import get_session
 from models import Rack, User, Warehouse, Inventory, Product
 from services import view_function_middleware, check_allowed_methods_middleware
 from services.generics import GenericView
-from utilities import decode_token, ValidationError, extract_id_from_url
+from utilities import ValidationError, extract_id_from_url
 from utilities.enums.method import Method
 
 
@@ -25,7 +25,7 @@ class RackView(GenericView):
             rack_id = extract_id_from_url(request["url"], "rack")
             rack = session.query(Rack).filter_by(rack_id=rack_id).first()
 
-            deleter = decode_token(self.headers.get("token"))
+            deleter = self.requester_id
             deleter = session.query(User).filter_by(user_id=deleter).first()
             warehouse_ids = session.query(Warehouse.warehouse_id).filter_by(company_id=deleter.company_id).all()
 
@@ -47,8 +47,7 @@ class RackView(GenericView):
 
         with get_session() as session:
             warehouse_id = self.body.get("warehouse_id")
-            creator = decode_token(self.headers.get("token"))
-            company_id = session.query(User.company_id).filter_by(user_id=creator).scalar()
+            company_id = self.identity.company_id
             warehouse = session.query(Warehouse).filter_by(warehouse_id=warehouse_id, company_id=company_id).first()
             if not warehouse:
                 raise ValidationError("Warehouse Not Found", 404)
@@ -90,7 +89,7 @@ class RackView(GenericView):
             rack_id = extract_id_from_url(request["url"], "rack")
             rack = session.query(Rack).filter_by(rack_id=rack_id).first()
 
-            updater_id = decode_token(self.headers.get("token"))
+            updater_id = self.requester_id
             updater = session.query(User).filter_by(user_id=updater_id).first()
             warehouse_ids = session.query(Warehouse.warehouse_id).filter_by(company_id=updater.company_id).all()
 
@@ -137,8 +136,7 @@ class RackView(GenericView):
         with get_session() as session:
 
             warehouse_id = self.body.get("warehouse_id")
-            creator = decode_token(self.headers.get("token"))
-            company_id = session.query(User.company_id).filter_by(user_id=creator).scalar()
+            company_id = self.identity.company_id
             warehouse = session.query(Warehouse).filter_by(warehouse_id=warehouse_id, company_id=company_id).first()
             if not warehouse:
                 raise ValidationError("Warehouse Not Found", 404)
@@ -3,10 +3,11 @@ from sqlalchemy.exc import IntegrityError
 from models import User, Company
 from db_config import get_session
 from utilities import (
-    hash_password, is_email_valid, is_phone_valid, create_token, check_password, decode_token,
+    is_email_valid, is_phone_valid, create_token, revoke_tokens,
     is_instance_already_exists, extract_id_from_url
 )
-from services import check_allowed_methods_middleware, check_allowed_roles_middleware, view_function_middleware
+from services import check_allowed_methods_middleware, check_allowed_roles_middleware, view_function_middleware, \
+    identity_cache, password_pool
 from utilities.exceptions import ValidationError, DatabaseError
 from utilities.enums.method import Method
 from utilities.enums.data_related_enums import UserRole
@@ -64,7 +65,7 @@ class UserView(GenericView):
                     user_email=self.body["user_email"],
                     user_role=self.body["user_role"],
                     user_phone=self.body["user_phone"],
-                    user_password=hash_password(self.body["password"]).decode("utf8"),
+                    user_password=password_pool.hash(self.body["password"]).decode("utf8"),
                     company_id=new_company_id,
                     is_password_forgotten=0
                 )
@@ -72,16 +73,17 @@ class UserView(GenericView):
                 session.commit()
 
                 # Setting token in headers
-                self.headers["token"] = create_token(new_user.user_id, new_user.user_role)
+                self.headers["token"] = create_token(
+                    new_user.user_id, new_user.user_role, new_user.company_id, new_user.token_version
+                )
 
                 self.response.status_code = 201
                 self.response.data = new_user.to_dict()
                 return self.response.create_response()
 
         except IntegrityError as e:
+            # Company created above is rolled back together with the user
             session.rollback()
-            session.delete(session.query(Company).filter_by(company_id=new_company_id).first())
-            session.commit()
 
             # Check if user email is already registered
             if is_instance_already_exists(User, user_email=self.body["user_email"]):
@@ -107,11 +109,11 @@ class UserView(GenericView):
         with get_session() as session:
             user = session.query(User).filter_by(user_email=self.body["user_email"]).first()
 
-            if not user or not check_password(user.user_password, self.body["password"]):
+            if not user or not password_pool.check(user.user_password, self.body["password"]):
                 raise ValidationError("Wrong credentials.")
 
             # Setting token in headers
-            self.headers["token"] = create_token(user.user_id, user.user_role)
+            self.headers["token"] = create_token(user.user_id, user.user_role, user.company_id, user.token_version)
 
             self.response.status_code = 200
             self.response.data = user.to_dict()
@@ -126,7 +128,7 @@ class UserView(GenericView):
         :return: dictionary containing status_code and response body
         """
 
-        user_id = decode_token(self.headers.get("token"))
+        user_id = self.requester_id
         old_password = self.body.get("old_password")
         new_password = self.body.get("new_password")
         confirm_password = self.body.get("confirm_password")
@@ -138,10 +140,10 @@ class UserView(GenericView):
         with get_session() as session:
             user = session.query(User).filter_by(user_id=user_id).first()
 
-            if not user or not check_password(user.user_password, old_password):
+            if not user or not password_pool.check(user.user_password, old_password):
                 raise ValidationError("Wrong credentials.")
 
-            user.user_password = hash_password(new_password).decode("utf8")
+            user.user_password = password_pool.hash(new_password).decode("utf8")
             session.commit()
 
             self.response.status_code = 200
@@ -157,7 +159,7 @@ class UserView(GenericView):
         :return: dictionary containing status_code and response body
         """
         with get_session() as session:
-            requester_id = decode_token(self.headers.get("token"))
+            requester_id = self.requester_id
             if self.requester_role == UserRole.ADMIN.value["code"]:
                 return super().get_list(request=request, **kwargs)
             else:
@@ -167,13 +169,26 @@ class UserView(GenericView):
                 query = session.query(self.model).filter_by(company_id=requester_company.company_id)
                 return super().get_list(request=request, pre_selected_query=query, **kwargs)
 
+    @staticmethod
+    def __is_changed(user: User, field: str, value) -> bool:
+        """
+        Checks if the value passed in the body differs from the stored one, the value is converted to the column`s
+        type first, so e.g. company id passed as a string is not a change.
+        """
+        try:
+            value = User.__table__.c[field].type.python_type(value)
+        except (TypeError, ValueError):
+            return True
+
+        return value != getattr(user, field)
+
     @view_function_middleware
     @check_allowed_methods_middleware([Method.PUT.value])
     def update(self, request: dict) -> dict:
         with get_session() as session:
             # Check if requested user is the same as the one that should be updated or if the requester is owner of the
             # company where user is located
-            requester_id = decode_token(self.headers.get("token"))
+            requester_id = self.requester_id
             requester = session.query(User).filter_by(user_id=requester_id).first()
 
             if self.instance_id != requester_id and (
@@ -183,11 +198,27 @@ class UserView(GenericView):
                 "code"]:
                 raise ValidationError(status_code=401, message="You can not update data of this user.")
 
-            # Remove password if it was passed
-            if "user_password" in self.body:
-                del self.body["user_password"]
+            # Remove password and token version if they were passed
+            for field in ("user_password", "token_version"):
+                self.body.pop(field, None)
+
+            # Tokens carry role and company of the user, so they are revoked when these change
+            is_access_changed = self.instance is not None and any(
+                field in self.body and self.__is_changed(self.instance, field, self.body[field])
+                for field in ("user_role", "company_id")
+            )
 
-            return super().update(request=request)
+            response = super().update(request=request)
+            if is_access_changed:
+                revoke_tokens(self.instance_id)
+                # User who changed himself gets a new token instead of the revoked one
+                if self.instance_id == requester_id:
+                    self.headers["token"] = create_token(
+                        self.instance.user_id, self.instance.user_role, self.instance.company_id,
+                        self.instance.token_version
+                    )
+            identity_cache.invalidate_user(self.instance_id)
+            return response
 
     @view_function_middleware
     @check_allowed_roles_middleware([UserRole.MANAGER.value["code"], UserRole.ADMIN.value["code"]])
@@ -200,7 +231,7 @@ class UserView(GenericView):
         """
         with get_session() as session:
             # Get owner id from token and retrieve owner`s company
-            owner_id = decode_token(self.headers.get("token"))
+            owner_id = self.requester_id
             company = session.query(User).filter_by(user_id=owner_id).first().company
             company_id = company.company_id
 
@@ -240,7 +271,7 @@ class UserView(GenericView):
                 user_email=employee_email,
                 user_role=employee_role,
                 user_phone=employee_phone,
-                user_password=hash_password(password).decode("utf8"),
+                user_password=password_pool.hash(password).decode("utf8"),
                 company_id=company_id
             )
             self.body = new_body
@@ -262,7 +293,7 @@ class UserView(GenericView):
             # define objects
             id_to_del = extract_id_from_url(request["url"], "user")
             user_to_del = session.query(User).filter_by(user_id=id_to_del).first()
-            user_id = decode_token(self.headers.get("token"))
+            user_id = self.requester_id
             user = session.query(User).filter_by(user_id=user_id).first()
 
             # Check that user cannot delete himself
@@ -287,7 +318,10 @@ class UserView(GenericView):
             # empty body
             request["body"] = self.body = dict()
 
-            return super().delete(request=request)
+            # Tokens of the deleted user are rejected, because he no longer exists
+            response = super().delete(request=request)
+            identity_cache.invalidate_user(id_to_del)
+            return response
 
     @view_function_middleware
     @check_allowed_methods_middleware([Method.PUT.value])
@@ -332,8 +366,9 @@ class UserView(GenericView):
                 raise ValidationError("User did not forget password", 400)
 
             user.is_password_forgotten = 0
-            user.user_password = hash_password(f"{user.user_name[0]}{user.user_surname[0]}{user.user_phone[-4:]}").decode(
-                "utf8")
+            user.user_password = password_pool.hash(
+                f"{user.user_name[0]}{user.user_surname[0]}{user.user_phone[-4:]}"
+            ).decode("utf8")
             self.response.status_code=200
 
             return self.response.create_response()
@@ -2,7 +2,6 @@ from db_config import get_session
 from models import Vendor, User
 from services import view_function_middleware, check_allowed_methods_middleware
 from services.generics import GenericView
-from utilities import decode_token
 from utilities.enums.data_related_enums import UserRole
 from utilities.enums.method import Method
 from utilities.exceptions import ValidationError
@@ -27,7 +26,7 @@ class VendorView(GenericView):
                 return super().get_list(request=request, cascade_fields=["vendor_owner"], **kwargs)
 
             # get owner_id from token and filter vendors by it
-            owner_id = decode_token(self.headers.get("token"))
+            owner_id = self.requester_id
             vendors = session.query(Vendor).filter(Vendor.vendor_owner_id == owner_id)
 
             # create response
@@ -48,7 +47,7 @@ class VendorView(GenericView):
         """
         with get_session() as session:
             # check id user_id from token and vendor_owner_id are the same
-            user_id = decode_token(self.headers.get("token"))
+            user_id = self.requester_id
             vendor = session.query(Vendor).filter(Vendor.vendor_owner_id == user_id).first()
             if self.instance is not None and vendor.vendor_owner_id != self.instance.vendor_owner_id:
                 raise ValidationError("Vendor with given id does not exist.", 404)
@@ -64,7 +63,7 @@ class VendorView(GenericView):
         :return: dictionary containing status_code and response body
         """
         with get_session() as session:
-            user_id = decode_token(self.headers.get("token"))
+            user_id = self.requester_id
 
             # get the role for  user_id
             user = session.query(User).filter(User.user_id == user_id).first()
@@ -105,7 +104,7 @@ class VendorView(GenericView):
                 return super().update(request=request)
 
             # check id user_id from token and vendor_owner_id are the same
-            user_id = decode_token(self.headers.get("token"))
+            user_id = self.requester_id
             vendor = session.query(Vendor).filter(Vendor.vendor_owner_id == user_id).first()
             if self.instance is not None and vendor.vendor_owner_id != self.instance.vendor_owner_id:
                 raise ValidationError("Store point not found", 404)
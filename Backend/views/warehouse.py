@@ -1,13 +1,14 @@
 from datetime import timedelta, datetime
 from sqlite3 import IntegrityError
 
-from sqlalchemy import func, cast, Float, Integer, text, distinct, case
+from sqlalchemy import func, cast, Float, case
 
 from db_config import get_session
-from models import Warehouse, User, Rack, Product, Inventory, OrderItem, Order
-from services import view_function_middleware, check_allowed_methods_middleware, check_allowed_roles_middleware
+from models import Warehouse, User, Rack, Inventory
+from services import view_function_middleware, check_allowed_methods_middleware, check_allowed_roles_middleware, \
+    identity_cache, daily_rollups
 from services.generics import GenericView
-from utilities import ValidationError, DatabaseError, decode_token, extract_id_from_url, is_instance_already_exists
+from utilities import ValidationError, DatabaseError, extract_id_from_url, validate_order_items
 from utilities.enums.data_related_enums import UserRole
 from utilities.enums.method import Method
 
@@ -29,14 +30,13 @@ class WarehouseView(GenericView):
         :return: dictionary containing status_code and response body
         """
 
-        creator = decode_token(self.headers.get("token"))
         supervisor_id = self.body.get("supervisor_id")
         overall_capacity = self.body.get("overall_capacity")
         remaining_capacity = self.body.get("remaining_capacity")
 
         with get_session() as session:
 
-            company_id = session.query(User.company_id).filter_by(user_id=creator).scalar()
+            company_id = self.identity.company_id
 
             # Check if the supervisor exists
             supervisor = session.query(User).filter_by(user_id=supervisor_id,
@@ -73,6 +73,7 @@ class WarehouseView(GenericView):
                 session.flush()
 
                 session.commit()
+                identity_cache.invalidate_user(supervisor_id)
 
                 # Build the response
                 response_data = {
@@ -100,8 +101,7 @@ class WarehouseView(GenericView):
             # id of warehouse to be modified
             warehouse_id = extract_id_from_url(request["url"], "warehouse")
 
-            updator = decode_token(self.headers.get("token"))
-            company_id = session.query(User.company_id).filter_by(user_id=updator).scalar()
+            company_id = self.identity.company_id
             supervisor_id = self.body.get("supervisor_id")
             supervisor = session.query(User).filter_by(user_id=supervisor_id,
                                                        user_role='supervisor',
@@ -122,6 +122,7 @@ class WarehouseView(GenericView):
             if not warehouse:
                 raise ValidationError("Warehouse Not Found", 404)
 
+            previous_supervisor_id = warehouse.supervisor_id
             overall_capacity = self.body.get("overall_capacity")
 
             # Calculate the change in capacity
@@ -144,7 +145,9 @@ class WarehouseView(GenericView):
         self.body["remaining_capacity"] = warehouse.remaining_capacity - capacity_change
         self.body = warehouse.to_dict()
 
-        return super().update(request=request)
+        response = super().update(request=request)
+        identity_cache.invalidate_user(previous_supervisor_id, supervisor_id)
+        return response
 
     @view_function_middleware
     @check_allowed_methods_middleware([Method.DELETE.value])
@@ -159,8 +162,7 @@ class WarehouseView(GenericView):
             # id of warehouse to be deleted
             warehouse_id = extract_id_from_url(request["url"], "warehouse")
 
-            deleter = decode_token(self.headers.get("token"))
-            company_id = session.query(User.company_id).filter_by(user_id=deleter).scalar()
+            company_id = self.identity.company_id
 
             warehouse = session.query(Warehouse).filter_by(warehouse_id=warehouse_id, company_id=company_id).first()
 
@@ -177,8 +179,10 @@ class WarehouseView(GenericView):
                 session.delete(rack)
 
             # Delete the warehouse
+            supervisor_id = warehouse.supervisor_id
             session.delete(warehouse)
 
+        identity_cache.invalidate_user(supervisor_id)
         response_data = {
             "status": 204,
             "data": {},
@@ -199,8 +203,7 @@ class WarehouseView(GenericView):
             # id of the warehouse to be retrieved
             warehouse_id = extract_id_from_url(request["url"], "warehouse")
 
-            retriever = decode_token(self.headers.get("token"))
-            company_id = session.query(User.company_id).filter_by(user_id=retriever).scalar()
+            company_id = self.identity.company_id
 
             warehouse = session.query(Warehouse).filter_by(warehouse_id=warehouse_id, company_id=company_id).first()
 
@@ -260,7 +263,7 @@ class WarehouseView(GenericView):
         :return: dictionary containing status_code and response body
         """
         with get_session() as session:
-            requester_id = decode_token(self.headers.get("token"))
+            requester_id = self.requester_id
             requester = session.query(User).filter(User.user_id == requester_id).first()
             company = requester.company
 
@@ -284,10 +287,6 @@ class WarehouseView(GenericView):
         company_id = self.body.get("company_id", None)
         order_type = self.body.get("order_type", None)
         products = self.body.get("items", [])
-        products_to_order = {}
-        main_product_type = None
-        product_ids = []
-        total_volume = 0
 
         with get_session() as session:
             if not company_id:
@@ -297,21 +296,9 @@ class WarehouseView(GenericView):
             if len(products) == 0:
                 raise ValidationError("Items are required", 400)
             else:
-                main_product_type = session.query(Product.product_type).filter_by(
-                    product_id=products[0]["product_id"]).scalar()
-                for product in products:
-                    product_id, quantity = product.get("product_id"), product.get("quantity")
-
-                    if not is_instance_already_exists(Product, product_id=product_id):
-                        raise ValidationError(f"Product with id {product_id} does not exist", 404)
-
-                    product = session.query(Product).filter_by(product_id=product_id).first()
-                    total_volume += product.volume * quantity
-                    products_to_order[product_id] = quantity
-                    product_ids.append(product_id)
-
-                    if product.product_type != main_product_type:
-                        raise ValidationError("All products must be of the same type", 400)
+                ordered_products, products_to_order, total_volume, _ = validate_order_items(products)
+                main_product_type = ordered_products[products[0]["product_id"]].product_type
+                product_ids = list(products_to_order)
 
             # Get all warehouses of the company according to the product type
             warehouses = session.query(Warehouse).filter(
@@ -358,39 +345,17 @@ class WarehouseView(GenericView):
     def most_used_warehouses(self, request: dict, **kwargs) -> dict:
         """
         Returns a list of warehouses that are most used.
+        :param request: dictionary containing url, method, body and headers
+        :param kwargs: created_at_gte and created_at_lte limit days of creation of the orders (both days included)
+        :return: dictionary containing status_code and response body with numbers, volumes and prices of finished
+        orders by names of the warehouses
         """
         with get_session() as session:
-            # get company_id of manager
-            company_id = session.query(User.company_id).filter_by(user_id=self.requester_id).scalar()
-
-            # actual query
-            query = (
-                session.query(
-                    Warehouse.warehouse_name,
-                    cast(func.count(distinct(Order.order_id)), Integer),
-                    cast(func.sum(Product.volume * OrderItem.quantity), Float),
-                    cast(func.sum(Order.total_price), Float)
-                )
-                .select_from(Warehouse)
-                .join(Order, text(
-                    "((orders.order_type = 'to_warehouse' AND orders.recipient_id = warehouses.warehouse_id) "
-                    "OR (orders.order_type = 'from_warehouse' AND orders.supplier_id = warehouses.warehouse_id))"
-                ))
-                .join(OrderItem, OrderItem.order_id == Order.order_id)
-                .join(Product, Product.product_id == OrderItem.product_id)
-                .filter(Order.order_status == 'finished', Warehouse.company_id == company_id)
-                .group_by(Warehouse.warehouse_name)
+            # Finished orders are summed from daily rollups of the company`s warehouses
+            result = daily_rollups.most_used_warehouses(
+                session, self.identity.company_id, *daily_rollups.day_range(kwargs)
             )
 
-            # if there are filters apply them
-            for column, value in kwargs.items():
-                if column == "created_at_gte":
-                    query = query.filter(Order.created_at >= value)
-                elif column == "created_at_lte":
-                    query = query.filter(Order.created_at <= value)
-
-            result = query.all()
-
             # create response
             orders_count = dict()
             orders_volume = dict()
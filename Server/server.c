@@ -122,6 +122,51 @@ void send_request(cJSON *json, int port, char* address, int new_socket){
 	addToMessageQueue(request);
 }
 
+// Sends the whole message, send may write only a part of it when the client's socket buffer is full
+void send_all(int socket_id, const char* message, size_t length) {
+  while (length > 0) {
+    ssize_t sent = send(socket_id, message, length, MSG_NOSIGNAL);
+    if (sent <= 0) {
+      return;
+    }
+    message += sent;
+    length -= sent;
+  }
+}
+
+// Messages from the backend are separated by new line, one read may contain a part of the message (responses bigger
+// than the buffer, chunks of the streamed lists) or several of them, so data is accumulated until the new line arrives
+void forward_backend_messages(char** pending, size_t* pending_length, const char* data, size_t length) {
+  char* accumulated = (char*)realloc(*pending, *pending_length + length + 1);
+  if (accumulated == NULL) {
+    return;
+  }
+  memcpy(accumulated + *pending_length, data, length);
+  *pending_length += length;
+  accumulated[*pending_length] = '\0';
+  *pending = accumulated;
+
+  char* start = accumulated;
+  char* end;
+  while ((end = memchr(start, '\n', *pending_length - (start - accumulated))) != NULL) {
+    *end = '\0';
+    cJSON *message = cJSON_Parse(start);
+    cJSON *headers = cJSON_GetObjectItem(message, "headers");
+    cJSON *socket_id = cJSON_GetObjectItem(headers, "socket_id");
+
+    if (cJSON_IsNumber(socket_id)) {
+      *end = '\n';
+      send_all(socket_id->valueint, start, end - start + 1);
+    }
+
+    cJSON_Delete(message);
+    start = end + 1;
+  }
+
+  *pending_length -= start - accumulated;
+  memmove(accumulated, start, *pending_length);
+}
+
 void* handle_client(void* client) {
   struct clientAddress* clientArgs = (struct clientAddress*)client;
   int port = clientArgs->port;
@@ -130,6 +175,8 @@ void* handle_client(void* client) {
     cJSON *root = cJSON_CreateObject();
     int new_socket = *((int*)clientArgs->client_socket);
     char buffer[1048576] = {0};
+    char* pending = NULL;
+    size_t pending_length = 0;
 
     while (true) {
       memset(buffer, 0, sizeof(buffer));
@@ -147,6 +194,12 @@ void* handle_client(void* client) {
             break;
         }
 
+        //backend to frontend
+        if(new_socket == server_fd){
+          forward_backend_messages(&pending, &pending_length, buffer, valread);
+          continue;
+        }
+
         cJSON *parsedJson = cJSON_Parse(buffer);
         cJSON *role = cJSON_GetObjectItem(parsedJson, "role");
         cJSON *headers = cJSON_GetObjectItem(parsedJson, "headers");
@@ -189,15 +242,10 @@ void* handle_client(void* client) {
           }
         }
 
-        //backend to frontend
-        else if(headers != NULL && new_socket == server_fd){
-          int socket_id = cJSON_GetObjectItem(headers, "socket_id")->valueint;
-          send(socket_id, buffer, strlen(buffer), 0);
-        }
-
     }
 
     // сlose the connected socket for this client
+    free(pending);
     close(new_socket);
     free(clientArgs->client_socket);
     return NULL;